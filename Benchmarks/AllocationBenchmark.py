@@ -0,0 +1,123 @@
+"""
+Compare the Python memory allocated per page by the old text pipeline,
+which decodes the response, strips it and hands the str to lxml, against
+the `WebReader`'s bytes pipeline, which parses the response bytes and only
+decodes the text if it is asked for.
+
+Memory is measured with `tracemalloc`, which only sees Python allocations.
+That is what this benchmark is after: the str copies made before the page
+reaches lxml.  lxml's own tree is the same size for both.  When the fetch
+is included, the peak is set by requests joining the downloaded chunks into
+`response.content`, which both pipelines need.
+
+`WebReader.get` returns the `ResponseBody`, so like `get_many` it only
+decodes the page if its text is asked for.  The kept column is what is still
+held once the call returns: the bytes pipelines keep the response bytes for
+`current_response`.
+
+Usage:
+    python AllocationBenchmark.py --rows 2000 --repeat 20
+"""
+from __future__ import print_function
+import argparse
+import tracemalloc
+from time import time
+from selenext.Helpers.Requests import WebReader, ResponseBody, page_encoding, parse_html
+from BenchmarkHelpers import make_page, serve_pages
+
+
+def measure(function, repeat):
+    """
+    Call `function` `repeat` times and get the average peak of Python memory
+    allocated during a call, the average still held once it returns and the
+    total time taken.
+
+    Args:
+        function: function
+        repeat: int
+
+    Returns:
+        tuple (float, float, float), the peak and kept kilobytes and seconds
+    """
+
+    peaks = 0
+    kept = 0
+    seconds = 0.0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time()
+        result = function()
+        seconds += time() - start
+        current, peak = tracemalloc.get_traced_memory()
+        peaks += peak
+        kept += current
+        tracemalloc.stop()
+        del result
+    return peaks / 1024.0 / repeat, kept / 1024.0 / repeat, seconds
+
+
+def text_pipeline(session, url):
+    """
+    Fetch and parse the page the way the `WebReader` used to.
+
+    Args:
+        session: requests.Session
+        url: str
+
+    Returns:
+        lxml.html.HtmlElement
+    """
+
+    response = session.get(url)
+    return parse_html(response.text.strip(), 'lxml')
+
+
+def bytes_pipeline(reader, url):
+    """
+    Fetch and parse the page without decoding it, the way `get_many` does.
+
+    Args:
+        reader: WebReader
+        url: str
+
+    Returns:
+        tuple (ResponseBody, lxml.html.HtmlElement)
+    """
+
+    return reader._load(url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebReader allocation benchmark.')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    page = make_page(args.rows)
+    server, base_url = serve_pages({'/index.html': page})
+    url = base_url + '/index.html'
+    reader = WebReader(cache=False, rate_limiter=False, retry=False, circuit_breaker=False, parser='lxml')
+
+    try:
+        response = reader.requests.get(url)
+        content = response.content
+        encoding = page_encoding(content, response.headers.get('Content-Type'))
+
+        print('Page size: {:.1f} KB'.format(len(content) / 1024.0))
+        print('{:<28} {:>16} {:>16} {:>10}'.format('pipeline', 'peak KB/page', 'kept KB/page', 'seconds'))
+        results = [
+            ('parse text (old)', lambda: parse_html(response.text.strip(), 'lxml')),
+            ('parse bytes', lambda: reader._parse(ResponseBody(content, encoding))),
+            ('fetch + parse text (old)', lambda: text_pipeline(reader.requests, url)),
+            ('fetch + parse bytes', lambda: bytes_pipeline(reader, url)),
+            ('WebReader.get', lambda: reader.get(url, add_to_history=False)),
+        ]
+        for name, function in results:
+            peak, kept, seconds = measure(function, args.repeat)
+            print('{:<28} {:>16.1f} {:>16.1f} {:>10.3f}'.format(name, peak, kept, seconds))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
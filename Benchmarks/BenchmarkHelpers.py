@@ -0,0 +1,114 @@
+from __future__ import print_function
+import threading
+from time import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_page(rows=100):
+    """
+    Build a html page with a table of `rows` rows for the benchmarks to read.
+
+    Args:
+        rows: int
+
+    Returns:
+        str
+    """
+
+    body = ''.join(
+        '<tr id="row-{0}" class="row {1}"><td class="sku" name="sku">SKU-{0}</td>'
+        '<td class="price">{0}.99</td><td><a href="/item/{0}">Item {0}</a></td></tr>'.format(
+            i, 'odd' if i % 2 else 'even'
+        )
+        for i in range(rows)
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>Benchmark</title></head><body>'
+        '<div id="content"><table id="items">{}</table></div></body></html>'.format(body)
+    )
+
+
+def serve_pages(pages):
+    """
+    Serve the given pages from a local HTTP/1.1 server running in a daemon
+    thread.  `pages` maps a path like `/index.html` to the page body.
+
+    Args:
+        pages: dict
+
+    Returns:
+        tuple (server, base_url)
+    """
+
+    encoded = dict((path, body.encode('utf-8')) for path, body in pages.items())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = encoded.get(self.path.split('?')[0])
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def timed(function, repeat=1):
+    """
+    Call `function` `repeat` times and return the total time it took.
+
+    Args:
+        function: function
+        repeat: int
+
+    Returns:
+        float
+    """
+
+    start = time()
+    for _ in range(repeat):
+        function()
+    return time() - start
+
+
+def report(name, seconds, count):
+    """
+    Print a line with the total time and throughput for a benchmark.
+
+    Args:
+        name: str
+        seconds: float
+        count: int
+
+    Returns:
+        None
+    """
+
+    print('{:<32} {:>9.3f}s {:>11.1f}/s'.format(name, seconds, count / seconds if seconds else 0))
@@ -0,0 +1,90 @@
+"""
+Compare lookups by id, name and class name on a parsed page through the
+document index against the XPath scans the `WebReader` falls back to.  The
+index is built by the first lookup, so its time is reported on its own.
+
+Usage:
+    python LookupBenchmark.py --rows 2000 --lookups 500
+"""
+from __future__ import print_function
+import argparse
+import random
+from time import time
+from selenext.Helpers.Requests import WebElement, parse_html
+from selenext.Helpers.Requests.Index import DocumentIndex
+from BenchmarkHelpers import make_page
+
+
+def lookups(rows, count):
+    """
+    Get a mix of lookups by id, name and class name to run against the page.
+
+    Args:
+        rows: int
+        count: int
+
+    Returns:
+        list
+    """
+
+    random.seed(rows)
+    values = []
+    for _ in range(count):
+        kind = random.randint(0, 2)
+        if kind == 0:
+            values.append(('id', 'row-{}'.format(random.randrange(rows))))
+        elif kind == 1:
+            values.append(('name', 'sku'))
+        else:
+            values.append(('class name', random.choice(['odd', 'even', 'price'])))
+    return values
+
+
+def run(page, values, indexed):
+    """
+    Run the lookups against a freshly parsed page.
+
+    Args:
+        page: str
+        values: list
+        indexed: bool
+
+    Returns:
+        tuple (float, float, int), the seconds for the first lookup, for all
+        of them and the number of elements found
+    """
+
+    node = parse_html(page)
+    element = WebElement(node, page, 'http://localhost/')
+    if not indexed:
+        element._index = None
+    found = 0
+
+    start = time()
+    found += len(element._find_all(*values[0]))
+    first = time() - start
+    for by, value in values[1:]:
+        found += len(element._find_all(by, value))
+    return first, time() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebReader lookup benchmark.')
+    parser.add_argument('--rows', type=int, default=2000, help='Table rows in the generated page.')
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    page = make_page(args.rows)
+    values = lookups(args.rows, args.lookups)
+    assert isinstance(WebElement(parse_html(page), page, 'http://localhost/')._index, DocumentIndex)
+
+    print('{:<8} {:>12} {:>10} {:>12} {:>8}'.format('lookup', 'first (ms)', 'seconds', 'lookups/s', 'found'))
+    for name, indexed in (('xpath', False), ('index', True)):
+        first, seconds, found = run(page, values, indexed)
+        print('{:<8} {:>12.2f} {:>10.3f} {:>12.0f} {:>8}'.format(
+            name, first * 1000, seconds, len(values) / seconds if seconds else 0, found
+        ))
+
+
+if __name__ == '__main__':
+    main()
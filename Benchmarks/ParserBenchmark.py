@@ -0,0 +1,141 @@
+"""
+Parse a corpus of saved pages with each of the WebReader's parsers and
+report the throughput and peak memory of each one.  Every parser runs in
+its own process so the peak memory numbers don't bleed into each other.
+
+Usage:
+    python ParserBenchmark.py --corpus path/to/saved/pages --repeat 5
+    python ParserBenchmark.py --archive path/to/pages.archive
+    python ParserBenchmark.py --rows 2000
+
+The corpus can be a directory of saved pages or a `ResponseArchive`
+recorded by a `WebReader`.  Without one, a set of generated pages is parsed
+instead.
+"""
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from time import time
+from selenext.Helpers.Requests import PARSERS, ResponseArchive, get_parser
+from BenchmarkHelpers import make_page
+
+
+def load_corpus(corpus, rows, archive=None):
+    """
+    Read every .html/.htm file in the corpus directory or every html page in
+    the archive, or generate pages of different sizes if neither is given.
+
+    Args:
+        corpus: str or None
+        rows: int
+        archive: str or None
+
+    Returns:
+        list
+    """
+
+    if archive is not None:
+        archive = ResponseArchive(archive)
+        responses = [archive.load(url) for url in archive]
+        return [response.content.decode(response.encoding or 'utf-8', 'replace') for response in responses
+                if 'html' in response.headers.get('Content-Type', '')]
+
+    if corpus is None:
+        return [make_page(rows // 10), make_page(rows // 2), make_page(rows)]
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus, '*.htm*'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read().decode('utf-8', 'replace'))
+    return pages
+
+
+def peak_memory_kb():
+    """
+    Get the peak resident memory of this process in kilobytes.
+
+    Returns:
+        int
+    """
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_parser(name, pages, repeat):
+    """
+    Parse every page `repeat` times with the named parser.
+
+    Args:
+        name: str
+        pages: list
+        repeat: int
+
+    Returns:
+        dict
+    """
+
+    parser = get_parser(name)
+    baseline = peak_memory_kb()
+    start = time()
+    for _ in range(repeat):
+        for page in pages:
+            parser(page)
+    seconds = time() - start
+
+    return {
+        'parser': name,
+        'seconds': seconds,
+        'pages': len(pages) * repeat,
+        'megabytes': sum(len(page) for page in pages) * repeat / 1024.0 / 1024.0,
+        'peak_kb': peak_memory_kb() - baseline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebReader parser benchmark.')
+    parser.add_argument('--corpus', default=None, help='Directory of saved .html pages.')
+    parser.add_argument('--archive', default=None, help='ResponseArchive recorded by a WebReader.')
+    parser.add_argument('--rows', type=int, default=2000, help='Table rows in the largest generated page.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--parsers', default=','.join(sorted(PARSERS)))
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.rows, args.archive)
+
+    if args.worker is not None:
+        print(json.dumps(run_parser(args.worker, pages, args.repeat)))
+        return
+
+    print('{:<12} {:>9} {:>10} {:>10} {:>12}'.format('parser', 'seconds', 'pages/s', 'MB/s', 'peak KB'))
+    for name in args.parsers.split(','):
+        command = [sys.executable, __file__, '--worker', name, '--rows', str(args.rows), '--repeat', str(args.repeat)]
+        if args.corpus is not None:
+            command += ['--corpus', args.corpus]
+        if args.archive is not None:
+            command += ['--archive', args.archive]
+        try:
+            result = json.loads(subprocess.check_output(command, stderr=subprocess.STDOUT).decode('utf-8'))
+        except subprocess.CalledProcessError as e:
+            print('{:<12} failed: {}'.format(name, e.output.decode('utf-8').strip().splitlines()[-1]))
+            continue
+
+        print('{:<12} {:>9.3f} {:>10.1f} {:>10.2f} {:>12}'.format(
+            name,
+            result['seconds'],
+            result['pages'] / result['seconds'],
+            result['megabytes'] / result['seconds'],
+            result['peak_kb']
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Compare fetching pages with a new connection per call against the pooled
+keep-alive session used by the `WebReader`.
+
+Usage:
+    python SessionBenchmark.py --requests 500 --rows 50
+"""
+from __future__ import print_function
+import argparse
+import requests
+from selenext.Helpers.Requests import WebReader
+from BenchmarkHelpers import make_page, serve_pages, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebReader session benchmark.')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=50)
+    args = parser.parse_args()
+
+    server, base_url = serve_pages({'/index.html': make_page(args.rows)})
+    url = base_url + '/index.html'
+
+    try:
+        report('requests.get per call', timed(lambda: requests.get(url).text, args.requests), args.requests)
+
+        reader = WebReader()
+        report('WebReader.requests.get (pooled)', timed(lambda: reader.requests.get(url).text, args.requests),
+               args.requests)
+
+        unpooled = WebReader(session=requests)
+        report('WebReader.get per call', timed(lambda: unpooled.get(url), args.requests), args.requests)
+        report('WebReader.get (pooled)', timed(lambda: reader.get(url), args.requests), args.requests)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
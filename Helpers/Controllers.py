@@ -3,6 +3,7 @@ from time import sleep
 from .Commands import Kwargs
 from selenium.webdriver.support.wait import WebDriverWait
 from selenext.Environment import env
+from .Requests import WebReader, RequestsWait
 
 
 # Generate a bunch of decorators for waiting up to 60 seconds.
@@ -311,7 +312,8 @@ class IndependentController(object):
     def attach_driver(self, driver, timeout=30):
         """
         Drivers must be attached after the controller has been instantiated so each controller has
-        its own driver.  This will also attach a WebDriverWait to the class instance.
+        its own driver.  This will also attach a WebDriverWait to the class instance, or a
+        RequestsWait if the driver is a WebReader.
 
         Args:
             driver: Selenium WebDriver
@@ -322,7 +324,10 @@ class IndependentController(object):
         """
 
         self.driver = driver
-        self.wait = WebDriverWait(self.driver, timeout)
+        if isinstance(driver, WebReader):
+            self.wait = RequestsWait(self.driver, timeout)
+        else:
+            self.wait = WebDriverWait(self.driver, timeout)
         return self
 
     def call(self, method_name, *args, **kwargs):
@@ -0,0 +1,236 @@
+import json
+import os
+import struct
+import zlib
+from threading import Lock
+from time import time
+from .Cache import ResponseCache
+from .Exceptions import NotArchivedError
+
+
+# Each record is its length followed by the zlib compressed record: a line
+# of json with the url, status and headers, then the body.
+_LENGTH = struct.Struct('<I')
+
+# Bodies are stored decoded, so these headers no longer describe them.
+_DROPPED_HEADERS = frozenset(['content-encoding', 'content-length', 'transfer-encoding'])
+
+_pread = getattr(os, 'pread', None)
+_replace = getattr(os, 'replace', os.rename)
+
+_shared_archives = {}
+_shared_archives_lock = Lock()
+
+
+class ResponseArchive(object):
+    """
+    An append only file of recorded responses, with an index of where each
+    url's latest response starts, so any response can be read back with one
+    seek and one read.  The index is kept in `path + '.idx'` and is rebuilt
+    from the archive if it is missing or was cut off.
+
+    A `WebReader` records every response it gets into the archive it is
+    given as `record`, and serves every `get` from the archive it is given
+    as `replay` without touching the network.  Readers given a path share
+    the process wide archive from `shared_archive`, since two archives
+    appending to the same file would write over each other's records.
+
+    Example:
+        WebReader(record='pages.archive').get('https://example.com/')
+        reader = WebReader(replay='pages.archive')
+        for url in reader.replay:
+            reader.get(url)
+    """
+    def __init__(self, path, compress_level=6):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.compress_level = compress_level
+        self._offsets = {}
+        self._lock = Lock()
+        self._reader = None
+        self._writer = None
+        self._index_writer = None
+
+        if os.path.exists(path):
+            self._load_index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, url):
+        return url in self._offsets
+
+    def __iter__(self):
+        return iter(list(self._offsets))
+
+    def _load_index(self):
+        """
+        Read the index, rebuilding it from the archive if it doesn't cover
+        every record.
+
+        Returns:
+            None
+        """
+
+        size = os.path.getsize(self.path)
+        end = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        url, offset, length = json.loads(line)
+                    except ValueError:
+                        break
+                    if offset + length > size:
+                        break
+                    self._offsets[url] = offset, length
+                    end = max(end, offset + length)
+
+        if end < size:
+            self._rebuild_index(end, size)
+
+    def _rebuild_index(self, start, size):
+        """
+        Index the records from `start` on by reading them from the archive,
+        then write out a new index.  A record cut off by a crash is dropped.
+
+        Args:
+            start: int
+            size: int
+
+        Returns:
+            None
+        """
+
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            while offset + _LENGTH.size <= size:
+                length, = _LENGTH.unpack(f.read(_LENGTH.size))
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                url = json.loads(zlib.decompress(data).split(b'\n', 1)[0].decode('utf-8'))['url']
+                self._offsets[url] = offset + _LENGTH.size, length
+                offset += _LENGTH.size + length
+
+        with open(self.path, 'ab') as f:
+            f.truncate(offset)
+
+        with open(self.index_path + '.tmp', 'w') as f:
+            for url, (record_offset, length) in self._offsets.items():
+                f.write(json.dumps([url, record_offset, length]) + '\n')
+        _replace(self.index_path + '.tmp', self.index_path)
+
+    def store(self, url, response):
+        """
+        Append a response to the archive.
+
+        Args:
+            url: str
+            response: requests.Response
+
+        Returns:
+            self
+        """
+
+        headers = dict((name, value) for name, value in response.headers.items()
+                       if name.lower() not in _DROPPED_HEADERS)
+        meta = {'url': url, 'status_code': response.status_code, 'headers': headers, 'recorded_at': time()}
+        data = zlib.compress(json.dumps(meta).encode('utf-8') + b'\n' + response.content, self.compress_level)
+
+        with self._lock:
+            if self._writer is None:
+                self._writer = open(self.path, 'ab')
+                self._index_writer = open(self.index_path, 'a')
+            self._writer.seek(0, os.SEEK_END)
+            offset = self._writer.tell() + _LENGTH.size
+            self._writer.write(_LENGTH.pack(len(data)) + data)
+            self._writer.flush()
+            self._index_writer.write(json.dumps([url, offset, len(data)]) + '\n')
+            self._index_writer.flush()
+            self._offsets[url] = offset, len(data)
+
+        return self
+
+    def _read(self, offset, length):
+        """
+        Read bytes from the archive.  Where the os has `pread`, threads read
+        at once without sharing a file position.
+
+        Args:
+            offset: int
+            length: int
+
+        Returns:
+            bytes
+        """
+
+        if self._reader is None:
+            with self._lock:
+                if self._reader is None:
+                    self._reader = open(self.path, 'rb')
+
+        if _pread is not None:
+            return _pread(self._reader.fileno(), length, offset)
+
+        with self._lock:
+            self._reader.seek(offset)
+            return self._reader.read(length)
+
+    def load(self, url):
+        """
+        Get the recorded response for the url.
+
+        Args:
+            url: str
+
+        Returns:
+            requests.Response
+        """
+
+        try:
+            offset, length = self._offsets[url]
+        except KeyError:
+            raise NotArchivedError('{} is not in the archive {}.'.format(url, self.path))
+
+        meta, _, body = zlib.decompress(self._read(offset, length)).partition(b'\n')
+        response = ResponseCache._make_response(url, json.loads(meta.decode('utf-8')), body)
+        response.from_cache = False
+        response.from_archive = True
+        return response
+
+    def close(self):
+        """
+        Close the archive's files.
+
+        Returns:
+            self
+        """
+
+        with self._lock:
+            for f in (self._reader, self._writer, self._index_writer):
+                if f is not None:
+                    f.close()
+            self._reader = self._writer = self._index_writer = None
+        return self
+
+
+def shared_archive(path):
+    """
+    Get the process wide `ResponseArchive` for a path, so every `WebReader`
+    recording to the path appends through one writer and lock.
+
+    Args:
+        path: str
+
+    Returns:
+        ResponseArchive
+    """
+
+    with _shared_archives_lock:
+        key = os.path.abspath(path)
+        if key not in _shared_archives:
+            _shared_archives[key] = ResponseArchive(path)
+
+    return _shared_archives[key]
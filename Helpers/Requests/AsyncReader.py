@@ -0,0 +1,231 @@
+"""
+An asyncio version of the `WebReader`.  It needs Python 3 and aiohttp, so
+it is not imported by the `Requests` package.  Import it directly:
+
+    from selenext.Helpers.Requests.AsyncReader import AsyncWebReader
+"""
+import asyncio
+from urllib.parse import urlsplit
+import aiohttp
+from . import ResponseBody, WebElement, WebHistory, declared_encoding, get_parser, page_encoding
+from .JsonStream import is_json_content_type, looks_like_json, loads_bytes
+from .Settings import env_setting
+
+
+DEFAULT_MAX_CONCURRENCY = 100
+DEFAULT_MAX_PER_HOST = 8
+
+
+class AsyncWebReader(WebElement):
+    """
+    Reads web pages with aiohttp and exposes them through the same lookup
+    API as the `WebReader`.  Any number of `get` calls can be awaited at the
+    same time.  The number of requests in flight is limited globally by
+    `max_concurrency` and for each host by `max_per_host`; both default to
+    the `WEBREADER_MAX_CONCURRENCY` and `WEBREADER_MAX_PER_HOST` .env keys.
+
+    Since several pages can be loading at once, `get` returns the page as
+    its own `WebElement`.  The reader itself always holds the page that
+    finished loading last, so awaiting one `get` at a time works just like
+    the `WebReader`.
+
+    Example:
+        async with AsyncWebReader(max_per_host=4) as reader:
+            pages = await asyncio.gather(*[reader.get(url) for url in urls])
+            titles = [page.find_element_by_tag_name('h1').text for page in pages]
+    """
+    def __init__(self, session=None, max_concurrency=None, max_per_host=None, parser=None):
+        self.parser = get_parser(parser)
+
+        if max_concurrency is None:
+            max_concurrency = env_setting('WEBREADER_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY, func=int)
+        if max_per_host is None:
+            max_per_host = env_setting('WEBREADER_MAX_PER_HOST', DEFAULT_MAX_PER_HOST, func=int)
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+
+        # The session and semaphores need a running event loop, so they are
+        # created on the first `get`.
+        self._owns_session = session is None
+        self.session = session
+        self._semaphore = None
+        self._host_semaphores = {}
+        self._host_requests = {}
+
+        self.web_history = WebHistory()
+
+        super(AsyncWebReader, self).__init__(None, None, None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.quit()
+
+    def _get_session(self):
+        """
+        Get the aiohttp session, creating it if needed.  The session's
+        connection pool has the same limits as the semaphores, so it never
+        opens more connections than there can be requests in flight.
+
+        Returns:
+            aiohttp.ClientSession
+        """
+
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_per_host)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def _get_semaphores(self, host):
+        """
+        Get the global semaphore and the semaphore for the host.  Each call
+        must be matched by a `_release_host` once the request is done.
+
+        Args:
+            host: str
+
+        Returns:
+            tuple
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            host_semaphore = self._host_semaphores[host]
+        except KeyError:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        self._host_requests[host] = self._host_requests.get(host, 0) + 1
+
+        return self._semaphore, host_semaphore
+
+    def _release_host(self, host):
+        """
+        Forget the host's semaphore once no request for it is running or
+        waiting, so crawling many hosts doesn't keep one for each of them.
+
+        Args:
+            host: str
+
+        Returns:
+            None
+        """
+
+        self._host_requests[host] -= 1
+        if not self._host_requests[host]:
+            del self._host_requests[host]
+            del self._host_semaphores[host]
+
+    async def back(self):
+        """
+        Navigate to the last place in the web history.
+
+        Returns:
+            self
+        """
+
+        await self.get(self.web_history.back(), add_to_history=False)
+        return self
+
+    def close(self):
+        """
+        Does nothing.  Is just a placeholder method.
+
+        Returns:
+            self
+        """
+
+        return self
+
+    async def forward(self):
+        """
+        Navigate to the next place in the web history.
+
+        Returns:
+            self
+        """
+
+        await self.get(self.web_history.forward(), add_to_history=False)
+        return self
+
+    async def get(self, url, headers=None, add_to_history=True, cookies=None):
+        """
+        Get the page for the given url.  Waits for a free slot if the
+        concurrency limit or the url's host limit has been reached.
+
+        Args:
+            url:
+            headers:
+            add_to_history:
+            cookies:
+
+        Returns:
+            WebElement, or dict/list for json responses
+        """
+
+        host = urlsplit(url).netloc
+        semaphore, host_semaphore = self._get_semaphores(host)
+        try:
+            # Take the host slot first so requests queued for a busy host
+            # don't hold global slots that other hosts could be using.
+            async with host_semaphore:
+                async with semaphore:
+                    async with self._get_session().get(url, headers=headers or {}, cookies=cookies or {}) as response:
+                        content = await response.read()
+                        content_type = response.headers.get('Content-Type')
+        finally:
+            self._release_host(host)
+
+        if add_to_history:
+            self.web_history.register(url)
+        self.current_url = url
+
+        # Json responses are decoded straight from the response bytes and
+        # skip the html parser.  Bodies without a Content-Type that only
+        # look like json are parsed as html if they don't decode.
+        if looks_like_json(content_type, content):
+            try:
+                self.current_response = loads_bytes(content, declared_encoding(content_type))
+            except ValueError:
+                if is_json_content_type(content_type):
+                    raise
+            else:
+                self.set_node(None)
+                return self.current_response
+
+        # Html is parsed straight from the response bytes, like the
+        # `WebReader` does, so the page is never decoded unless its text is
+        # asked for.
+        body = ResponseBody(content, page_encoding(content, content_type))
+        self.current_response = body
+        if getattr(self.parser, 'accepts_bytes', False):
+            self.set_node(self.parser(body.content, body.encoding))
+        else:
+            self.set_node(self.parser(body.text))
+
+        return WebElement(self.node, body, url)
+
+    async def quit(self):
+        """
+        Close the aiohttp session if this `AsyncWebReader` created it.
+
+        Returns:
+            self
+        """
+
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+        return self
+
+    async def refresh(self):
+        """
+        Grab the current_url again.
+
+        Returns:
+            self
+        """
+
+        await self.get(self.web_history.current_url(), add_to_history=False)
+        return self
@@ -0,0 +1,384 @@
+import json
+import os
+import re
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock, RLock
+from time import time
+from email.utils import parsedate_tz, mktime_tz
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from .Settings import env_setting
+
+
+DEFAULT_CACHE_DIR = '.webreader_cache'
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_TTL = 300
+
+_replace = getattr(os, 'replace', os.rename)
+
+_shared_caches = {}
+_shared_caches_lock = Lock()
+
+
+def http_date(value):
+    """
+    Convert a http date header into a timestamp.
+
+    Args:
+        value: str
+
+    Returns:
+        float or None
+    """
+
+    parsed = parsedate_tz(value) if value else None
+    return mktime_tz(parsed) if parsed else None
+
+
+def _cache_control(headers):
+    """
+    Read the Cache-Control header into a dictionary.
+
+    Args:
+        headers: dict
+
+    Returns:
+        dict
+    """
+
+    directives = {}
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+class ResponseCache(object):
+    """
+    An on-disk cache of responses for the `WebReader`.  Fresh responses are
+    served straight from disk.  Stale responses are revalidated with the
+    `ETag` and `Last-Modified` headers, so unchanged pages only cost a 304.
+    Once the cache is bigger than `max_size` bytes, the least recently used
+    responses are removed.
+
+    Responses are fresh for as long as their `Cache-Control: max-age` or
+    `Expires` header says, or `ttl` seconds if they have neither.  Responses
+    marked `no-store` are never cached.  Responses are cached by url, so
+    pages that change with the headers or cookies sent should not use it.
+
+    Settings that are not passed in are read from the `WEBREADER_CACHE_DIR`,
+    `WEBREADER_CACHE_MAX_SIZE` (megabytes) and `WEBREADER_CACHE_TTL`
+    (seconds) .env keys.
+    """
+    def __init__(self, directory=None, max_size=None, ttl=None):
+        if directory is None:
+            directory = env_setting('WEBREADER_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_size is None:
+            max_size = env_setting('WEBREADER_CACHE_MAX_SIZE', DEFAULT_MAX_SIZE, func=lambda x: int(x) * 1024 * 1024)
+        if ttl is None:
+            ttl = env_setting('WEBREADER_CACHE_TTL', DEFAULT_TTL, func=float)
+
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+        self._lock = RLock()
+        # Sizes of the cached entries, least recently used first.
+        self._entries = OrderedDict()
+        self._size = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._load_entries()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load_entries(self):
+        """
+        Find the entries already in the cache directory, ordered by when
+        they were last used.
+
+        Returns:
+            self
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-5]
+            meta_path, body_path = self._paths(key)
+            try:
+                entries.append((os.path.getmtime(meta_path), key, os.path.getsize(body_path)))
+            except OSError:
+                continue
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+        return self
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    @staticmethod
+    def key(url):
+        """
+        Get the cache key for a url.
+
+        Args:
+            url: str
+
+        Returns:
+            str
+        """
+
+        return sha1(url.encode('utf-8')).hexdigest()
+
+    def fetch(self, url, send, headers=None):
+        """
+        Get the response for the url from the cache, or by calling `send`
+        with the request headers to make the request.  Stale responses are
+        sent with conditional headers and served from the cache on a 304.
+
+        Args:
+            url: str
+            send: function
+            headers: dict
+
+        Returns:
+            requests.Response
+        """
+
+        headers = dict(headers or {})
+        entry = self.load(url)
+
+        if entry is not None:
+            meta, body = entry
+            if meta['expires_at'] > time():
+                self.hits += 1
+                return self._make_response(url, meta, body)
+
+            if meta.get('etag'):
+                headers.setdefault('If-None-Match', meta['etag'])
+            if meta.get('last_modified'):
+                headers.setdefault('If-Modified-Since', meta['last_modified'])
+
+        response = send(headers)
+
+        if entry is not None and response.status_code == 304:
+            self.revalidations += 1
+            meta, body = entry
+            merged = CaseInsensitiveDict(meta['headers'])
+            merged.update(response.headers)
+            meta['headers'] = dict(merged)
+            meta['expires_at'] = self._expires_at(meta['headers'])
+            self._write(url, meta, None)
+            return self._make_response(url, meta, body)
+
+        self.misses += 1
+        self.store(url, response)
+        return response
+
+    def load(self, url):
+        """
+        Get the stored metadata and body for the url.
+
+        Args:
+            url: str
+
+        Returns:
+            tuple (dict, bytes) or None
+        """
+
+        key = self.key(url)
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                with open(body_path, 'rb') as f:
+                    body = f.read()
+            except (IOError, OSError, ValueError):
+                self._remove(key)
+                return None
+
+            # Mark the entry as the most recently used.
+            self._entries[key] = self._entries.pop(key)
+            try:
+                os.utime(meta_path, None)
+            except OSError:
+                pass
+
+        return meta, body
+
+    def store(self, url, response):
+        """
+        Store the response if it can be cached.
+
+        Args:
+            url: str
+            response: requests.Response
+
+        Returns:
+            bool
+        """
+
+        if response.status_code != 200 or 'no-store' in _cache_control(response.headers):
+            return False
+
+        headers = dict(response.headers)
+        meta = {
+            'url': url,
+            'status_code': response.status_code,
+            'headers': headers,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'expires_at': self._expires_at(headers),
+        }
+        self._write(url, meta, response.content)
+        return True
+
+    def _expires_at(self, headers):
+        """
+        Work out when a response stops being fresh.
+
+        Args:
+            headers: dict
+
+        Returns:
+            float
+        """
+
+        now = time()
+        headers = CaseInsensitiveDict(headers)
+        directives = _cache_control(headers)
+        if 'no-cache' in directives:
+            return now
+
+        max_age = directives.get('s-maxage', directives.get('max-age'))
+        if max_age is not None and re.match(r'^\d+$', max_age):
+            return now + int(max_age)
+
+        expires = http_date(headers.get('Expires'))
+        if expires is not None:
+            date = http_date(headers.get('Date')) or now
+            return now + (expires - date)
+
+        return now + self.ttl
+
+    def _write(self, url, meta, body):
+        """
+        Write an entry to disk and evict old entries if the cache is too big.
+        The body is left alone if it is None.
+
+        Args:
+            url: str
+            meta: dict
+            body: bytes or None
+
+        Returns:
+            self
+        """
+
+        key = self.key(url)
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            if body is not None:
+                with open(body_path + '.tmp', 'wb') as f:
+                    f.write(body)
+                _replace(body_path + '.tmp', body_path)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            _replace(meta_path + '.tmp', meta_path)
+
+            size = len(body) if body is not None else self._entries.get(key, 0)
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+        return self
+
+    def _evict(self):
+        while self._size > self.max_size and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """
+        Remove every response from the cache.
+
+        Returns:
+            self
+        """
+
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+        return self
+
+    @staticmethod
+    def _make_response(url, meta, body):
+        """
+        Build a `requests.Response` from a cached entry.
+
+        Args:
+            url: str
+            meta: dict
+            body: bytes
+
+        Returns:
+            requests.Response
+        """
+
+        response = Response()
+        response._content = body
+        response._content_consumed = True
+        response.status_code = meta['status_code']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = url
+        response.from_cache = True
+        return response
+
+
+def shared_cache(directory=None):
+    """
+    Get the process wide `ResponseCache` for a directory, so every
+    `WebReader` using the directory shares one index and size limit.
+
+    Args:
+        directory: str
+
+    Returns:
+        ResponseCache
+    """
+
+    if directory is None:
+        directory = env_setting('WEBREADER_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+    with _shared_caches_lock:
+        key = os.path.abspath(directory)
+        if key not in _shared_caches:
+            _shared_caches[key] = ResponseCache(directory)
+
+    return _shared_caches[key]
@@ -0,0 +1,534 @@
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import zlib
+from base64 import b64decode, b64encode
+from hashlib import md5
+from .Selectors import selector_cache
+from .Settings import env_setting
+
+try:
+    from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urljoin, urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+
+
+DEFAULT_CAPACITY = 1000000
+DEFAULT_ERROR_RATE = 0.0001
+DEFAULT_CHECKPOINT_INTERVAL = 100
+DEFAULT_BATCH_SIZE = 10
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+_UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _normalize_escapes(value):
+    """
+    Upper case percent escapes and decode the ones for unreserved
+    characters, so `%7e`, `%7E` and `~` are the same.
+
+    Args:
+        value: str
+
+    Returns:
+        str
+    """
+
+    def normalize(match):
+        character = chr(int(match.group(1), 16))
+        return character if character in _UNRESERVED else '%' + match.group(1).upper()
+
+    return _ESCAPE.sub(normalize, value)
+
+
+def _remove_dot_segments(path):
+    """
+    Resolve the `.` and `..` segments of a url path.
+
+    Args:
+        path: str
+
+    Returns:
+        str
+    """
+
+    segments = []
+    parts = path.split('/')
+    for part in parts[1:]:
+        if part == '..':
+            if segments:
+                segments.pop()
+        elif part != '.':
+            segments.append(part)
+    if parts[-1] in ('.', '..'):
+        segments.append('')
+    return '/' + '/'.join(segments)
+
+
+def canonicalize_url(url, base=None, ignore_params=()):
+    """
+    Turn a url into the one form used to tell if it has been seen: the url
+    is made absolute, the scheme and host are lower cased, default ports,
+    fragments and `ignore_params` query parameters are dropped, dot segments
+    and percent escapes are normalized and the query is sorted.  Urls that
+    aren't http or https give None.
+
+    Example:
+        canonicalize_url('../b/?z=1&a=2#top', base='HTTP://Example.com:80/a/c')
+        # 'http://example.com/b/?a=2&z=1'
+
+    Args:
+        url: str
+        base: str or None
+        ignore_params: iterable of query parameter names
+
+    Returns:
+        str or None
+    """
+
+    url = url.strip()
+    if base is not None:
+        url = urljoin(base, url)
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.rstrip('.')
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        host = '{}:{}'.format(host, port)
+    if parts.username is not None:
+        host = '{}@{}'.format(parts.netloc.rpartition('@')[0], host)
+
+    path = _remove_dot_segments(_normalize_escapes(parts.path or '/'))
+
+    query = ''
+    if parts.query:
+        params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if name not in ignore_params]
+        query = urlencode(sorted(params))
+
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class BloomFilter(object):
+    """
+    A fixed size set of strings that uses a few bits per item.  It can say
+    an item was added when it wasn't, about `error_rate` of the time once
+    `capacity` items have been added, but never the other way around.  A
+    million urls take under 3 MB at the default error rate.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / float(capacity) * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, item):
+        # Two hashes from one md5 give all of the bit positions.
+        first, second = struct.unpack('<QQ', md5(item.encode('utf-8')).digest())
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item):
+        """
+        Add an item.
+
+        Args:
+            item: str
+
+        Returns:
+            bool, False if the item looked like it was already added
+        """
+
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def to_dict(self):
+        """
+        Get the filter's state for a checkpoint.
+
+        Returns:
+            dict
+        """
+
+        return {
+            'size': self.size,
+            'hashes': self.hashes,
+            'count': self.count,
+            'bits': b64encode(zlib.compress(bytes(self.bits))).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild a filter from a checkpoint.
+
+        Args:
+            state: dict
+
+        Returns:
+            BloomFilter
+        """
+
+        bloom = cls.__new__(cls)
+        bloom.size = state['size']
+        bloom.hashes = state['hashes']
+        bloom.count = state['count']
+        bloom.bits = bytearray(zlib.decompress(b64decode(state['bits'])))
+        return bloom
+
+
+class Frontier(object):
+    """
+    The urls waiting to be crawled, highest priority first.  Urls with the
+    same priority come out in the order they went in.
+    """
+    def __init__(self):
+        self._heap = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, url, depth=0, priority=0):
+        """
+        Add a url to the frontier.
+
+        Args:
+            url: str
+            depth: int
+            priority: float, higher is crawled sooner
+
+        Returns:
+            self
+        """
+
+        self._counter += 1
+        heapq.heappush(self._heap, (-priority, self._counter, depth, url))
+        return self
+
+    def pop(self):
+        """
+        Take the highest priority url.
+
+        Returns:
+            tuple (str, int, float), the url, its depth and priority
+        """
+
+        priority, _, depth, url = heapq.heappop(self._heap)
+        return url, depth, -priority
+
+    def to_list(self):
+        """
+        Get the frontier's entries for a checkpoint.
+
+        Returns:
+            list
+        """
+
+        return [list(entry) for entry in self._heap]
+
+    @classmethod
+    def from_list(cls, entries):
+        """
+        Rebuild a frontier from a checkpoint.
+
+        Args:
+            entries: list
+
+        Returns:
+            Frontier
+        """
+
+        frontier = cls()
+        frontier._heap = [tuple(entry) for entry in entries]
+        heapq.heapify(frontier._heap)
+        frontier._counter = max([entry[1] for entry in entries] + [0])
+        return frontier
+
+
+class Crawler(object):
+    """
+    Crawls a site from some seed urls with a `WebReader`, following the links
+    on each page.  Urls are canonicalized and remembered in a `BloomFilter`
+    (or the `seen` set passed in), so each one is only crawled once and the
+    memory used stays flat however many urls are found.  Urls are crawled
+    highest `priority` first; by default shallower pages come first.
+
+    `max_depth` limits how many links are followed from a seed url,
+    `allowed_domains` limits the crawl to those hosts and their subdomains,
+    `max_per_domain` limits the pages crawled on each host and `max_pages`
+    the pages crawled in total.
+
+    If a `checkpoint` path is given, the frontier and seen urls are saved to
+    it every `checkpoint_interval` pages and when the crawl stops, and a
+    crawl started with the same path picks up where it left off.  Settings
+    that are not passed in are read from the `WEBREADER_CRAWL_*` .env keys.
+
+    Example:
+        crawler = Crawler(WebReader(), max_depth=3, allowed_domains=['example.com'], checkpoint='crawl.state')
+        crawler.add('https://example.com/')
+        for page in crawler.crawl():
+            if page.error is None:
+                save(page.current_url, page.find_element_by_tag_name('h1').text)
+    """
+    def __init__(self, reader=None, max_depth=None, allowed_domains=None, max_per_domain=None, max_pages=None,
+                 priority=None, link_selector='a[href]', ignore_params=(), seen=None, checkpoint=None,
+                 checkpoint_interval=None, batch_size=None):
+        if reader is None:
+            from . import WebReader
+            reader = WebReader()
+        if seen is None:
+            seen = BloomFilter(
+                env_setting('WEBREADER_CRAWL_CAPACITY', DEFAULT_CAPACITY, func=int),
+                env_setting('WEBREADER_CRAWL_ERROR_RATE', DEFAULT_ERROR_RATE, func=float)
+            )
+        if checkpoint_interval is None:
+            checkpoint_interval = env_setting('WEBREADER_CRAWL_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL,
+                                              func=int)
+        if batch_size is None:
+            batch_size = env_setting('WEBREADER_MAX_WORKERS', DEFAULT_BATCH_SIZE, func=int)
+
+        self.reader = reader
+        self.max_depth = max_depth
+        self.allowed_domains = [domain.lower() for domain in allowed_domains] if allowed_domains else None
+        self.max_per_domain = max_per_domain
+        self.max_pages = max_pages
+        self.priority = priority if priority is not None else lambda url, depth: -depth
+        self.link_selector = link_selector
+        self.ignore_params = frozenset(ignore_params)
+        self.seen = seen
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.batch_size = batch_size
+
+        self.frontier = Frontier()
+        self.pages = 0
+        self.domain_counts = {}
+        self._checkpointed_at = 0
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load_checkpoint()
+
+    @staticmethod
+    def host(url):
+        """
+        Get the host name of a canonical url.
+
+        Args:
+            url: str
+
+        Returns:
+            str
+        """
+
+        return urlsplit(url).hostname or ''
+
+    def allowed(self, url, depth):
+        """
+        Check if a url is within the crawl's depth and domain limits.
+
+        Args:
+            url: str
+            depth: int
+
+        Returns:
+            bool
+        """
+
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+
+        host = self.host(url)
+        if self.allowed_domains is not None and not any(
+            host == domain or host.endswith('.' + domain) for domain in self.allowed_domains
+        ):
+            return False
+
+        return self.max_per_domain is None or self.domain_counts.get(host, 0) < self.max_per_domain
+
+    def add(self, url, depth=0, base=None):
+        """
+        Add a url to the frontier unless it has been seen or is outside of
+        the crawl's limits.
+
+        Args:
+            url: str
+            depth: int
+            base: str or None, the url relative urls are joined to
+
+        Returns:
+            bool, True if the url was added
+        """
+
+        url = canonicalize_url(url, base=base, ignore_params=self.ignore_params)
+        if url is None or url in self.seen or not self.allowed(url, depth):
+            return False
+
+        self.seen.add(url)
+        self.frontier.push(url, depth, self.priority(url, depth))
+        return True
+
+    def links(self, page):
+        """
+        Get the link urls on a page, as they are written in the page.
+
+        Args:
+            page: WebPage
+
+        Returns:
+            list
+        """
+
+        node = page.node
+        if node is None:
+            return []
+        return [element.get('href') for element in selector_cache.css(self.link_selector)(node)
+                if element.get('href')]
+
+    def _base_url(self, page):
+        """
+        Get the url the page's relative links are joined to: the url it came
+        from after any redirects, or the `<base href>` if the page has one.
+
+        Args:
+            page: WebPage
+
+        Returns:
+            str
+        """
+
+        url = getattr(page, 'final_url', page.current_url)
+        bases = page.node.xpath('//base[@href]/@href') if page.node is not None else []
+        return urljoin(url, bases[0]) if bases else url
+
+    def crawl(self):
+        """
+        Crawl until the frontier is empty or `max_pages` is reached, yielding
+        a `WebPage` for each url.  Up to `batch_size` pages are fetched at
+        once through the reader's connection pool, and the next url is taken
+        from the frontier as soon as any of them finishes, so one slow page
+        doesn't hold up the rest.  A page that fails to load has the
+        exception in `error` and its links aren't followed.
+
+        Returns:
+            generator
+        """
+
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        # future: (url, depth, priority)
+        pending = {}
+        executor = ThreadPoolExecutor(max(self.batch_size, 1))
+        try:
+            while True:
+                while self.frontier and len(pending) < self.batch_size:
+                    if self.max_pages is not None and self.pages + len(pending) >= self.max_pages:
+                        break
+                    url, depth, priority = self.frontier.pop()
+                    host = self.host(url)
+                    if self.max_per_domain is not None and self.domain_counts.get(host, 0) >= self.max_per_domain:
+                        continue
+                    self.domain_counts[host] = self.domain_counts.get(host, 0) + 1
+                    pending[executor.submit(self.reader._load_page, url)] = url, depth, priority
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, depth, _ = pending.pop(future)
+                    page = future.result()
+                    self.pages += 1
+                    if page.error is None:
+                        base = self._base_url(page)
+                        for link in self.links(page):
+                            self.add(link, depth + 1, base=base)
+                    yield page
+
+                if self.checkpoint is not None and self.pages - self._checkpointed_at >= self.checkpoint_interval:
+                    self.save_checkpoint()
+        finally:
+            # Urls taken from the frontier but not crawled yet go back on it,
+            # so a resumed crawl gets them.
+            for future, (url, depth, priority) in pending.items():
+                future.cancel()
+                self.domain_counts[self.host(url)] -= 1
+                self.frontier.push(url, depth, priority)
+            executor.shutdown(wait=False)
+            if self.checkpoint is not None:
+                self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """
+        Write the crawl's state to the checkpoint file.
+
+        Returns:
+            self
+        """
+
+        if isinstance(self.seen, BloomFilter):
+            seen = {'bloom': self.seen.to_dict()}
+        else:
+            seen = {'urls': list(self.seen)}
+
+        state = {
+            'frontier': self.frontier.to_list(),
+            'seen': seen,
+            'pages': self.pages,
+            'domain_counts': self.domain_counts,
+        }
+        with open(self.checkpoint + '.tmp', 'wb') as f:
+            f.write(zlib.compress(json.dumps(state).encode('utf-8')))
+        _replace(self.checkpoint + '.tmp', self.checkpoint)
+
+        self._checkpointed_at = self.pages
+        return self
+
+    def load_checkpoint(self):
+        """
+        Restore the crawl's state from the checkpoint file.
+
+        Returns:
+            self
+        """
+
+        with open(self.checkpoint, 'rb') as f:
+            state = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+
+        self.frontier = Frontier.from_list(state['frontier'])
+        if 'bloom' in state['seen']:
+            self.seen = BloomFilter.from_dict(state['seen']['bloom'])
+        else:
+            self.seen = set(state['seen']['urls'])
+        self.pages = state['pages']
+        self.domain_counts = state['domain_counts']
+
+        self._checkpointed_at = self.pages
+        return self
@@ -0,0 +1,410 @@
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO
+from threading import Lock
+from .Exceptions import DownloadError
+from .Settings import env_setting
+
+
+DEFAULT_SPOOL_SIZE = 8 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)')
+
+
+def content_range(header):
+    """
+    Read a Content-Range header like `bytes 0-499/1234` or `bytes */1234`.
+
+    Args:
+        header: str or None
+
+    Returns:
+        tuple (int or None, int or None, int or None), the first and last
+        byte sent and the total size, or None if the header is missing
+    """
+
+    match = _CONTENT_RANGE.match(header or '')
+    if match is None:
+        return None
+
+    first, last, total = match.groups()
+    return (
+        int(first) if first is not None else None,
+        int(last) if last is not None else None,
+        int(total) if total != '*' else None,
+    )
+
+
+class Download(object):
+    """
+    The body of a downloaded response, for files like PDFs, CSV exports and
+    images that shouldn't be decoded or held as one string.  The body is
+    written to `path`, or kept in memory until it is bigger than
+    `spool_size` bytes and in a temporary file after that.
+
+    `memoryview` gives the body without copying it, and `mmap` maps it from
+    its file.  A download to a `path` that was cut off is picked up where it
+    stopped with a range request, and servers that take range requests can
+    send a large file in parts at once.
+
+    Settings that are not passed in are read from the
+    `WEBREADER_DOWNLOAD_SPOOL_SIZE` and `WEBREADER_DOWNLOAD_PART_SIZE` .env
+    keys.
+
+    Example:
+        with reader.download('https://example.com/export.csv') as download:
+            rows = download.memoryview().tobytes().splitlines()
+    """
+    def __init__(self, url, path=None, spool_size=None, part_size=None):
+        if spool_size is None:
+            spool_size = env_setting('WEBREADER_DOWNLOAD_SPOOL_SIZE', DEFAULT_SPOOL_SIZE, func=int)
+        if part_size is None:
+            part_size = env_setting('WEBREADER_DOWNLOAD_PART_SIZE', DEFAULT_PART_SIZE, func=int)
+
+        self.url = url
+        self.path = path
+        self.spool_size = spool_size
+        self.part_size = part_size
+        self.status_code = None
+        self.headers = {}
+        # The size the server said the body is, if it did.
+        self.total_size = None
+        self._lock = Lock()
+        self._mmap = None
+
+        if path is None:
+            self._file = BytesIO()
+        else:
+            self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def in_memory(self):
+        return isinstance(self._file, BytesIO)
+
+    @property
+    def size(self):
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            return self._file.tell()
+
+    def _roll_over(self):
+        """
+        Move a body kept in memory to a temporary file.  Must be called with
+        the lock held.
+
+        Returns:
+            None
+        """
+
+        spooled = tempfile.TemporaryFile()
+        spooled.write(self._file.getvalue())
+        self._file.close()
+        self._file = spooled
+
+    def write(self, data, offset=None):
+        """
+        Write bytes at the offset, or at the end of the body if there is no
+        offset.  Parts downloaded at once write to their own offsets.
+
+        Args:
+            data: bytes
+            offset: int or None
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            if offset is None:
+                self._file.seek(0, os.SEEK_END)
+                offset = self._file.tell()
+            if self.in_memory and offset + len(data) > self.spool_size:
+                self._roll_over()
+            self._file.seek(offset)
+            self._file.write(data)
+
+    def truncate(self, size=0):
+        """
+        Cut the body off at `size` bytes.
+
+        Args:
+            size: int
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            self._file.seek(size)
+            self._file.truncate()
+
+    def reserve(self, size):
+        """
+        Make room for a body of `size` bytes before its parts are written.
+
+        Args:
+            size: int
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            if self.in_memory and size > self.spool_size:
+                self._roll_over()
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell() < size:
+                self._file.truncate(size)
+
+    def fetch(self, send, headers=None, resume=True, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Download the body by calling `send` with the request headers to get
+        a streamed response.  If `resume` is set, the bytes already in the
+        download are kept and only the rest is asked for.  With more than
+        one worker the body is asked for in `part_size` ranges, and if the
+        server sends the first one as a range, the rest are downloaded at
+        once.  Servers that ignore range requests send the whole body.
+
+        The body is asked for without a content encoding, so the sizes and
+        ranges the server sends line up with the bytes written.
+
+        Args:
+            send: function that takes the request headers
+            headers: dict
+            resume: bool
+            workers: int
+            chunk_size: int
+
+        Returns:
+            self
+        """
+
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = 'identity'
+        start = self.size if resume else 0
+        if not resume:
+            self.truncate(0)
+
+        request_headers = dict(headers)
+        if workers > 1:
+            request_headers['Range'] = 'bytes={}-{}'.format(start, start + self.part_size - 1)
+        elif start:
+            request_headers['Range'] = 'bytes={}-'.format(start)
+
+        response = send(request_headers)
+        try:
+            self.status_code = response.status_code
+            self.headers = response.headers
+            received = content_range(response.headers.get('Content-Range'))
+
+            if response.status_code == 416 and start and received is not None and received[2] == start:
+                # The body was already all there.
+                self.total_size = start
+                return self
+
+            if response.status_code == 200:
+                self.truncate(0)
+                length = response.headers.get('Content-Length')
+                self.total_size = int(length) if length and length.isdigit() else None
+                if self._encoded(response):
+                    # The length is of the encoded body, not the bytes written.
+                    self.total_size = None
+                self._write_response(response, 0, chunk_size)
+                return self._check_size()
+
+            response.raise_for_status()
+            if response.status_code != 206 or received is None or received[0] != start or self._encoded(response):
+                raise DownloadError('{} did not send the range asked for.'.format(self.url))
+
+            first, last, self.total_size = received
+            if self.total_size is not None and workers > 1:
+                self.reserve(self.total_size)
+            self._write_response(response, first, chunk_size)
+        finally:
+            response.close()
+
+        if self.total_size is not None and last + 1 < self.total_size:
+            self._fetch_parts(send, headers, last + 1, workers, chunk_size)
+
+        return self._check_size()
+
+    def _fetch_parts(self, send, headers, start, workers, chunk_size):
+        """
+        Download the body from `start` on in `part_size` ranges, `workers`
+        at a time.
+
+        Args:
+            send: function
+            headers: dict
+            start: int
+            workers: int
+            chunk_size: int
+
+        Returns:
+            None
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def fetch_part(first):
+            last = min(first + self.part_size, self.total_size) - 1
+            response = send(dict(headers, Range='bytes={}-{}'.format(first, last)))
+            try:
+                response.raise_for_status()
+                received = content_range(response.headers.get('Content-Range'))
+                if response.status_code != 206 or received is None or received[0] != first or \
+                        self._encoded(response):
+                    raise DownloadError('{} did not send the range asked for.'.format(self.url))
+                self._write_response(response, first, chunk_size)
+            finally:
+                response.close()
+
+        executor = ThreadPoolExecutor(max(workers, 1))
+        try:
+            # Wait on every part so an error is raised from the first one
+            # that failed.
+            for future in [executor.submit(fetch_part, first)
+                           for first in range(start, self.total_size, self.part_size)]:
+                future.result()
+        finally:
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _encoded(response):
+        """
+        Check whether a server sent the body with a content encoding, like
+        gzip, even though it was asked not to.  Its lengths and ranges are
+        then of the encoded bytes, not the decoded ones `iter_content` gives.
+
+        Args:
+            response: requests.Response
+
+        Returns:
+            bool
+        """
+
+        return response.headers.get('Content-Encoding', 'identity').strip().lower() not in ('', 'identity')
+
+    def _write_response(self, response, offset, chunk_size):
+        """
+        Write a streamed response's body at the offset.
+
+        Args:
+            response: requests.Response
+            offset: int
+            chunk_size: int
+
+        Returns:
+            None
+        """
+
+        for chunk in response.iter_content(chunk_size):
+            self.write(chunk, offset)
+            offset += len(chunk)
+
+    def _check_size(self):
+        """
+        Make sure the whole body arrived.
+
+        Returns:
+            self
+        """
+
+        if self.total_size is not None and self.size != self.total_size:
+            raise DownloadError('{} sent {} of {} bytes.'.format(self.url, self.size, self.total_size))
+        return self
+
+    def read(self):
+        """
+        Get the whole body.  This copies it; use `memoryview` to avoid that.
+
+        Returns:
+            bytes
+        """
+
+        with self._lock:
+            self._file.seek(0)
+            return self._file.read()
+
+    def save(self, path):
+        """
+        Copy the body to a file.
+
+        Args:
+            path: str
+
+        Returns:
+            str, the path
+        """
+
+        with self._lock:
+            self._file.seek(0)
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(self._file, f)
+        return path
+
+    def mmap(self):
+        """
+        Map the body from its file, moving it to a temporary file first if
+        it is in memory.  The map is read only and is closed with the
+        download.
+
+        Returns:
+            mmap.mmap
+        """
+
+        with self._lock:
+            if self._mmap is None:
+                if self.in_memory:
+                    self._roll_over()
+                self._file.flush()
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap
+
+    def memoryview(self):
+        """
+        Get the body without copying it: the buffer of a body in memory, or
+        a map of its file.  Release the view before writing to the download.
+
+        Returns:
+            memoryview
+        """
+
+        if self.in_memory:
+            getbuffer = getattr(self._file, 'getbuffer', None)
+            if getbuffer is not None:
+                return getbuffer()
+            return memoryview(self._file.getvalue())
+
+        if self.size == 0:
+            return memoryview(b'')
+        return memoryview(self.mmap())
+
+    def close(self):
+        """
+        Close the body's map and file.  A temporary file is deleted.
+
+        Returns:
+            self
+        """
+
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+        return self
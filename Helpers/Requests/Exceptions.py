@@ -1,4 +1,38 @@
 
 
-class NoSuchElementException(Exception):
+try:
+    from selenium.common.exceptions import NoSuchElementException as _SeleniumNoSuchElementException
+except ImportError:
+    _SeleniumNoSuchElementException = Exception
+
+
+class NoSuchElementException(_SeleniumNoSuchElementException):
+    """
+    Raised when a lookup finds nothing.  It is a selenium
+    `NoSuchElementException`, so code written for a WebDriver catches it.
+    """
+    pass
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request to a host that has been failing, until
+    the host's circuit breaker lets a trial request through again.
+    """
+    pass
+
+
+class NotArchivedError(KeyError):
+    """
+    Raised when a `WebReader` replaying an archive is asked for a url that
+    was never recorded.
+    """
+    pass
+
+
+class DownloadError(IOError):
+    """
+    Raised when a download is cut short, or the server sends a different
+    part of the file than the one asked for.
+    """
     pass
@@ -0,0 +1,332 @@
+from selenium.common.exceptions import NoSuchElementException as SeleniumNoSuchElementException, WebDriverException
+from . import WebElement, WebReader
+from .Selectors import scope_xpath
+from .Settings import env_setting
+
+
+def default_browser():
+    """
+    Start the browser set by the `BROWSER` .env key.
+
+    Returns:
+        selenium WebDriver
+    """
+
+    from ...Environment import env_driver
+
+    return env_driver(env_setting('BROWSER', 'chrome'))()
+
+
+class HybridElement(WebElement):
+    """
+    An element found by a `HybridDriver`.  It is read from the page like any
+    other `WebElement`, but it remembers how it was found, so interacting
+    with it starts the driver's browser, finds the same element there and
+    acts on that instead.
+    """
+    __slots__ = ('driver', 'locator')
+
+    def __init__(self, node, response, url, driver, locator, parent=None, index=None):
+        super(HybridElement, self).__init__(node, response, url, parent=parent, index=index)
+        self.driver = driver
+        self.locator = locator
+
+    def _find(self, by, value):
+        """
+        Get the first HybridElement under this element matching the given
+        value.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            HybridElement
+        """
+
+        element = super(HybridElement, self)._find(by, value)
+        return HybridElement(element.node, self._response, self.current_url, self.driver,
+                             self.locator + ((by, value, 0),), parent=self.id, index=self._index)
+
+    def _find_elements(self, by, value):
+        """
+        Get all of the HybridElements under this element matching the given
+        value.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            list
+        """
+
+        return [
+            HybridElement(node, self._response, self.current_url, self.driver,
+                          self.locator + ((by, value, position),), parent=self.id, index=self._index)
+            for position, node in enumerate(self._find_all(by, value))
+        ]
+
+    def browser_element(self):
+        """
+        Get the selenium WebElement for this element, starting the browser if
+        it isn't running yet.
+
+        Returns:
+            selenium WebElement
+        """
+
+        return self.driver.locate(self.locator)
+
+    def _interact(self, action, *args):
+        result = getattr(self.browser_element(), action)(*args)
+        self.driver.current_url = self.driver.browser.current_url
+        return result
+
+    def clear(self):
+        return self._interact('clear')
+
+    def click(self):
+        return self._interact('click')
+
+    def send_keys(self, *value):
+        return self._interact('send_keys', *value)
+
+    def submit(self):
+        return self._interact('submit')
+
+
+class HybridDriver(WebReader):
+    """
+    A `WebReader` that only starts a browser when it is needed.  Pages are
+    fetched and read over http, and the first `click`, `send_keys`, `submit`,
+    `clear`, `execute_script` or `switch_to` on a page starts the browser (or
+    reuses the one already started), hands it the session's cookies and
+    loads the page in it.  From then on lookups on that page go to the
+    browser.  The next `get`, `back` or `forward` hands the browser's cookies
+    back to the session and goes back to reading over http.
+
+    `browser_factory` is a function that returns a new selenium WebDriver.
+    By default the browser set by the `BROWSER` .env key is started.  Any
+    other keyword arguments are passed on to the `WebReader`.
+
+    Example:
+        driver = HybridDriver()
+        driver.get('https://example.com/search')
+        results = driver.find_elements_by_class_name('result')  # read over http
+        driver.find_element_by_name('q').send_keys('selenext')  # starts the browser
+    """
+    def __init__(self, browser_factory=None, **kwargs):
+        self.browser_factory = browser_factory if browser_factory is not None else default_browser
+        self.browser = None
+        self.escalated = False
+        super(HybridDriver, self).__init__(**kwargs)
+
+    def get(self, url, headers=None, add_to_history=True, cookies=None):
+        """
+        Get the page for the url over http.  If the last page was in the
+        browser, its cookies are handed back to the session first.
+
+        Args:
+            url:
+            headers:
+            add_to_history:
+            cookies:
+
+        Returns:
+            ResponseBody, or the decoded json
+        """
+
+        self._leave_browser()
+        return super(HybridDriver, self).get(url, headers=headers, add_to_history=add_to_history, cookies=cookies)
+
+    def _visit(self, url):
+        """
+        Show a history entry over http, handing the browser's cookies back
+        to the session first if the last page was in the browser.
+
+        Args:
+            url:
+
+        Returns:
+            None
+        """
+
+        self._leave_browser()
+        super(HybridDriver, self)._visit(url)
+
+    def revalidate(self, headers=None, cookies=None):
+        """
+        Fetch the current page again over http if it has changed.  A page in
+        the browser is already live, so it is never fetched again.
+
+        Args:
+            headers:
+            cookies:
+
+        Returns:
+            bool, True if the page changed
+        """
+
+        if self.escalated:
+            return False
+        return super(HybridDriver, self).revalidate(headers=headers, cookies=cookies)
+
+    def _leave_browser(self):
+        """
+        Go back to reading over http, copying the browser's cookies into the
+        session if the page was in the browser.
+
+        Returns:
+            None
+        """
+
+        if self.escalated:
+            self._cookies_to_session()
+            self.escalated = False
+
+    def escalate(self):
+        """
+        Load the current page in the browser, starting it if needed and
+        handing it the session's cookies.
+
+        Returns:
+            selenium WebDriver
+        """
+
+        if self.escalated:
+            return self.browser
+
+        if self.browser is None:
+            self.browser = self.browser_factory()
+
+        # Cookies can only be set for the domain the browser is on.
+        self.browser.get(self.current_url)
+        for cookie in self.session.cookies:
+            browser_cookie = {'name': cookie.name, 'value': cookie.value, 'path': cookie.path or '/',
+                              'secure': bool(cookie.secure)}
+            if cookie.domain_specified:
+                browser_cookie['domain'] = cookie.domain
+            try:
+                self.browser.add_cookie(browser_cookie)
+            except WebDriverException:
+                # Cookies for other domains are refused.
+                pass
+        self.browser.get(self.current_url)
+
+        self.escalated = True
+        return self.browser
+
+    def _cookies_to_session(self):
+        """
+        Copy the browser's cookies into the session.
+
+        Returns:
+            None
+        """
+
+        for cookie in self.browser.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+                                     path=cookie.get('path', '/'))
+
+    def locate(self, locator):
+        """
+        Find an element in the browser by following the lookups it was found
+        with over http.
+
+        Args:
+            locator: tuple of (by, value, index) tuples
+
+        Returns:
+            selenium WebElement
+        """
+
+        element = self.escalate()
+        for depth, (by, value, index) in enumerate(locator):
+            # Lookups from an element are scoped to its subtree, like they
+            # are in the WebReader.
+            if by == 'xpath' and depth > 0:
+                value = scope_xpath(value)
+            elements = element.find_elements(by, value)
+            if len(elements) <= index:
+                raise SeleniumNoSuchElementException(
+                    'The element could not be located in the browser by {}: {}'.format(by, value)
+                )
+            element = elements[index]
+        return element
+
+    def _find(self, by, value):
+        """
+        Get the first element on the page matching the given value, from the
+        browser if the page is in it.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            HybridElement or selenium WebElement
+        """
+
+        if self.escalated:
+            return self.browser.find_element(by, value)
+
+        element = super(HybridDriver, self)._find(by, value)
+        return HybridElement(element.node, self._response, self.current_url, self, ((by, value, 0),),
+                             parent=self.id, index=self._index)
+
+    def _find_elements(self, by, value):
+        """
+        Get all of the elements on the page matching the given value, from
+        the browser if the page is in it.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            list
+        """
+
+        if self.escalated:
+            return self.browser.find_elements(by, value)
+
+        return [
+            HybridElement(node, self._response, self.current_url, self, ((by, value, position),), parent=self.id,
+                          index=self._index)
+            for position, node in enumerate(self._find_all(by, value))
+        ]
+
+    def execute_script(self, script, *args):
+        return self.escalate().execute_script(script, *args)
+
+    def execute_async_script(self, script, *args):
+        return self.escalate().execute_async_script(script, *args)
+
+    @property
+    def page_source(self):
+        if self.escalated:
+            return self.browser.page_source
+        return self.current_response
+
+    @property
+    def switch_to(self):
+        return self.escalate().switch_to
+
+    def switch_to_default_content(self):
+        if self.escalated:
+            self.browser.switch_to.default_content()
+
+    def quit(self):
+        """
+        Quit the browser if it was started and close the session.
+
+        Returns:
+            self
+        """
+
+        if self.browser is not None:
+            self.browser.quit()
+            self.browser = None
+            self.escalated = False
+        return super(HybridDriver, self).quit()
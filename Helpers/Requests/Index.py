@@ -0,0 +1,101 @@
+import re
+from lxml import etree
+
+
+# Scoped lookups check each match is under the element, which costs a walk
+# up the tree for each one.  With more matches than this, scanning the
+# element's subtree is cheaper.
+SCOPED_LOOKUP_LIMIT = 64
+
+# Class names are separated by ASCII whitespace only, so a class name can
+# have a non-breaking space in it.
+_CLASS_SEPARATOR = re.compile('[ \t\n\r\f]+')
+
+
+class DocumentIndex(object):
+    """
+    The id, name and class attributes of every element in a document, built
+    in one pass over the document the first time it is used.  Lookups by id,
+    name or class name are then a dict lookup instead of a scan of the whole
+    tree.  The matches for each value are in document order.
+
+    The index belongs to one parsed document, so a new one is made whenever
+    a new document is loaded.  Documents that change as they are read, like
+    the ones `WebReader.stream_elements` builds, must not be indexed.
+    """
+    __slots__ = ('root', '_attributes')
+
+    def __init__(self, root):
+        self.root = root
+        self._attributes = None
+
+    def _build(self):
+        """
+        Index the document.
+
+        Returns:
+            dict
+        """
+
+        ids = {}
+        names = {}
+        classes = {}
+        for node in self.root.iter(etree.Element):
+            attributes = node.attrib
+            value = attributes.get('id')
+            if value is not None:
+                ids.setdefault(value, []).append(node)
+            value = attributes.get('name')
+            if value is not None:
+                names.setdefault(value, []).append(node)
+            value = attributes.get('class')
+            if value:
+                for class_name in set(_CLASS_SEPARATOR.split(value)):
+                    if class_name:
+                        classes.setdefault(class_name, []).append(node)
+
+        return {'id': ids, 'name': names, 'class name': classes}
+
+    def find(self, by, value):
+        """
+        Get the nodes in the document with the given id, name or class name.
+        Returns None for lookups the index can't answer, like a class name
+        with spaces in it.
+
+        Args:
+            by: str, 'id', 'name' or 'class name'
+            value: str
+
+        Returns:
+            list or None
+        """
+
+        if by == 'class name' and (not value or _CLASS_SEPARATOR.search(value)):
+            return None
+
+        if self._attributes is None:
+            self._attributes = self._build()
+
+        return self._attributes[by].get(value, [])
+
+    def find_under(self, node, by, value):
+        """
+        Get the nodes under the given node with the given id, name or class
+        name.  Returns None if the index can't answer the lookup, or if there
+        are so many matches in the document that scanning the node's subtree
+        would be quicker.
+
+        Args:
+            node: lxml node
+            by: str
+            value: str
+
+        Returns:
+            list or None
+        """
+
+        nodes = self.find(by, value)
+        if nodes is None or len(nodes) > SCOPED_LOOKUP_LIMIT:
+            return None
+
+        return [match for match in nodes if any(ancestor is node for ancestor in match.iterancestors())]
@@ -0,0 +1,142 @@
+import codecs
+import re
+from json import JSONDecoder, loads
+
+
+_JSON_START = re.compile(br'\s*[\[{]')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def is_json_content_type(content_type):
+    """
+    Check if a Content-Type header is for a json document, like
+    `application/json`, `text/json` or `application/ld+json`.
+
+    Args:
+        content_type: str or None
+
+    Returns:
+        bool
+    """
+
+    mime_type = (content_type or '').split(';')[0].strip().lower()
+    return mime_type in ('application/json', 'text/json') or mime_type.endswith('+json')
+
+
+def looks_like_json(content_type, body):
+    """
+    Check if a response is json.  The Content-Type header is trusted when
+    there is one, and only responses without one have the start of their
+    body checked.  A body that only looks like json, like a log line that
+    starts with `[INFO]`, may still fail to decode.
+
+    Args:
+        content_type: str or None
+        body: bytes
+
+    Returns:
+        bool
+    """
+
+    if is_json_content_type(content_type):
+        return True
+
+    if (content_type or '').strip():
+        return False
+
+    return _JSON_START.match(body) is not None
+
+
+def loads_bytes(body, encoding=None):
+    """
+    Decode a json response body straight from bytes.
+
+    Args:
+        body: bytes
+        encoding: str or None
+
+    Returns:
+        dict or list
+    """
+
+    if encoding is not None:
+        return loads(body.decode(encoding))
+    # json.loads detects utf-8/16/32 itself.
+    return loads(body)
+
+
+def iter_json_array(chunks, encoding=None):
+    """
+    Yield the items of a json array one at a time from an iterable of byte
+    chunks, without holding the whole document in memory.
+
+    Args:
+        chunks: iterable
+        encoding: str or None
+
+    Returns:
+        generator
+    """
+
+    decoder = JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding or 'utf-8')('strict')
+    chunks = iter(chunks)
+    buffer = u''
+    position = 0
+    finished = False
+    need_more = True
+    started = False
+    expect_item = True
+    item_count = 0
+
+    while True:
+        if need_more:
+            if finished:
+                raise ValueError('The json array is cut off or is not valid json.')
+            # Drop the part of the buffer that has already been read.
+            try:
+                buffer = buffer[position:] + text_decoder.decode(next(chunks))
+            except StopIteration:
+                buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+                finished = True
+            position = 0
+            need_more = False
+
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            need_more = True
+            continue
+
+        character = buffer[position]
+        if not started:
+            if character != '[':
+                raise ValueError('Expected a json array, got: {}'.format(buffer[position:position + 20]))
+            started = True
+            position += 1
+            continue
+
+        if character == ']' and (not expect_item or item_count == 0):
+            return
+
+        if not expect_item:
+            if character != ',':
+                raise ValueError('Expected "," or "]" in the json array, got: {}'.format(character))
+            position += 1
+            expect_item = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            end = None
+
+        # A value that runs to the end of the buffer may be cut off, like a
+        # number split between two chunks, so read more before trusting it.
+        if end is None or (end == len(buffer) and not finished):
+            need_more = True
+            continue
+
+        position = end
+        expect_item = False
+        item_count += 1
+        yield item
@@ -0,0 +1,149 @@
+from threading import local
+from lxml import html
+from .Settings import env_setting
+
+
+DEFAULT_PARSER = 'lxml'
+
+# lxml parsers can't be shared between threads, so each thread keeps its
+# own parser for each encoding.
+_byte_parsers = local()
+
+
+def _byte_parser(encoding):
+    """
+    Get this thread's lxml html parser for bytes in the given encoding.
+
+    Args:
+        encoding: str or None
+
+    Returns:
+        lxml.html.HTMLParser
+    """
+
+    parsers = getattr(_byte_parsers, 'parsers', None)
+    if parsers is None:
+        parsers = _byte_parsers.parsers = {}
+
+    try:
+        return parsers[encoding]
+    except KeyError:
+        pass
+
+    try:
+        parser = html.HTMLParser(encoding=encoding)
+    except LookupError:
+        # An encoding lxml doesn't know; let it work the encoding out itself.
+        parser = html.HTMLParser()
+    parsers[encoding] = parser
+    return parser
+
+
+def parse_lxml(response, encoding=None):
+    """
+    Parse a html response straight into an lxml document without going
+    through BeautifulSoup.  This is the fastest parser.  Bytes are decoded
+    by lxml as it parses them, with the given encoding if there is one.
+
+    Args:
+        response: str or bytes
+        encoding: str or None
+
+    Returns:
+        lxml.html.HtmlElement
+    """
+
+    if isinstance(response, bytes):
+        return html.document_fromstring(response, parser=_byte_parser(encoding))
+
+    try:
+        return html.document_fromstring(response)
+    except ValueError:
+        # lxml refuses unicode strings that declare their own encoding.
+        return html.document_fromstring(response.encode('utf-8'))
+
+
+parse_lxml.accepts_bytes = True
+
+
+def soup_parser(features):
+    """
+    Make a parser that reads the response with BeautifulSoup and the given
+    BeautifulSoup parser, then converts the soup into an lxml document.  It
+    is slower than `parse_lxml`, but BeautifulSoup can be more forgiving
+    with badly broken html.
+
+    Args:
+        features: str
+
+    Returns:
+        function
+    """
+
+    def parse_soup(response, encoding=None):
+        from lxml.html import soupparser
+
+        if isinstance(response, bytes) and encoding is not None:
+            return soupparser.fromstring(response, features=features, from_encoding=encoding)
+        return soupparser.fromstring(response, features=features)
+
+    parse_soup.__name__ = 'parse_soup_{}'.format(features.replace('.', '_'))
+    parse_soup.accepts_bytes = True
+    return parse_soup
+
+
+PARSERS = {
+    'lxml': parse_lxml,
+    'html.parser': soup_parser('html.parser'),
+    'bs4-lxml': soup_parser('lxml'),
+    'html5lib': soup_parser('html5lib'),
+}
+
+
+def get_parser(parser=None):
+    """
+    Get the function used to parse html responses.  `parser` can be the name
+    of one of the `PARSERS` or a function that takes the response and returns
+    an lxml element.  Functions with an `accepts_bytes` attribute are given
+    the response bytes and their encoding instead of the decoded text.  If
+    `parser` is not set, the `WEBREADER_PARSER` .env key is used, and the
+    `lxml` parser if that is not set either.
+
+    Args:
+        parser: str or function
+
+    Returns:
+        function
+    """
+
+    if parser is None:
+        parser = env_setting('WEBREADER_PARSER', DEFAULT_PARSER)
+
+    if callable(parser):
+        return parser
+
+    try:
+        return PARSERS[parser]
+    except KeyError:
+        raise ValueError('Unknown parser: {}.  Use one of: {}'.format(parser, ', '.join(sorted(PARSERS))))
+
+
+def parse_html(response, parser=None, encoding=None):
+    """
+    Parse a html response into an lxml document and return the root element.
+
+    Args:
+        response: str or bytes
+        parser: str or function
+        encoding: str or None, the encoding of a bytes response
+
+    Returns:
+        lxml.html.HtmlElement
+    """
+
+    parser = get_parser(parser)
+    if getattr(parser, 'accepts_bytes', False):
+        return parser(response, encoding)
+    if isinstance(response, bytes):
+        response = response.decode(encoding or 'utf-8', 'replace')
+    return parser(response)
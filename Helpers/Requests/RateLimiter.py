@@ -0,0 +1,181 @@
+import time
+from threading import Lock
+from .Settings import env_setting
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+
+clock = getattr(time, 'monotonic', time.time)
+
+_shared_rate_limiter = None
+_shared_rate_limiter_lock = Lock()
+
+
+def _parse_rate(value):
+    """
+    Read a rate from the .env file.  It is either `rate` or `rate,burst`.
+
+    Args:
+        value: str
+
+    Returns:
+        tuple (float, float or None)
+    """
+
+    rate, _, burst = str(value).partition(',')
+    return float(rate), float(burst) if burst.strip() else None
+
+
+class TokenBucket(object):
+    """
+    A token bucket that lets `rate` requests through per second, with up to
+    `burst` requests let through at once after a quiet spell.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = Lock()
+
+    def reserve(self):
+        """
+        Take a token and return how long to wait before using it.  The token
+        is taken right away, so waiting callers are served in order.
+
+        Returns:
+            float
+        """
+
+        with self._lock:
+            now = clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self):
+        """
+        Wait until a request is allowed through.
+
+        Returns:
+            float, the seconds waited
+        """
+
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter(object):
+    """
+    Paces requests with a token bucket for each host.  Each host has its own
+    bucket and nothing is locked while a thread sleeps, so threads waiting on
+    a slow host never hold up requests to other hosts.
+
+    `rate` is the requests per second allowed to each host and `burst` the
+    number of requests allowed through at once.  `host_rates` maps a host
+    name to its own rate, or a `(rate, burst)` tuple.  Hosts without a rate
+    are not limited.  Settings that are not passed in are read from the
+    `WEBREADER_RATE`, `WEBREADER_BURST` and `WEBREADER_HOST_RATES` .env keys:
+
+        WEBREADER_RATE=2
+        WEBREADER_BURST=5
+        WEBREADER_HOST_RATES{}:
+        www.example.com=0.5,1
+        WEBREADER_HOST_RATES{END}
+    """
+    def __init__(self, rate=None, burst=None, host_rates=None):
+        if rate is None:
+            rate = env_setting('WEBREADER_RATE', None, func=float)
+        if burst is None:
+            burst = env_setting('WEBREADER_BURST', None, func=float)
+        if host_rates is None:
+            host_rates = dict(
+                (host, _parse_rate(value)) for host, value in env_setting('WEBREADER_HOST_RATES', {}).items()
+            )
+
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = {}
+        for host, host_rate in host_rates.items():
+            if not isinstance(host_rate, (tuple, list)):
+                host_rate = host_rate, None
+            self.host_rates[host.lower()] = tuple(host_rate)
+
+        self._buckets = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def host(url):
+        """
+        Get the host name of a url.
+
+        Args:
+            url: str
+
+        Returns:
+            str
+        """
+
+        return (urlsplit(url).hostname or '').lower()
+
+    def bucket(self, host):
+        """
+        Get the token bucket for a host, or None if the host isn't limited.
+
+        Args:
+            host: str
+
+        Returns:
+            TokenBucket or None
+        """
+
+        try:
+            return self._buckets[host]
+        except KeyError:
+            pass
+
+        rate, burst = self.host_rates.get(host, (self.rate, self.burst))
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(rate, burst) if rate else None
+        return self._buckets[host]
+
+    def wait(self, url):
+        """
+        Wait until a request to the url's host is allowed through.
+
+        Args:
+            url: str
+
+        Returns:
+            float, the seconds waited
+        """
+
+        bucket = self.bucket(self.host(url))
+        if bucket is None:
+            return 0.0
+        return bucket.acquire()
+
+
+def shared_rate_limiter():
+    """
+    Get the process wide `RateLimiter`, set up from the .env file.  The
+    `WebReader` and `View.get` use it unless they are given another one.
+
+    Returns:
+        RateLimiter
+    """
+
+    global _shared_rate_limiter
+
+    with _shared_rate_limiter_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter()
+
+    return _shared_rate_limiter
@@ -0,0 +1,229 @@
+import time
+from random import uniform
+from threading import Lock
+import requests
+from .Cache import http_date
+from .Exceptions import CircuitOpenError
+from .RateLimiter import RateLimiter, clock
+from .Settings import env_setting
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 60.0
+
+# Statuses worth trying again, and the ones that mean the host is in trouble.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+FAILURE_STATUSES = frozenset([500, 502, 503, 504])
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+_shared_circuit_breaker = None
+_shared_circuit_breaker_lock = Lock()
+
+
+class CircuitBreaker(object):
+    """
+    Keeps track of failing hosts.  Once a host fails `threshold` times in a
+    row, its circuit opens and requests to it fail straight away with a
+    `CircuitOpenError` for `reset_timeout` seconds.  After that one trial
+    request is let through; the circuit closes again if it works and stays
+    open for another `reset_timeout` if it doesn't.
+
+    Settings that are not passed in are read from the
+    `WEBREADER_BREAKER_THRESHOLD` and `WEBREADER_BREAKER_RESET` .env keys.
+    """
+    def __init__(self, threshold=None, reset_timeout=None):
+        if threshold is None:
+            threshold = env_setting('WEBREADER_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD, func=int)
+        if reset_timeout is None:
+            reset_timeout = env_setting('WEBREADER_BREAKER_RESET', DEFAULT_BREAKER_RESET, func=float)
+
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        # host: [failures in a row, time the circuit opened or None]
+        self._hosts = {}
+        self._lock = Lock()
+
+    def is_open(self, host):
+        """
+        Check if requests to the host are being refused.
+
+        Args:
+            host: str
+
+        Returns:
+            bool
+        """
+
+        with self._lock:
+            _, opened_at = self._hosts.get(host, (0, None))
+            return opened_at is not None and clock() - opened_at < self.reset_timeout
+
+    def before_request(self, host):
+        """
+        Raise a `CircuitOpenError` if the host's circuit is open.  When the
+        reset timeout has passed, the caller is let through as the trial
+        request and the timeout starts again for everyone else.
+
+        Args:
+            host: str
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state[1] is None:
+                return
+            if clock() - state[1] < self.reset_timeout:
+                raise CircuitOpenError('The circuit for {} is open after {} failures.'.format(host, state[0]))
+            state[1] = clock()
+
+    def record_success(self, host):
+        """
+        Close the host's circuit after a request to it worked.
+
+        Args:
+            host: str
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host):
+        """
+        Count a failed request to the host, opening its circuit once it has
+        failed `threshold` times in a row.
+
+        Args:
+            host: str
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, None])
+            state[0] += 1
+            if state[0] >= self.threshold:
+                state[1] = clock()
+
+
+class RetryPolicy(object):
+    """
+    Retries failed requests with exponential backoff and full jitter.
+    Connection errors, timeouts and the `RETRY_STATUSES` are tried up to
+    `retries` more times.  A `Retry-After` header is honoured, unless it asks
+    for a longer wait than `max_backoff`, in which case the response is
+    returned instead of tying the worker up.
+
+    Settings that are not passed in are read from the `WEBREADER_RETRIES`,
+    `WEBREADER_BACKOFF` and `WEBREADER_MAX_BACKOFF` .env keys.
+    """
+    def __init__(self, retries=None, backoff=None, max_backoff=None):
+        if retries is None:
+            retries = env_setting('WEBREADER_RETRIES', DEFAULT_RETRIES, func=int)
+        if backoff is None:
+            backoff = env_setting('WEBREADER_BACKOFF', DEFAULT_BACKOFF, func=float)
+        if max_backoff is None:
+            max_backoff = env_setting('WEBREADER_MAX_BACKOFF', DEFAULT_MAX_BACKOFF, func=float)
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt, response=None):
+        """
+        Get how long to wait before the next attempt.
+
+        Args:
+            attempt: int, the number of attempts made so far
+            response: requests.Response or None
+
+        Returns:
+            float
+        """
+
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    date = http_date(retry_after)
+                    if date is not None:
+                        return max(0.0, date - time.time())
+
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def call(self, url, send, circuit_breaker=None):
+        """
+        Call `send` to make the request for the url, retrying it if it fails.
+
+        Args:
+            url: str
+            send: function
+            circuit_breaker: CircuitBreaker or None
+
+        Returns:
+            requests.Response
+        """
+
+        host = RateLimiter.host(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if circuit_breaker is not None:
+                circuit_breaker.before_request(host)
+
+            try:
+                response = send()
+            except RETRY_EXCEPTIONS:
+                if circuit_breaker is not None:
+                    circuit_breaker.record_failure(host)
+                if attempt > self.retries:
+                    raise
+                time.sleep(self.delay(attempt))
+                continue
+
+            # A 429 means the host is up but wants to be left alone for a
+            # while, so it neither closes the circuit nor counts against it.
+            if circuit_breaker is not None:
+                if response.status_code in FAILURE_STATUSES:
+                    circuit_breaker.record_failure(host)
+                elif response.status_code not in RETRY_STATUSES:
+                    circuit_breaker.record_success(host)
+
+            if response.status_code not in RETRY_STATUSES or attempt > self.retries:
+                return response
+
+            delay = self.delay(attempt, response)
+            if delay > self.max_backoff:
+                return response
+
+            response.close()
+            time.sleep(delay)
+
+
+def shared_circuit_breaker():
+    """
+    Get the process wide `CircuitBreaker`, so every `WebReader` knows which
+    hosts are down.
+
+    Returns:
+        CircuitBreaker
+    """
+
+    global _shared_circuit_breaker
+
+    with _shared_circuit_breaker_lock:
+        if _shared_circuit_breaker is None:
+            _shared_circuit_breaker = CircuitBreaker()
+
+    return _shared_circuit_breaker
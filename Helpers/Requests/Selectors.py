@@ -0,0 +1,230 @@
+from collections import OrderedDict
+from threading import Lock
+from cssselect import HTMLTranslator, parse
+from lxml import etree
+from .Settings import env_setting
+
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class SelectorCache(object):
+    """
+    A least recently used cache of compiled XPath expressions and css
+    selectors.  The same selectors from the page JSON files get used over
+    and over, so they are only compiled the first time they are seen.
+    `hits` and `misses` count how often a compiled selector was reused.
+    """
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._compiled = OrderedDict()
+        self._lock = Lock()
+        self._translator = HTMLTranslator()
+
+    def __len__(self):
+        return len(self._compiled)
+
+    def _get(self, key, compile_function):
+        """
+        Get the compiled selector for the key, compiling and storing it if
+        it isn't cached.
+
+        Args:
+            key: tuple
+            compile_function: function
+
+        Returns:
+            lxml.etree.XPath
+        """
+
+        with self._lock:
+            try:
+                compiled = self._compiled.pop(key)
+                self._compiled[key] = compiled
+                self.hits += 1
+                return compiled
+            except KeyError:
+                self.misses += 1
+
+        # Compile outside of the lock; two threads compiling the same
+        # selector at once is harmless.
+        compiled = compile_function()
+
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_size:
+                self._compiled.popitem(last=False)
+
+        return compiled
+
+    def xpath(self, expression):
+        """
+        Get the compiled XPath for the expression.
+
+        Args:
+            expression: str
+
+        Returns:
+            lxml.etree.XPath
+        """
+
+        return self._get(('xpath', expression), lambda: etree.XPath(expression))
+
+    def css(self, selector, axis='descendant-or-self'):
+        """
+        Get the compiled XPath for the css selector, matching elements on the
+        given XPath axis.
+
+        Args:
+            selector: str
+            axis: str
+
+        Returns:
+            lxml.etree.XPath
+        """
+
+        return self._get(
+            ('css', selector, axis),
+            lambda: etree.XPath(self._translator.css_to_xpath(selector, prefix=axis + '::'))
+        )
+
+    def stats(self):
+        """
+        Get the cache's hit and miss counts.
+
+        Returns:
+            dict
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self), 'max_size': self.max_size}
+
+    def clear(self):
+        """
+        Remove every compiled selector and reset the counters.
+
+        Returns:
+            self
+        """
+
+        with self._lock:
+            self._compiled.clear()
+            self.hits = 0
+            self.misses = 0
+        return self
+
+
+def _closing_paren(expression, start):
+    """
+    Find the `)` that closes the `(` at `start`, skipping over quoted strings.
+
+    Args:
+        expression: str
+        start: int
+
+    Returns:
+        int, or -1 if it isn't closed
+    """
+
+    depth = 0
+    quote = None
+    for position in range(start, len(expression)):
+        character = expression[position]
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in '"\'':
+            quote = character
+        elif character in '([':
+            depth += 1
+        elif character in ')]':
+            depth -= 1
+            if depth == 0:
+                return position
+    return -1
+
+
+def _union_branches(expression):
+    """
+    Split an XPath on the `|` unions that aren't inside brackets, parentheses
+    or quoted strings.
+
+    Args:
+        expression: str
+
+    Returns:
+        list
+    """
+
+    branches = []
+    depth = 0
+    quote = None
+    start = 0
+    for position, character in enumerate(expression):
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in '"\'':
+            quote = character
+        elif character in '([':
+            depth += 1
+        elif character in ')]':
+            depth -= 1
+        elif character == '|' and depth == 0:
+            branches.append(expression[start:position])
+            start = position + 1
+    branches.append(expression[start:])
+    return branches
+
+
+def scope_xpath(expression):
+    """
+    Make the absolute paths in an XPath relative to the node it is run from,
+    so a lookup from an element only matches the element's subtree.  Every
+    branch of a union is scoped, and so are paths in parentheses, like
+    `(//p)[1]`.
+
+    Args:
+        expression: str
+
+    Returns:
+        str
+    """
+
+    branches = []
+    for branch in _union_branches(expression):
+        path = branch.lstrip()
+        lead = branch[:len(branch) - len(path)]
+        if path.startswith('/'):
+            branch = lead + '.' + path
+        elif path.startswith('('):
+            close = _closing_paren(path, 0)
+            if close != -1:
+                branch = lead + '(' + scope_xpath(path[1:close]) + path[close:]
+        branches.append(branch)
+    return '|'.join(branches)
+
+
+def sibling_combinators(selector):
+    """
+    Get the sibling combinators, `+` and `~`, used in a css selector.
+
+    Args:
+        selector: str
+
+    Returns:
+        set
+    """
+
+    found = set()
+    for parsed in parse(selector):
+        tree = parsed.parsed_tree
+        while hasattr(tree, 'combinator'):
+            if tree.combinator in ('+', '~'):
+                found.add(tree.combinator)
+            tree = tree.selector
+    return found
+
+
+selector_cache = SelectorCache(env_setting('WEBREADER_SELECTOR_CACHE_SIZE', DEFAULT_CACHE_SIZE, func=int))
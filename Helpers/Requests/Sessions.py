@@ -0,0 +1,75 @@
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+from .Settings import env_setting, env_bool
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_POOL_BLOCK = False
+
+_shared_session = None
+_shared_session_lock = Lock()
+
+
+def make_session(pool_connections=None, pool_maxsize=None, pool_block=None, headers=None):
+    """
+    Create a `requests.Session` that keeps connections alive and pools them
+    per host.  Any setting that is not passed in is read from the .env file
+    (`WEBREADER_POOL_CONNECTIONS`, `WEBREADER_POOL_MAXSIZE` and
+    `WEBREADER_POOL_BLOCK`) before falling back to the defaults.
+
+    `pool_connections` is the number of hosts to keep a pool for and
+    `pool_maxsize` is the number of connections kept open to each host.  Set
+    `pool_block` to make threads wait for a free connection instead of
+    opening extra connections once a host's pool is full.
+
+    Args:
+        pool_connections: int
+        pool_maxsize: int
+        pool_block: bool
+        headers: dict
+
+    Returns:
+        requests.Session
+    """
+
+    if pool_connections is None:
+        pool_connections = env_setting('WEBREADER_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS, func=int)
+    if pool_maxsize is None:
+        pool_maxsize = env_setting('WEBREADER_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE, func=int)
+    if pool_block is None:
+        pool_block = env_setting('WEBREADER_POOL_BLOCK', DEFAULT_POOL_BLOCK, func=env_bool)
+
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+
+    return session
+
+
+def shared_session():
+    """
+    Get the process wide session.  Pass it to each `WebReader` that should
+    share the same connection pool and cookies.
+
+    Example:
+        session = shared_session()
+        reader1 = WebReader(session=session)
+        reader2 = WebReader(session=session)
+
+    Returns:
+        requests.Session
+    """
+
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = make_session()
+
+    return _shared_session
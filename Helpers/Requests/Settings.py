@@ -0,0 +1,39 @@
+def env_setting(variable_name, default, func=lambda x: x):
+    """
+    Get a WebReader setting from the project's .env file.  The `WebReader`
+    can be used outside of a selenext project, so the default is returned
+    when there is no .env file or the key is not defined in it.
+
+    Args:
+        variable_name: string
+        default: mixed
+        func: function
+
+    Returns:
+        mixed
+    """
+
+    try:
+        from ...Environment import env
+        value = env(variable_name)
+    except (KeyError, IOError, OSError, ImportError, ValueError):
+        return default
+
+    if value in ('None', ''):
+        return default
+
+    return func(value)
+
+
+def env_bool(value):
+    """
+    Convert a .env value like `True` or `false` to a bool.
+
+    Args:
+        value: string
+
+    Returns:
+        bool
+    """
+
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
@@ -1,20 +1,106 @@
+import time
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from .RateLimiter import clock
+
+
+DEFAULT_MAX_POLL_FREQUENCY = 30.0
+DEFAULT_BACKOFF = 1.5
 
 
 class RequestsWait(object):
-    def __init__(self, driver, wait_time, poll_frequency=1, ignored_exceptions=None):
+    """
+    A `WebDriverWait` for the `WebReader`.  The condition is checked against
+    the current page, and while it isn't met the page is fetched again on a
+    backoff schedule: the first wait is `poll_frequency` seconds and each one
+    after that is `backoff` times longer, up to `max_poll_frequency`, until
+    `wait_time` seconds have passed and a `TimeoutException` is raised.
+
+    Pages are fetched again with `WebReader.revalidate`, which makes a
+    conditional request, so a page that hasn't changed costs a 304 and keeps
+    its parsed document.  Drivers without a `revalidate` method are only
+    polled.  `NoSuchElementException`s are ignored, like in `WebDriverWait`.
+
+    Example:
+        wait = RequestsWait(reader, 60, poll_frequency=2)
+        wait.until(lambda reader: reader.find_element_by_id('status').text == 'Done')
+    """
+    def __init__(self, driver, wait_time, poll_frequency=1, ignored_exceptions=None,
+                 max_poll_frequency=DEFAULT_MAX_POLL_FREQUENCY, backoff=DEFAULT_BACKOFF):
         self.driver = driver
         self.wait_time = wait_time
         self.poll_frequency = poll_frequency
-        self.ignored_exceptions = ignored_exceptions
-
-    def until(self, function, *args, **kwargs):
-        try:
-            return function(self.driver, *args, **kwargs)
-        except AttributeError:
-            return False
-
-    def until_not(self, function, *args, **kwargs):
-        try:
-            return function(self.driver, *args, **kwargs)
-        except AttributeError:
-            return False
+        self.max_poll_frequency = max(max_poll_frequency, poll_frequency)
+        self.backoff = backoff
+
+        ignored = [NoSuchElementException]
+        if ignored_exceptions is not None:
+            try:
+                ignored.extend(ignored_exceptions)
+            except TypeError:
+                ignored.append(ignored_exceptions)
+        self.ignored_exceptions = tuple(ignored)
+
+    def _poll(self, function, until_value, message):
+        """
+        Call the function with the driver until its result is truthy, or
+        falsy if `until_value` is False, refreshing the page between calls.
+
+        Args:
+            function: function
+            until_value: bool
+            message: str
+
+        Returns:
+            the function's last result
+        """
+
+        deadline = clock() + self.wait_time
+        delay = self.poll_frequency
+        while True:
+            try:
+                value = function(self.driver)
+                if bool(value) == until_value:
+                    return value
+            except self.ignored_exceptions:
+                if not until_value:
+                    return True
+
+            remaining = deadline - clock()
+            if remaining <= 0:
+                raise TimeoutException(message)
+
+            time.sleep(min(delay, remaining))
+            delay = min(delay * self.backoff, self.max_poll_frequency)
+
+            revalidate = getattr(self.driver, 'revalidate', None)
+            if revalidate is not None:
+                revalidate()
+
+    def until(self, function, message=''):
+        """
+        Wait until the function returns something truthy and return it.
+
+        Args:
+            function: function that takes the driver
+            message: str, the message for the TimeoutException
+
+        Returns:
+            the function's result
+        """
+
+        return self._poll(function, True, message)
+
+    def until_not(self, function, message=''):
+        """
+        Wait until the function returns something falsy, or raises one of
+        the ignored exceptions.
+
+        Args:
+            function: function that takes the driver
+            message: str, the message for the TimeoutException
+
+        Returns:
+            the function's result
+        """
+
+        return self._poll(function, False, message)
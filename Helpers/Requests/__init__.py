@@ -1,9 +1,167 @@
+import json
+import re
+import zlib
+from collections import OrderedDict, deque
 from uuid import uuid4
-import requests
 from bs4 import BeautifulSoup
-from lxml import etree
-from json import loads
-from .Exceptions import NoSuchElementException
+from lxml import etree, html
+from .Archive import ResponseArchive, shared_archive
+from .Cache import ResponseCache, shared_cache
+from .Crawler import BloomFilter, Crawler, Frontier, canonicalize_url
+from .Download import Download, content_range
+from .Exceptions import CircuitOpenError, DownloadError, NoSuchElementException, NotArchivedError
+from .Index import DocumentIndex
+from .JsonStream import is_json_content_type, iter_json_array, looks_like_json, loads_bytes
+from .Parsers import PARSERS, get_parser, parse_html
+from .RateLimiter import RateLimiter, TokenBucket, shared_rate_limiter
+from .Retries import CircuitBreaker, RetryPolicy, shared_circuit_breaker
+from .Selectors import SelectorCache, scope_xpath, selector_cache, sibling_combinators
+from .Sessions import make_session, shared_session
+from .Settings import env_bool, env_setting
+from .Wait import RequestsWait
+
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_HISTORY_SIZE = 100
+DEFAULT_HISTORY_SNAPSHOTS = 10
+
+
+# Compiled lookups for the id, name and class attributes.  They are keyed by
+# the XPath axis so lookups from the document root can include the root.
+_BY_ATTRIBUTE = {}
+for _axis in ('descendant', 'descendant-or-self'):
+    _BY_ATTRIBUTE[_axis, 'id'] = etree.XPath('{}::*[@id=$value]'.format(_axis))
+    _BY_ATTRIBUTE[_axis, 'name'] = etree.XPath('{}::*[@name=$value]'.format(_axis))
+    _BY_ATTRIBUTE[_axis, 'class'] = etree.XPath(
+        "{}::*[contains(concat(' ', normalize-space(@class), ' '), concat(' ', $value, ' '))]".format(_axis)
+    )
+
+# Static stand-ins for the browser's idea of what is displayed and enabled,
+# since styles and scripts aren't run.
+_HIDDEN = etree.XPath(
+    "boolean(ancestor-or-self::*[@hidden or self::head or self::script or self::style or self::template"
+    " or (self::input and translate(@type, 'HIDEN', 'hiden') = 'hidden')"
+    " or contains(translate(translate(@style, ' ', ''), 'DISPLAYNOE', 'displaynoe'), 'display:none')"
+    " or contains(translate(translate(@style, ' ', ''), 'VISBLTYHDN', 'visbltyhdn'), 'visibility:hidden')])"
+)
+_DISABLED = etree.XPath(
+    "boolean(self::*[self::button or self::input or self::select or self::textarea or self::option"
+    " or self::optgroup or self::fieldset][@disabled or ancestor::fieldset[@disabled]])"
+)
+
+_META_CHARSET = re.compile(br'''<meta[^>]+charset=["']?([\w.:-]+)''', re.IGNORECASE)
+_BOMS = ((b'\xef\xbb\xbf', 'utf-8'), (b'\xff\xfe', 'utf-16'), (b'\xfe\xff', 'utf-16'))
+
+
+def declared_encoding(content_type):
+    """
+    Get the charset from a Content-Type header.  Unlike `requests`, this does
+    not assume ISO-8859-1 for text responses without a charset, so lxml can
+    use the encoding declared in the page instead.
+
+    Args:
+        content_type: str or None
+
+    Returns:
+        str or None
+    """
+
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\' ')
+    return None
+
+
+def page_encoding(content, content_type):
+    """
+    Work out the encoding of a html response: the charset in the
+    Content-Type header, then a byte order mark or a `<meta charset>` near
+    the start of the page.  Pages that declare none are utf-8 if they decode
+    as it, and windows-1252 otherwise, which is what browsers fall back to.
+
+    Args:
+        content: bytes
+        content_type: str or None
+
+    Returns:
+        str
+    """
+
+    encoding = declared_encoding(content_type)
+    if encoding is not None:
+        return encoding
+
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    match = _META_CHARSET.search(content, 0, 1024)
+    if match is not None:
+        return match.group(1).decode('ascii')
+
+    try:
+        content.decode('utf-8')
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8'
+
+
+def conditional_headers(headers):
+    """
+    Get the conditional request headers that ask the server to only send a
+    response again if it has changed since the one with these headers.
+
+    Args:
+        headers: dict
+
+    Returns:
+        dict
+    """
+
+    conditional = {}
+    if headers.get('ETag'):
+        conditional['If-None-Match'] = headers['ETag']
+    if headers.get('Last-Modified'):
+        conditional['If-Modified-Since'] = headers['Last-Modified']
+    return conditional
+
+
+class ResponseBody(object):
+    """
+    The bytes of a html response and their encoding.  Pages are parsed
+    straight from the bytes, so the text is only decoded the first time
+    something asks for it.
+    """
+    __slots__ = ('content', 'encoding', '_text')
+
+    def __init__(self, content, encoding):
+        self.content = content
+        self.encoding = encoding
+        self._text = None
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def text(self):
+        """
+        The decoded response, without leading and trailing whitespace.
+
+        Returns:
+            str
+        """
+
+        if self._text is None:
+            encoding = self.encoding
+            if encoding.lower().replace('_', '-') in ('utf-8', 'utf8'):
+                # Drops a byte order mark, like lxml does.
+                encoding = 'utf-8-sig'
+            try:
+                self._text = self.content.decode(encoding, 'replace').strip()
+            except LookupError:
+                self._text = self.content.decode('utf-8', 'replace').strip()
+        return self._text
 
 
 class WebElement(object):
@@ -13,56 +171,293 @@ class WebElement(object):
     clicking and sending keys.  DOM Traversal and data extraction
     methods are provided, and attributes like WebElement.text
     are available.
+
+    Each page is parsed once into an lxml document.  A WebElement is a view
+    of one node in that document, so the elements found through it share
+    the same tree and any lookups are scoped to the element's subtree.
+
+    Lookups can return thousands of elements, so they are kept small with
+    `__slots__` and `text`, `tag_name` and `id` are only worked out the
+    first time they are used.  The page's `current_response` text is only
+    decoded if it is asked for.
+
+    Lookups by id, name and class name go through a `DocumentIndex` of the
+    page, which is built the first time one of them is used and shared by
+    every element found on the page.
     """
-    def __init__(self, soup, response, url, parent=None):
+    __slots__ = ('node', '_response', 'current_url', 'parent', '_soup', '_text', '_tag_name', '_id', '_index')
 
-        self.soup = None
-        self.make_soup(soup, response)
+    # Placeholders for the selenium WebElement attributes that only make
+    # sense in a browser.
+    content = None
+    size = 0, 0
+    location = 0, 0
+    rect = 0, 0
+    screenshot_as_png = None
+    screenshot_as_base64 = None
+    location_once_scrolled_into_view = 0, 0
+
+    def __init__(self, node, response, url, parent=None, index=None):
+
+        self._id = None
+        self.make_document(node, response)
+        if index is not None:
+            self._index = index
 
-        self.tag_name = self.soup.name if self.soup is not None else None
-        self.text = self.soup.text if self.soup is not None else None
-        try:
-            self.content = self.soup.content if self.soup is not None else None
-        except AttributeError:
-            self.content = None
         self.current_response = response
         self.current_url = url
-        self.size = 0, 0
-        self.location = 0, 0
-        self.rect = 0, 0
-        self.screenshot_as_png = None
-        self.screenshot_as_base64 = None
         self.parent = parent
-        self.location_once_scrolled_into_view = 0, 0
-        self.id = uuid4()
 
     def __getitem__(self, item):
-        return self.soup[item]
-
-    def make_soup(self, soup, response):
-        if soup is None:
-            if response is not None:
-                soup = BeautifulSoup(response, 'html.parser')
-                tag = None
-                for thing in soup.children:
-                    tag = getattr(soup, thing.name)
-                    # If we don't have a valid tag object, then continue looking.
-                    if not tag or tag is None:
-                        continue
-                    break
-
-                self.soup = tag
-        else:
-            self.soup = soup
+        return self.node.attrib[item]
+
+    @property
+    def current_response(self):
+        """
+        The response for the page: its text, or the decoded json.
+
+        Returns:
+            str or dict/list
+        """
+
+        if isinstance(self._response, ResponseBody):
+            return self._response.text
+        return self._response
+
+    @current_response.setter
+    def current_response(self, response):
+        self._response = response
+
+    @property
+    def text(self):
+        """
+        The text of the element and all of its children.
+
+        Returns:
+            str
+        """
+
+        if self._text is None and self.node is not None:
+            self._text = self.node.text_content()
+        return self._text
+
+    @property
+    def tag_name(self):
+        """
+        The element's tag name.
+
+        Returns:
+            str
+        """
+
+        if self._tag_name is None and self.node is not None:
+            self._tag_name = self.node.tag
+        return self._tag_name
+
+    @property
+    def id(self):
+        """
+        A unique id for the element, like selenium's WebElement.id.
+
+        Returns:
+            UUID
+        """
+
+        if self._id is None:
+            self._id = uuid4()
+        return self._id
+
+    @property
+    def soup(self):
+        """
+        A BeautifulSoup version of the element for code written against the
+        older BeautifulSoup based WebElement.  It is built from the element's
+        html the first time it is used, so prefer the find methods.
+
+        Returns:
+            BeautifulSoup
+        """
+
+        if self._soup is None and self.node is not None:
+            soup = BeautifulSoup(etree.tostring(self.node, encoding='unicode'), 'html.parser')
+            self._soup = soup if self._is_document_root() else soup.find()
+        return self._soup
+
+    def make_document(self, node, response):
+        """
+        Use the given lxml node, or parse the response into a new document
+        if there is no node.
+
+        Args:
+            node:
+            response:
+
+        Returns:
+            self
+        """
+
+        if node is None:
+            if isinstance(response, ResponseBody):
+                node = parse_html(response.content, encoding=response.encoding)
+            elif response is not None:
+                node = parse_html(response)
+        self.set_node(node)
 
         return self
 
+    def set_node(self, node):
+        """
+        Point the element at a new lxml node and forget anything cached
+        about the old one.  A new document gets a new index.
+
+        Args:
+            node:
+
+        Returns:
+            self
+        """
+
+        self.node = node
+        self._index = DocumentIndex(node) if node is not None and node.getparent() is None else None
+        self._soup = None
+        self._text = None
+        self._tag_name = None
+        return self
+
+    def _is_document_root(self):
+        return self.node.getparent() is None
+
+    def _axis(self):
+        """
+        Get the XPath axis lookups are made on.  Lookups from the root of the
+        document include the root itself, like they would from the document
+        in a browser.
+
+        Returns:
+            str
+        """
+
+        return 'descendant-or-self' if self._is_document_root() else 'descendant'
+
+    def _scope_xpath(self, xpath):
+        """
+        Make an absolute XPath relative to this element so it only matches
+        elements in the element's subtree.
+
+        Args:
+            xpath: str
+
+        Returns:
+            str
+        """
+
+        if self._is_document_root():
+            return xpath
+        return scope_xpath(xpath)
+
+    def _find_all(self, by, value):
+        """
+        Get the lxml nodes under this element matching the given value.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            list
+        """
+
+        if self._index is not None and by in ('id', 'name', 'class name'):
+            if self.node is self._index.root:
+                nodes = self._index.find(by, value)
+            else:
+                nodes = self._index.find_under(self.node, by, value)
+            if nodes is not None:
+                return nodes
+
+        axis = self._axis()
+        if by == 'id':
+            return _BY_ATTRIBUTE[axis, 'id'](self.node, value=value)
+        if by == 'name':
+            return _BY_ATTRIBUTE[axis, 'name'](self.node, value=value)
+        if by == 'class name':
+            return _BY_ATTRIBUTE[axis, 'class'](self.node, value=value)
+        if by == 'tag name':
+            if axis == 'descendant':
+                return list(self.node.iterdescendants(value))
+            return list(self.node.iter(value))
+        if by == 'css selector':
+            return selector_cache.css(value, axis)(self.node)
+        if by == 'xpath':
+            nodes = selector_cache.xpath(self._scope_xpath(value))(self.node)
+            return [node for node in nodes if etree.iselement(node)]
+        raise ValueError('Unknown lookup: {}'.format(by))
+
+    def _find(self, by, value):
+        """
+        Get the first WebElement under this element matching the given value.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            WebElement
+        """
+
+        nodes = self._find_all(by, value)
+        if not nodes:
+            raise NoSuchElementException('The element could not be located by {}: {}'.format(by, value))
+
+        return WebElement(nodes[0], self._response, self.current_url, parent=self.id, index=self._index)
+
+    def _find_elements(self, by, value):
+        """
+        Get all of the WebElements under this element matching the given value.
+
+        Args:
+            by: str
+            value: str
+
+        Returns:
+            list
+        """
+
+        resp = self._response
+        url = self.current_url
+        index = self._index
+        return [WebElement(node, resp, url, parent=self.id, index=index) for node in self._find_all(by, value)]
+
     def get_attribute(self, attribute, **kwargs):
-        return self.soup[attribute]
+        return self.node.attrib[attribute]
 
     def value_of_css_property(self, name):
         return None
 
+    def is_displayed(self):
+        """
+        Check if the element would be shown.  Without a browser this only
+        goes by the html: elements that are hidden, hidden inputs, elements
+        with an inline `display: none` or `visibility: hidden` style and
+        anything inside one of them are not displayed.
+
+        Returns:
+            bool
+        """
+
+        return not _HIDDEN(self.node)
+
+    def is_enabled(self):
+        """
+        Check if the element is enabled, which is every element except form
+        controls that are disabled or in a disabled fieldset.
+
+        Returns:
+            bool
+        """
+
+        return not _DISABLED(self.node)
+
     def find_element_by_id(self, element_id):
         """
         Find an element in the DOM by id.
@@ -74,11 +469,7 @@ class WebElement(object):
             WebElement
         """
 
-        ele = self.soup.find(id=element_id)
-        if ele is None:
-            raise NoSuchElementException('The element could not be located by id: {}'.format(element_id))
-
-        return WebElement(ele, self.current_response, self.current_url, parent=self.id)
+        return self._find('id', element_id)
 
     def find_element_by_name(self, name):
         """
@@ -90,11 +481,8 @@ class WebElement(object):
         Returns:
             WebElement
         """
-        ele = self.soup.find(attrs={'name': name})
-        if ele is None:
-            raise NoSuchElementException('The element could not be located by name: {}'.format(name))
 
-        return WebElement(ele, self.current_response, self.current_url, parent=self.id)
+        return self._find('name', name)
 
     def find_element_by_class_name(self, class_name):
         """
@@ -106,11 +494,8 @@ class WebElement(object):
         Returns:
             WebElement
         """
-        ele = self.soup.find(attrs={'class': class_name})
-        if ele is None:
-            raise NoSuchElementException('The element could not be located by class name: {}'.format(class_name))
 
-        return WebElement(ele, self.current_response, self.current_url, parent=self.id)
+        return self._find('class name', class_name)
 
     def find_element_by_tag_name(self, tag_name):
         """
@@ -123,11 +508,7 @@ class WebElement(object):
             WebElement
         """
 
-        ele = self.soup.find(tag_name)
-        if ele is None:
-            raise NoSuchElementException('The element could not be located by tag name: {}'.format(tag_name))
-
-        return WebElement(ele, self.current_response, self.current_url, parent=self.id)
+        return self._find('tag name', tag_name)
 
     def find_element_by_css_selector(self, selector):
         """
@@ -139,15 +520,13 @@ class WebElement(object):
         Returns:
             WebElement
         """
-        ele = self.soup.select(selector)[0]
-        if ele is None:
-            raise NoSuchElementException('The element could not be located by css selector: {}'.format(selector))
 
-        return WebElement(ele, self.current_response, self.current_url, parent=self.id)
+        return self._find('css selector', selector)
 
     def find_element_by_xpath(self, xpath):
         """
-        Find an element in the DOM by xpath.
+        Find an element in the DOM by xpath.  The xpath is evaluated
+        against this element's subtree.
 
         Args:
             xpath:
@@ -156,11 +535,7 @@ class WebElement(object):
             WebElement
         """
 
-        tree = etree.fromstring(self.current_response, etree.HTMLParser())
-        element = tree.xpath(xpath)[0]
-        self.current_response = etree.tostring(element)
-        # print(self.current_response)
-        return WebElement(None, self.current_response, self.current_url, parent=self.id)
+        return self._find('xpath', xpath)
 
     # %%%%%%%%%%%%%%%%%%% Find elements %%%%%%%%%%%%%%%%%%% #
     def find_elements_by_id(self, element_id):
@@ -174,9 +549,7 @@ class WebElement(object):
             list
         """
 
-        resp = self.current_response
-        url = self.current_url
-        return [WebElement(element, resp, url, parent=self.id) for element in self.soup.find_all(id=element_id)]
+        return self._find_elements('id', element_id)
 
     def find_elements_by_name(self, name):
         """
@@ -189,9 +562,7 @@ class WebElement(object):
             list
         """
 
-        resp = self.current_response
-        url = self.current_url
-        return [WebElement(element, resp, url, parent=self.id) for element in self.soup.find_all(attrs={'name': name})]
+        return self._find_elements('name', name)
 
     def find_elements_by_class_name(self, name):
         """
@@ -203,9 +574,8 @@ class WebElement(object):
         Returns:
             list
         """
-        resp = self.current_response
-        url = self.current_url
-        return [WebElement(element, resp, url, parent=self.id) for element in self.soup.find_all(attrs={'class': name})]
+
+        return self._find_elements('class name', name)
 
     def find_elements_by_tag_name(self, name):
         """
@@ -218,9 +588,7 @@ class WebElement(object):
             list
         """
 
-        resp = self.current_response
-        url = self.current_url
-        return [WebElement(element, resp, url, parent=self.id) for element in self.soup.find_all(name)]
+        return self._find_elements('tag name', name)
 
     def find_elements_by_css_selector(self, selector):
         """
@@ -233,13 +601,12 @@ class WebElement(object):
             list
         """
 
-        resp = self.current_response
-        url = self.current_url
-        return [WebElement(element, resp, url, parent=self.id) for element in self.soup.select(selector)]
+        return self._find_elements('css selector', selector)
 
     def find_elements_by_xpath(self, xpath):
         """
-        Find all elements in the DOM matching the given xpath.
+        Find all elements in the DOM matching the given xpath.  The xpath
+        is evaluated against this element's subtree.
 
         Args:
             xpath:
@@ -248,25 +615,66 @@ class WebElement(object):
             list
         """
 
-        tree = etree.fromstring(self.current_response, etree.HTMLParser())
-        elements = tree.xpath(xpath)
+        return self._find_elements('xpath', xpath)
 
-        output_elements = []
-        for element in elements:
-            resp = etree.tostring(element)
-            output_elements.append(WebElement(None, resp, self.current_url, parent=self.id))
 
-        return output_elements
+class WebPage(WebElement):
+    """
+    A page loaded by `WebReader.get_many`.  It is the root element of its own
+    document, so it has the same find methods as the `WebReader`.  If the
+    page could not be loaded, `error` holds the exception that was raised.
+    `final_url` is the url the page came from after any redirects, which is
+    what its relative links are relative to.
+    """
+    __slots__ = ('error', 'final_url')
+
+    def __init__(self, node, response, url, error=None, final_url=None):
+        super(WebPage, self).__init__(node, None, url)
+        self.current_response = response
+        self.error = error
+        self.final_url = final_url if final_url is not None else url
 
 
 class WebHistory(object):
-    def __init__(self):
+    """
+    The urls a `WebReader` has visited, kept in a ring buffer of `max_size`
+    entries so long crawls don't grow it forever.  Registering a url after
+    going back drops the forward history, like a browser does.
+
+    The responses and parsed documents of the `snapshots` most recently used
+    entries are kept as well, so going back and forward doesn't fetch the
+    pages again.  With `compress=True` the response bytes are kept zlib
+    compressed instead and parsed again when they are needed, which uses much
+    less memory than keeping parsed documents.
+
+    Settings that are not passed in are read from the
+    `WEBREADER_HISTORY_SIZE`, `WEBREADER_HISTORY_SNAPSHOTS` and
+    `WEBREADER_HISTORY_COMPRESS` .env keys.
+    """
+    def __init__(self, max_size=None, snapshots=None, compress=None):
+        if max_size is None:
+            max_size = env_setting('WEBREADER_HISTORY_SIZE', DEFAULT_HISTORY_SIZE, func=int)
+        if snapshots is None:
+            snapshots = env_setting('WEBREADER_HISTORY_SNAPSHOTS', DEFAULT_HISTORY_SNAPSHOTS, func=int)
+        if compress is None:
+            compress = env_setting('WEBREADER_HISTORY_COMPRESS', False, func=env_bool)
+
+        self.max_size = max_size
+        self.snapshots = snapshots
+        self.compress = compress
         self.index = -1
-        self.history = []
+        self.history = deque(maxlen=max_size)
+        # Indexes aren't stable once old entries fall off the ring buffer,
+        # so snapshots are keyed by each entry's registration number.
+        self._first = 0
+        self._snapshots = OrderedDict()
 
     def __getitem__(self, item):
         return self.history[item]
 
+    def __len__(self):
+        return len(self.history)
+
     def current_url(self):
         """
         Get the current index's url.
@@ -279,7 +687,8 @@ class WebHistory(object):
 
     def register(self, url):
         """
-        Register a url with the history list.
+        Register a url with the history list, dropping any forward history
+        and the oldest entry if the history is full.
 
         Args:
             url:
@@ -288,61 +697,203 @@ class WebHistory(object):
             self
         """
 
+        while len(self.history) > self.index + 1:
+            self.history.pop()
+            self._snapshots.pop(self._first + len(self.history), None)
+
+        if len(self.history) == self.max_size:
+            self._snapshots.pop(self._first, None)
+            self._first += 1
+            self.index -= 1
+
         self.history.append(url)
         self.index += 1
         return self
 
     def back(self):
         """
-        Move the pointer back in the history and return the url for that new index.
+        Move the pointer back in the history and return the url for that new
+        index.  Does nothing on the first entry.
 
         Returns:
             str
         """
 
-        self.index -= 1
+        self.index = max(0, self.index - 1)
         return self.history[self.index]
 
     def forward(self):
         """
-        Move the pointer forward in the history and return the url for that new index.
+        Move the pointer forward in the history and return the url for that
+        new index.  Does nothing on the last entry.
 
         Returns:
             str
         """
 
-        self.index += 1
+        self.index = min(len(self.history) - 1, self.index + 1)
         return self.history[self.index]
 
+    def store(self, response, node):
+        """
+        Keep the response and parsed document for the current entry.
+
+        Args:
+            response: ResponseBody or dict/list
+            node: lxml node or None
+
+        Returns:
+            self
+        """
+
+        if self.snapshots <= 0 or self.index < 0:
+            return self
+
+        if self.compress:
+            if isinstance(response, ResponseBody):
+                snapshot = (zlib.compress(response.content), response.encoding)
+            else:
+                # Json is kept as json text; the encoding is None.
+                snapshot = (zlib.compress(json.dumps(response).encode('utf-8')), None)
+        elif isinstance(response, ResponseBody):
+            # A body of its own, so text decoded from the page isn't kept.
+            snapshot = (ResponseBody(response.content, response.encoding), node)
+        else:
+            snapshot = (response, node)
+
+        key = self._first + self.index
+        self._snapshots.pop(key, None)
+        self._snapshots[key] = snapshot
+        while len(self._snapshots) > self.snapshots:
+            self._snapshots.popitem(last=False)
+        return self
+
+    def load(self):
+        """
+        Get the kept response and document for the current entry.  For
+        compressed snapshots the document is None and needs to be parsed
+        from the response again.
+
+        Returns:
+            tuple (ResponseBody or dict/list, lxml node or None) or None
+        """
+
+        key = self._first + self.index
+        snapshot = self._snapshots.pop(key, None)
+        if snapshot is None:
+            return None
+        self._snapshots[key] = snapshot
+
+        if not self.compress:
+            response, node = snapshot
+            if isinstance(response, ResponseBody):
+                response = ResponseBody(response.content, response.encoding)
+            return response, node
+
+        data, encoding = snapshot
+        if encoding is None:
+            return json.loads(zlib.decompress(data).decode('utf-8')), None
+        return ResponseBody(zlib.decompress(data), encoding), None
+
 
 class WebReader(WebElement):
-    def __init__(self):
-        self.soup = None
-        self.current_response = None
-        self.current_url = None
-
-        self.requests = requests
-        self.web_history = WebHistory()
-
-        self.size = 0, 0
-        self.location = 0, 0
-        self.rect = 0, 0
-        self.screenshot_as_png = None
-        self.screenshot_as_base64 = None
-        self.location_once_scrolled_into_view = 0, 0
-        self.id = uuid4()
+    """
+    Reads web pages with `requests` and exposes them through the same
+    lookup API as a selenium WebDriver.  Every `WebReader` fetches pages
+    through a `requests.Session`, so connections are kept alive and pooled
+    per host.  Pass in a `session` to share one connection pool between
+    several `WebReader` instances, or the pool settings to tune a new one.
+
+    Pages are parsed with the `lxml` parser unless another one of the
+    `PARSERS` is given or set with the `WEBREADER_PARSER` .env key.
+
+    Pass a `ResponseCache` as `cache` to keep responses on disk and only
+    revalidate them once they go stale.  If `WEBREADER_CACHE_DIR` is set in
+    the .env file, a cache in that directory is used unless `cache=False`.
+
+    Requests are paced per host by the shared `RateLimiter`, which is set up
+    from the `WEBREADER_RATE` .env keys.  Pass another `rate_limiter`, or
+    `rate_limiter=False` to turn pacing off.  Cached responses are not paced.
+
+    Failed requests are retried by the `retry` policy, and hosts that keep
+    failing are refused for a while by the shared `CircuitBreaker` so they
+    don't tie up workers.  Pass `retry=False` or `circuit_breaker=False` to
+    turn either off.
+
+    Pages in the `WebHistory` keep a snapshot, so `back` and `forward` don't
+    fetch them again.  Pass a `history` to change how much is kept.
+
+    Pass a `ResponseArchive`, or its path, as `record` to append every
+    response to it, or as `replay` to serve every request from it without
+    touching the network.  Readers given the same path share one archive.
+    The `WEBREADER_RECORD` and `WEBREADER_REPLAY` .env keys set them for
+    every reader.
+
+    Example:
+        session = make_session(pool_maxsize=20)
+        reader1 = WebReader(session=session)
+        reader2 = WebReader(session=session, parser='html.parser', cache=ResponseCache('cache', ttl=3600))
+    """
+    def __init__(self, session=None, pool_connections=None, pool_maxsize=None, pool_block=None, parser=None,
+                 cache=None, rate_limiter=None, retry=None, circuit_breaker=None, history=None, record=None,
+                 replay=None):
+        self.parser = get_parser(parser)
+
+        if retry is None:
+            retry = RetryPolicy()
+        elif retry is False:
+            retry = RetryPolicy(retries=0)
+        self.retry = retry
+
+        if circuit_breaker is None:
+            circuit_breaker = shared_circuit_breaker()
+        self.circuit_breaker = None if circuit_breaker is False else circuit_breaker
+
+        if rate_limiter is None:
+            rate_limiter = shared_rate_limiter()
+        self.rate_limiter = None if rate_limiter is False else rate_limiter
+
+        if cache is None and env_setting('WEBREADER_CACHE_DIR', None) is not None:
+            cache = shared_cache()
+        self.cache = None if cache is False else cache
+
+        # Only close the session on `quit` if this instance created it.
+        self._owns_session = session is None
+        if session is None:
+            session = make_session(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block
+            )
+        self.session = session
+        self.requests = session
+        self.web_history = history if history is not None else WebHistory()
+        # The conditional request headers for the current page.
+        self._validators = {}
+
+        if record is None:
+            record = env_setting('WEBREADER_RECORD', None)
+        if replay is None:
+            replay = env_setting('WEBREADER_REPLAY', None)
+        if record is not None and not isinstance(record, ResponseArchive):
+            record = shared_archive(record)
+        if replay is not None and not isinstance(replay, ResponseArchive):
+            replay = shared_archive(replay)
+        self.record = record
+        self.replay = replay
 
         super(WebReader, self).__init__(None, None, None)
 
     def back(self):
         """
-        Navigate to the last place in the web history.
+        Navigate to the last place in the web history.  The page is only
+        fetched again if its snapshot is no longer kept.
 
         Returns:
             self
         """
 
-        self.get(self.web_history.back())
+        self._visit(self.web_history.back())
         return self
 
     def close(self):
@@ -357,18 +908,21 @@ class WebReader(WebElement):
 
     def forward(self):
         """
-        Navigate to the next place in the web history.
+        Navigate to the next place in the web history.  The page is only
+        fetched again if its snapshot is no longer kept.
 
         Returns:
             self
         """
 
-        self.get(self.web_history.forward())
+        self._visit(self.web_history.forward())
         return self
 
     def get(self, url, headers=None, add_to_history=True, cookies=None):
         """
-        Get a response for the given url.
+        Get a response for the given url.  The page is parsed from its bytes
+        and is only decoded if its `text`, or `current_response`, is asked
+        for.
 
         Args:
             url:
@@ -377,44 +931,391 @@ class WebReader(WebElement):
             cookies:
 
         Returns:
-            str
+            ResponseBody, or the decoded json
         """
 
-        if add_to_history:
-            self.web_history.register(url)
+        response = self._request(url, headers=headers, cookies=cookies)
         self.current_url = url
+        self.current_response, node = self._read_response(response)
+        self.set_node(node)
+        self._validators = conditional_headers(response.headers)
+
+        if add_to_history:
+            self.web_history.register(url).store(self._response, node)
+
+        return self._response
+
+    def get_many(self, urls, max_workers=None, ordered=True, headers=None, cookies=None):
+        """
+        Get many urls at once through the reader's connection pool and yield
+        a `WebPage` for each one.  Pages are yielded in the order of `urls`,
+        or as soon as each one finishes loading if `ordered` is False.  A url
+        that fails does not stop the others; its `WebPage` has the exception
+        in `error` instead.  This does not change the current page or history.
+
+        `max_workers` defaults to the `WEBREADER_MAX_WORKERS` .env key.  Keep
+        it at or below the pool size so connections aren't thrown away.
+
+        Example:
+            for page in reader.get_many(urls, max_workers=8, ordered=False):
+                if page.error is None:
+                    print(page.current_url, page.find_element_by_tag_name('h1').text)
+
+        Args:
+            urls:
+            max_workers:
+            ordered:
+            headers:
+            cookies:
+
+        Returns:
+            generator
+        """
+
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        if max_workers is None:
+            max_workers = env_setting('WEBREADER_MAX_WORKERS', DEFAULT_MAX_WORKERS, func=int)
+
+        def load_page(url):
+            return self._load_page(url, headers=headers, cookies=cookies)
+
+        urls = iter(urls)
+        executor = ThreadPoolExecutor(max_workers)
+        # Only a couple of urls per worker are queued at a time, so any
+        # number of urls can be passed in.
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < max_workers * 2:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    pending.append(executor.submit(load_page, url))
+
+                if not pending:
+                    return
+
+                if ordered:
+                    yield pending.popleft().result()
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _load(self, url, headers=None, cookies=None):
+        """
+        Get and parse the page for the url without changing the reader.
+
+        Args:
+            url:
+            headers:
+            cookies:
+
+        Returns:
+            tuple (ResponseBody or dict/list, lxml node or None)
+        """
+
+        return self._read_response(self._request(url, headers=headers, cookies=cookies))
+
+    def _load_page(self, url, headers=None, cookies=None):
+        """
+        Get and parse the page for the url into a `WebPage` without changing
+        the reader.  An exception is kept in the page's `error` instead of
+        being raised.
+
+        Args:
+            url:
+            headers:
+            cookies:
+
+        Returns:
+            WebPage
+        """
+
+        try:
+            response = self._request(url, headers=headers, cookies=cookies)
+            body, node = self._read_response(response)
+        except Exception as e:
+            return WebPage(None, None, url, error=e)
+        return WebPage(node, body, url, final_url=response.url or url)
+
+    def _read_response(self, response):
+        """
+        Decode a json response, or parse a html response into a document.
+
+        Args:
+            response: requests.Response
+
+        Returns:
+            tuple (ResponseBody or dict/list, lxml node or None)
+        """
+
+        # Json responses are decoded straight from the response bytes and
+        # skip the html parser.  Bodies without a Content-Type that only
+        # look like json are parsed as html if they don't decode.
+        content_type = response.headers.get('Content-Type')
+        if looks_like_json(content_type, response.content):
+            try:
+                return loads_bytes(response.content, declared_encoding(content_type)), None
+            except ValueError:
+                if is_json_content_type(content_type):
+                    raise
+
+        # Html is parsed straight from the response bytes, so the page is
+        # never decoded unless its text is asked for.
+        body = ResponseBody(response.content, page_encoding(response.content, content_type))
+        return body, self._parse(body)
+
+    def _parse(self, body):
+        """
+        Parse a html response into a new document with the reader's parser.
+        Every element found on the page shares this document.
+
+        Args:
+            body: ResponseBody
+
+        Returns:
+            lxml node
+        """
+
+        if getattr(self.parser, 'accepts_bytes', False):
+            return self.parser(body.content, body.encoding)
+        return self.parser(body.text)
+
+    def stream_elements(self, url, tag, css_selector=None, headers=None, cookies=None, chunk_size=64 * 1024):
+        """
+        Parse the page while it downloads and yield each element with the
+        given tag (and matching the css selector, if given) as soon as its
+        closing tag has been read.  Each element is cleared from the document
+        once the next one is requested, so memory stays flat for pages with
+        any number of records.  Use the element, or copy what you need out of
+        it, before moving on to the next one.
+
+        The records should not contain elements that match the same tag and
+        selector, since the inner ones would be yielded and cleared first.
+        This does not change the current page, history or cache.
+
+        The selector is matched from the root of the document streamed so
+        far, so it can use descendant and child combinators like
+        `#feed > .product`.  Earlier records have been cleared by then, so
+        selectors with sibling combinators (`+` or `~`) raise a ValueError,
+        and positional ones like `:nth-child` only count the siblings that
+        are left.
+
+        Example:
+            for product in reader.stream_elements(url, 'div', css_selector='.product'):
+                save(product.find_element_by_class_name('sku').text)
+
+        Args:
+            url:
+            tag:
+            css_selector:
+            headers:
+            cookies:
+            chunk_size:
+
+        Returns:
+            generator
+        """
+
+        matches = None
+        if css_selector is not None:
+            if sibling_combinators(css_selector):
+                raise ValueError('stream_elements can not match sibling combinators: {}'.format(css_selector))
+            matches = selector_cache.css(css_selector)
+
+        response = self._request(url, headers=headers, cookies=cookies, stream=True)
+        try:
+            parser = etree.HTMLPullParser(
+                events=('end',),
+                tag=tag,
+                encoding=declared_encoding(response.headers.get('Content-Type'))
+            )
+            parser.set_element_class_lookup(html.HtmlElementClassLookup())
+            for chunk in response.iter_content(chunk_size):
+                parser.feed(chunk)
+                for element in self._stream_events(parser, matches, url):
+                    yield element
+            parser.close()
+            for element in self._stream_events(parser, matches, url):
+                yield element
+        finally:
+            response.close()
+
+    def download(self, url, path=None, headers=None, cookies=None, resume=True, workers=1, part_size=None,
+                 spool_size=None, chunk_size=64 * 1024):
+        """
+        Download a file, like a PDF, CSV export or image, without decoding
+        it or holding it as one string.  The body is written to `path`, or
+        spooled to memory and then a temporary file, and the `Download` gives
+        it back as a `memoryview` or `mmap`.  This does not change the
+        current page, history or cache.
+
+        If `path` already has part of the file and `resume` is set, only the
+        rest is asked for.  With more than one worker, servers that take
+        range requests send the file in `part_size` parts at once.
+
+        Example:
+            download = reader.download('https://example.com/report.pdf', path='report.pdf', workers=4)
+            pages = download.mmap().count(b'/Type /Page')
+
+        Args:
+            url:
+            path:
+            headers:
+            cookies:
+            resume:
+            workers:
+            part_size:
+            spool_size:
+            chunk_size:
+
+        Returns:
+            Download
+        """
+
+        download = Download(url, path=path, spool_size=spool_size, part_size=part_size)
+        try:
+            return download.fetch(
+                lambda request_headers: self._request(url, headers=request_headers, cookies=cookies, stream=True),
+                headers=headers,
+                resume=resume,
+                workers=workers,
+                chunk_size=chunk_size
+            )
+        except Exception:
+            download.close()
+            raise
+
+    def stream_json(self, url, headers=None, cookies=None, chunk_size=64 * 1024):
+        """
+        Yield the items of a json array response one at a time while it
+        downloads, so very large api responses never have to fit in memory.
+        This does not change the current page, history or cache.
+
+        Example:
+            for product in reader.stream_json('https://example.com/api/products'):
+                save(product['sku'])
+
+        Args:
+            url:
+            headers:
+            cookies:
+            chunk_size:
+
+        Returns:
+            generator
+        """
+
+        response = self._request(url, headers=headers, cookies=cookies, stream=True)
+        try:
+            encoding = declared_encoding(response.headers.get('Content-Type'))
+            for item in iter_json_array(response.iter_content(chunk_size), encoding):
+                yield item
+        finally:
+            response.close()
+
+    @staticmethod
+    def _stream_events(parser, matches, url):
+        """
+        Yield the elements the pull parser has finished, clearing each one,
+        and everything before it and its ancestors, once the caller is done
+        with it.  The selector is matched once for each batch of events, so
+        the document is only searched once for every chunk that is fed in.
+
+        Args:
+            parser: lxml.etree.HTMLPullParser
+            matches: lxml.etree.XPath or None, matched from the document root
+            url: str
+
+        Returns:
+            generator
+        """
+
+        events = list(parser.read_events())
+        if not events:
+            return
+
+        matched = None
+        if matches is not None:
+            matched = set(matches(events[0][1].getroottree().getroot()))
 
-        if headers is None:
-            headers = {}
+        for _, node in events:
+            if matched is not None and node not in matched:
+                continue
 
-        self.current_response = self.requests.get(
-            url,
-            headers=headers,
-            cookies=cookies if cookies else {}
-        ).text.strip()
+            yield WebElement(node, None, url)
 
-        # Check for json response and if so, then return a dictionary
-        # and set the current response to the dictionary.
-        if self.current_response[0] == '{':
-            if hasattr(self.current_response, 'json'):
-                self.current_response = self.current_response.json()
-            self.current_response = loads(self.current_response)
-            self.soup = None
-            return self.current_response
+            node.clear()
+            for ancestor in node.xpath('ancestor-or-self::*'):
+                parent = ancestor.getparent()
+                while parent is not None and ancestor.getprevious() is not None:
+                    del parent[0]
 
-        # Make soup
-        self.soup = BeautifulSoup(self.current_response, 'html.parser')
+    def _request(self, url, headers=None, cookies=None, stream=False, use_cache=True):
+        """
+        Make a GET request for the url, going through the response cache if
+        there is one and `use_cache` is set.  Streamed requests skip the
+        cache.  Requests that go out are rate limited, retried and checked
+        against the circuit breaker.
+        When replaying an archive, the recorded response is used instead, and
+        when recording, every response that isn't streamed is archived,
+        except for a 304 to a conditional request, which has no page in it.
+
+        Args:
+            url:
+            headers:
+            cookies:
+            stream:
+            use_cache:
+
+        Returns:
+            requests.Response
+        """
+
+        def attempt(request_headers):
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(url)
+            return self.requests.get(url, headers=request_headers, cookies=cookies if cookies else {}, stream=stream)
+
+        def send(request_headers):
+            return self.retry.call(url, lambda: attempt(request_headers), circuit_breaker=self.circuit_breaker)
 
-        return self.current_response
+        if self.replay is not None:
+            return self.replay.load(url)
+
+        if self.cache is None or stream or not use_cache:
+            response = send(headers if headers else {})
+        else:
+            response = self.cache.fetch(url, send, headers=headers)
+
+        if self.record is not None and not stream and response.status_code != 304:
+            self.record.store(url, response)
+        return response
 
     def quit(self):
         """
-        Does nothing.  Is just a placeholder method.
+        Close the session's pooled connections if this `WebReader` created the
+        session.  Shared sessions are left open for the other readers.  The
+        files of any archives are closed too; they are opened again if the
+        archive is used after this.
 
         Returns:
             self
         """
 
+        if self._owns_session:
+            self.session.close()
+        for archive in (self.record, self.replay):
+            if archive is not None:
+                archive.close()
         return self
 
     def refresh(self):
@@ -426,4 +1327,68 @@ class WebReader(WebElement):
         """
 
         self.get(self.web_history.current_url(), add_to_history=False)
+        self.web_history.store(self._response, self.node)
         return self
+
+    def _visit(self, url):
+        """
+        Show the current history entry, from its snapshot if there is one.
+
+        Args:
+            url:
+
+        Returns:
+            None
+        """
+
+        snapshot = self.web_history.load()
+        if snapshot is None:
+            self.get(url, add_to_history=False)
+            self.web_history.store(self._response, self.node)
+            return
+
+        response, node = snapshot
+        if node is None and isinstance(response, ResponseBody):
+            node = self._parse(response)
+
+        self.current_url = url
+        self.current_response = response
+        self.set_node(node)
+        self._validators = {}
+
+    def revalidate(self, headers=None, cookies=None):
+        """
+        Fetch the current page again if it has changed.  The request is
+        conditional on the page's ETag and Last-Modified headers, so an
+        unchanged page costs a 304 and keeps its parsed document, as does a
+        page that comes back with the same bytes.  `RequestsWait` calls this
+        between polls.  Replayed pages never change.
+
+        Args:
+            headers:
+            cookies:
+
+        Returns:
+            bool, True if the page changed
+        """
+
+        if self.current_url is None or self.replay is not None:
+            return False
+
+        request_headers = dict(headers or {})
+        request_headers.update(self._validators)
+        response = self._request(self.current_url, headers=request_headers, cookies=cookies, use_cache=False)
+        if response.status_code == 304:
+            return False
+
+        if isinstance(self._response, ResponseBody) and response.content == self._response.content:
+            return False
+
+        if self.cache is not None:
+            self.cache.store(self.current_url, response)
+
+        self.current_response, node = self._read_response(response)
+        self.set_node(node)
+        self._validators = conditional_headers(response.headers)
+        self.web_history.store(self._response, node)
+        return True
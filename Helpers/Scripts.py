@@ -0,0 +1,185 @@
+# JavaScript run in the browser by `PageElement` and `PageState`.  An element
+# is located in the browser from its locator: a list of
+# [lookup_method, selector, index, multiple] steps, from its outermost parent
+# down to the element, the way the PageElement would look it up from python.
+# A condition is one of the `PageState` keys: exists, absent, displayed,
+# not_displayed, enabled or disabled.
+
+LOCATOR_FUNCTIONS = '''
+var selenext = (function () {
+    function quote(value) {
+        return '"' + String(value).replace(/["\\\\]/g, '\\\\$&') + '"';
+    }
+
+    function toArray(list) {
+        return Array.prototype.slice.call(list);
+    }
+
+    function find(root, by, value) {
+        switch (by) {
+            case 'id':
+                return toArray(root.querySelectorAll('[id=' + quote(value) + ']'));
+            case 'name':
+                return toArray(root.querySelectorAll('[name=' + quote(value) + ']'));
+            case 'class_name':
+                return toArray(root.getElementsByClassName(value));
+            case 'tag_name':
+                return toArray(root.getElementsByTagName(value));
+            case 'css_selector':
+                return toArray(root.querySelectorAll(value));
+            case 'xpath':
+                var result = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                var nodes = [];
+                for (var i = 0; i < result.snapshotLength; i++) {
+                    if (result.snapshotItem(i).nodeType === 1) {
+                        nodes.push(result.snapshotItem(i));
+                    }
+                }
+                return nodes;
+            case 'link_text':
+            case 'partial_link_text':
+                return toArray(root.getElementsByTagName('a')).filter(function (link) {
+                    var text = (link.innerText || link.textContent).trim();
+                    return by === 'link_text' ? text === value : text.indexOf(value) !== -1;
+                });
+        }
+        throw new Error('Unknown lookup method: ' + by);
+    }
+
+    function locate(locator) {
+        var elements = [document];
+        for (var i = 0; i < locator.length && elements.length; i++) {
+            var step = locator[i];
+            var found = find(elements[0], step[0], step[1]);
+            if (step[2] !== null) {
+                var index = step[2] < 0 ? found.length + step[2] : step[2];
+                found = index >= 0 && index < found.length ? [found[index]] : [];
+            } else if (!step[3] || i < locator.length - 1) {
+                found = found.slice(0, 1);
+            }
+            elements = found;
+        }
+        return elements;
+    }
+
+    // Close to selenium's own check: the element takes up space and isn't
+    // made invisible by its style.
+    function displayed(element) {
+        if (!(element.offsetWidth || element.offsetHeight || element.getClientRects().length)) {
+            return false;
+        }
+        var style = window.getComputedStyle(element);
+        return style.visibility !== 'hidden' && style.visibility !== 'collapse' && style.opacity !== '0';
+    }
+
+    function enabled(element) {
+        return !(element.disabled || (element.matches && element.matches(':disabled')));
+    }
+
+    function met(locator, condition) {
+        var elements = locate(locator);
+        if (condition === 'absent') {
+            return elements.length === 0;
+        }
+        if (elements.length === 0) {
+            return false;
+        }
+        switch (condition) {
+            case 'exists':
+                return true;
+            case 'displayed':
+                return elements.every(displayed);
+            case 'not_displayed':
+                return !elements.some(displayed);
+            case 'enabled':
+                return elements.every(enabled);
+            case 'disabled':
+                return !elements.some(enabled);
+        }
+        throw new Error('Unknown condition: ' + condition);
+    }
+
+    return {find: find, locate: locate, met: met};
+})();
+'''
+
+# Takes a list of [locator, condition] pairs and calls back with whether
+# each one is met, as soon as they all are or once the timeout in
+# milliseconds is up.  The page is checked whenever the DOM changes, and
+# every 250ms for changes that don't touch the DOM, like a stylesheet
+# loading.
+WATCH_SCRIPT = LOCATOR_FUNCTIONS + '''
+var checks = arguments[0], timeout = arguments[1];
+var done = arguments[arguments.length - 1];
+function check() {
+    return checks.map(function (check) {
+        try {
+            return selenext.met(check[0], check[1]);
+        } catch (e) {
+            return false;
+        }
+    });
+}
+function allMet(results) {
+    return results.every(function (result) {
+        return result;
+    });
+}
+var results = checks.map(function (check) {
+    return selenext.met(check[0], check[1]);
+});
+if (allMet(results)) {
+    done(results);
+    return;
+}
+var finished = false, observer, interval, timer;
+function finish(results) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    observer.disconnect();
+    clearInterval(interval);
+    clearTimeout(timer);
+    done(results);
+}
+function update() {
+    var results = check();
+    if (allMet(results)) {
+        finish(results);
+    }
+}
+observer = new MutationObserver(update);
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+interval = setInterval(update, 250);
+timer = setTimeout(function () {
+    finish(check());
+}, timeout);
+'''
+
+# Checks a list of [locator, condition] pairs and returns whether each one
+# is met, so a whole `PageState` costs one round trip.
+STATE_SCRIPT = LOCATOR_FUNCTIONS + '''
+return arguments[0].map(function (check) {
+    return selenext.met(check[0], check[1]);
+});
+'''
+
+# Finds the elements for a locator, for parent chains that can't be written
+# as one XPath.
+LOCATE_SCRIPT = LOCATOR_FUNCTIONS + '''
+return selenext.locate(arguments[0]);
+'''
+
+# Checks the elements passed in are still attached to the page.  Elements
+# from a page that was navigated away from make the driver raise a
+# StaleElementReferenceException instead.
+ATTACHED_SCRIPT = '''
+return Array.prototype.every.call(arguments, function (element) {
+    return document.contains(element);
+});
+'''
+
+# The longest one watch script runs for, kept under the 30 second script
+# timeout WebDrivers start with.  Longer waits run the script again.
+SCRIPT_WAIT_SLICE = 10
@@ -1,15 +1,314 @@
 from __future__ import print_function
 from time import sleep
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from .Requests import WebReader
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException, \
+    WebDriverException
+from weakref import WeakKeyDictionary
+from .Requests import RequestsWait, WebReader, selector_cache, shared_rate_limiter
+from .Requests.RateLimiter import clock
+from .Requests.Selectors import scope_xpath
+from .Scripts import ATTACHED_SCRIPT, LOCATE_SCRIPT, SCRIPT_WAIT_SLICE, STATE_SCRIPT, WATCH_SCRIPT
 from json import loads
 import re
 
 
+# Waits that can't watch the page from a script poll it, starting quickly
+# and backing off to `WAIT_MAX_POLL_FREQUENCY` seconds between checks.
+WAIT_POLL_FREQUENCY = 0.05
+WAIT_MAX_POLL_FREQUENCY = 1.0
+
+# Tag names that can be used as an XPath name test.
+_XPATH_NAME = re.compile(r'^[A-Za-z_][\w.-]*$')
+
+# The conditions a `PageState` can set, in the order they are checked.
+STATE_CONDITIONS = ('exists', 'absent', 'not_displayed', 'displayed', 'enabled', 'disabled')
+
+
+def _xpath_literal(value):
+    """
+    Quote a string for use in an XPath expression.
+
+    Args:
+        value:
+            str
+
+    Returns:
+        str
+    """
+
+    if '"' not in value:
+        return '"{}"'.format(value)
+    if "'" not in value:
+        return "'{}'".format(value)
+    return 'concat({})'.format(', \'"\', '.join('"{}"'.format(part) for part in value.split('"')))
+
+
+def _xpath_step(lookup_method, selector, first):
+    """
+    Write a lookup as an XPath step from the document, for the outermost
+    element of a parent chain, or from the element before it.  Only the
+    outermost element can be an xpath lookup.
+
+    Args:
+        lookup_method:
+            str
+        selector:
+            str
+        first:
+            bool
+
+    Returns:
+        str, or None if the lookup can't be written as a step
+    """
+
+    axis = '/descendant-or-self::' if first else '/descendant::'
+    if lookup_method == 'id':
+        return '{}*[@id={}]'.format(axis, _xpath_literal(selector))
+    if lookup_method == 'name':
+        return '{}*[@name={}]'.format(axis, _xpath_literal(selector))
+    if lookup_method == 'class_name' and len(selector.split()) == 1:
+        return "{}*[contains(concat(' ', normalize-space(@class), ' '), {})]".format(
+            axis, _xpath_literal(' {} '.format(selector))
+        )
+    if lookup_method == 'tag_name' and _XPATH_NAME.match(selector):
+        return axis + selector
+    if lookup_method == 'xpath' and first:
+        return selector
+    return None
+
+
+def _can_run_scripts(driver):
+    """
+    Check if the driver can run scripts in a browser.  A `HybridDriver` only
+    can once it has moved the page to its browser.
+
+    Args:
+        driver:
+            WebDriver or WebReader
+
+    Returns:
+        bool
+    """
+
+    if isinstance(driver, WebReader):
+        return getattr(driver, 'escalated', False)
+    return hasattr(driver, 'execute_script')
+
+
+def _watch(driver, checks, deadline, switch):
+    """
+    Wait in the browser for every [locator, condition] check to be met,
+    running the watch script for up to `SCRIPT_WAIT_SLICE` seconds at a time
+    until the deadline.
+
+    Args:
+        driver:
+            WebDriver
+        checks:
+            list
+        deadline:
+            None or float
+        switch:
+            function that switches the driver to the frame the checks are in
+
+    Returns:
+        list of bools, or None if the script could not be run
+    """
+
+    while True:
+        remaining = SCRIPT_WAIT_SLICE if deadline is None else min(deadline - clock(), SCRIPT_WAIT_SLICE)
+        try:
+            switch()
+            results = driver.execute_async_script(WATCH_SCRIPT, checks, int(max(remaining, 0) * 1000))
+        except WebDriverException:
+            # The script timeout is too short, scripts are turned off or the
+            # page went away mid-wait.  Polling copes with all of them.
+            return None
+
+        if all(results) or (deadline is not None and clock() >= deadline):
+            return results
+
+
+_element_caches = WeakKeyDictionary()
+
+
+class ElementCache(object):
+    """
+    The elements `PageElement`s have found with one driver.  Looking an element
+    up again on the same page reuses what was found: with a `WebReader` that is
+    free as long as the reader is on the same document.  In a browser it costs
+    one script to check the elements are still attached to the page, so only
+    elements whose parents are looked up one at a time are kept there.
+
+    Elements are dropped once the driver moves to another document or they go
+    stale.  `hits`, `misses` and `invalidations` count how the cache is doing.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # PageElement: (document, output).  The document is the WebReader's
+        # document the element was found in, or None for a browser.  Lists
+        # are kept as tuples so callers can't change what the next lookup
+        # gets.
+        self._entries = WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, page_element):
+        return page_element in self._entries
+
+    def get(self, page_element, driver):
+        """
+        Get what the PageElement found last time, if it is still on the page.
+
+        Args:
+            page_element:
+                PageElement
+            driver:
+                WebDriver or WebReader
+
+        Returns:
+            WebElement, list or None
+        """
+
+        entry = self._entries.get(page_element)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        document, output = entry
+        if not self._attached(driver, document, output):
+            self.invalidate(page_element)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return list(output) if type(output) == tuple else output
+
+    @staticmethod
+    def _attached(driver, document, output):
+        """
+        Check the elements found are still on the driver's page.
+
+        Args:
+            driver:
+                WebDriver or WebReader
+            document:
+                lxml node or None
+            output:
+                WebElement or list
+
+        Returns:
+            bool
+        """
+
+        if not _can_run_scripts(driver):
+            return document is not None and document is driver.node
+
+        # Found over http before a HybridDriver moved the page to its browser.
+        if document is not None:
+            return False
+
+        try:
+            return bool(driver.execute_script(ATTACHED_SCRIPT, *(output if type(output) == list else [output])))
+        except StaleElementReferenceException:
+            return False
+
+    def store(self, page_element, driver, output):
+        """
+        Keep what the PageElement found.  Lookups that found nothing aren't
+        kept, so the element is looked for again.  In a browser, lookups of
+        several elements aren't kept either, since more can be added to the
+        page without the ones that were found going stale.
+
+        Args:
+            page_element:
+                PageElement
+            driver:
+                WebDriver or WebReader
+            output:
+                WebElement or list
+
+        Returns:
+            self
+        """
+
+        in_browser = _can_run_scripts(driver)
+        if output is None or (type(output) == list and (in_browser or not output)):
+            return self
+
+        document = None if in_browser else getattr(driver, 'node', None)
+        self._entries[page_element] = document, tuple(output) if type(output) == list else output
+        return self
+
+    def invalidate(self, page_element):
+        """
+        Forget what the PageElement found.
+
+        Args:
+            page_element:
+                PageElement
+
+        Returns:
+            self
+        """
+
+        if self._entries.pop(page_element, None) is not None:
+            self.invalidations += 1
+        return self
+
+    def clear(self):
+        """
+        Forget every element.
+
+        Returns:
+            self
+        """
+
+        self._entries.clear()
+        return self
+
+
+def element_cache(driver):
+    """
+    Get the `ElementCache` for the driver.
+
+    Args:
+        driver:
+            WebDriver or WebReader
+
+    Returns:
+        ElementCache
+    """
+
+    cache = _element_caches.get(driver)
+    if cache is None:
+        cache = _element_caches[driver] = ElementCache()
+    return cache
+
+
+class PageStateTimeoutException(TimeoutException):
+    """
+    Raised when the page doesn't reach a `PageState` in time.  `unmet` has the
+    (element name, condition) pairs that were still not met.
+    """
+    def __init__(self, unmet, timeout):
+        self.unmet = unmet
+        super(PageStateTimeoutException, self).__init__(
+            'The page did not reach the state in {} seconds.  Still waiting on: {}.'.format(
+                timeout, ', '.join('{} {}'.format(name, condition.replace('_', ' ')) for name, condition in unmet)
+            )
+        )
+
+
 class PageState(object):
     """
     Object for holding the definition of a web page's state, waiting for the state,
     and checking to see if the web page is in the defined state.
+
+    In a browser the whole state is checked by one script, so checking it costs one
+    round trip instead of a few for every element.
     """
     def __init__(self, driver, elements, state_dict):
         self._driver = driver
@@ -25,50 +324,62 @@ class PageState(object):
         :return: bool
         """
 
-        for aen in self._pull_from_dict(self._state_dict, 'exists'):
-            if not self._get_page_element(aen).exists():
-                return False
+        if not _can_run_scripts(self._driver):
+            # Each element is looked up in turn, so stop at the first one
+            # that doesn't match.
+            return all(element._condition_met(condition) for _, condition, element in self._checks())
 
-        for den in self._pull_from_dict(self._state_dict, 'absent'):
-            if self._get_page_element(den).exists():
-                return False
+        return all(met for _, _, met in self.evaluate())
 
-        for nden in self._pull_from_dict(self._state_dict, 'not_displayed'):
-            nden_page_element = self._get_page_element(nden)
-            if not nden_page_element.exists():
-                return False
-            if nden_page_element.exists() and nden_page_element.is_displayed():
-                return False
+    def evaluate(self):
+        """
+        Check every condition in the state.  In a browser, the elements that
+        aren't in a frame are all checked by one script in one round trip;
+        the rest are looked up one at a time.
 
-        for disen in self._pull_from_dict(self._state_dict, 'displayed'):
-            disen_page_element = self._get_page_element(disen)
-            disen_exists = disen_page_element.exists()
-            if not disen_exists:
-                return False
-            elif disen_exists and not disen_page_element().is_displayed():
-                return False
+        Returns:
+            list of (element name, condition, bool) tuples
+        """
 
-        for enabled_en in self._pull_from_dict(self._state_dict, 'enabled'):
-            enabled_page_element = self._get_page_element(enabled_en)
-            enabled_exists = enabled_page_element.exists()
-            if not enabled_exists:
-                return False
-            elif enabled_exists and not enabled_page_element().is_enabled():
-                return False
+        checks = list(self._checks())
+        results = [None] * len(checks)
+
+        if _can_run_scripts(self._driver):
+            scripted = [i for i, (_, _, element) in enumerate(checks) if not element._in_frame()]
+            if scripted:
+                self._driver.switch_to_default_content()
+                try:
+                    met = self._driver.execute_script(
+                        STATE_SCRIPT, [[checks[i][2]._script_locator(), checks[i][1]] for i in scripted]
+                    )
+                except WebDriverException:
+                    met = [None] * len(scripted)
+                for i, result in zip(scripted, met):
+                    results[i] = result
+
+        return [
+            (name, condition, bool(result) if result is not None else element._condition_met(condition))
+            for (name, condition, element), result in zip(checks, results)
+        ]
+
+    def _checks(self):
+        """
+        Get the element and condition for every condition in the state.
 
-        for enabled_en in self._pull_from_dict(self._state_dict, 'disabled'):
-            enabled_page_element = self._get_page_element(enabled_en)
-            enabled_exists = enabled_page_element.exists()
-            if not enabled_exists:
-                return False
-            elif enabled_exists and enabled_page_element().is_enabled():
-                return False
+        Returns:
+            generator of (element name, condition, PageElement) tuples
+        """
 
-        return True
+        for condition in STATE_CONDITIONS:
+            for name in self._pull_from_dict(self._state_dict, condition):
+                yield name, condition, self._get_page_element(name)
 
     def wait(self, timeout=30):
         """
-        Wait for the conditions set in the state dict to be met.
+        Wait for the conditions set in the state dict to be met.  Every condition
+        is checked at once against one deadline, so the wait lasts as long as the
+        slowest condition and never more than `timeout`.  In a browser one script
+        watches the page for all of them; otherwise the whole state is polled.
 
         Args:
             timeout:
@@ -77,33 +388,32 @@ class PageState(object):
             self
         """
 
-        page_settings = self._state_dict
-
-        exists = self._pull_from_dict(page_settings, 'exists')
-        absent = self._pull_from_dict(page_settings, 'absent')
-        not_displayed = self._pull_from_dict(page_settings, 'not_displayed')
-        displayed = self._pull_from_dict(page_settings, 'displayed')
-        enabled = self._pull_from_dict(page_settings, 'enabled')
-        disabled = self._pull_from_dict(page_settings, 'disabled')
-
-        for appears_element_name in exists:
-            self._get_page_element(appears_element_name).wait_exists(timeout=timeout)
+        checks = list(self._checks())
+        deadline = None if timeout is None else clock() + timeout
 
-        for displayed_element_name in displayed:
-            self._get_page_element(displayed_element_name).wait_displayed(timeout=timeout)
+        results = None
+        if _can_run_scripts(self._driver) and not any(element._in_frame() for _, _, element in checks):
+            results = _watch(self._driver, [[element._script_locator(), condition] for _, condition, element in checks],
+                             deadline, self._driver.switch_to_default_content)
 
-        for enabled_element_name in enabled:
-            self._get_page_element(enabled_element_name).wait_enabled(timeout=timeout)
-
-        for disabled_element_name in disabled:
-            self._get_page_element(disabled_element_name).wait_disabled(timeout=timeout)
+        if results is not None:
+            unmet = [(name, condition) for (name, condition, _), met in zip(checks, results) if not met]
+        else:
+            unmet = []
 
-        for not_displayed_element_name in not_displayed:
-            self._get_page_element(not_displayed_element_name).wait_not_displayed(timeout=timeout)
+            def reached(driver):
+                unmet[:] = [(name, condition) for name, condition, met in self.evaluate() if not met]
+                return not unmet
 
-        for disappear_element_name in absent:
-            self._get_page_element(disappear_element_name).wait_absent(timeout=timeout)
+            remaining = float('inf') if deadline is None else max(deadline - clock(), 0)
+            try:
+                RequestsWait(self._driver, remaining, poll_frequency=WAIT_POLL_FREQUENCY,
+                             max_poll_frequency=WAIT_MAX_POLL_FREQUENCY).until(reached)
+            except TimeoutException:
+                pass
 
+        if unmet:
+            raise PageStateTimeoutException(unmet, timeout)
         return self
 
     def _pull_from_dict(self, settings, name):
@@ -193,6 +503,18 @@ class PageElement(object):
     it's __call__ method invoked it will use the WebDriver instance to look up and
     return the WebElement it finds.  If the element cannot be found, it will raise
     the same selenium error.
+
+    Elements that were found are kept in the driver's `ElementCache`, so using the
+    same element again on the same page doesn't look it up again.  In a browser
+    that is only done for elements whose parents are in a frame, since checking a
+    cached element costs as much as most lookups.  Set `cache` to false in the
+    element's JSON to look it up every time.
+
+    The `wait_*` methods return as soon as the element meets their condition.  In a
+    browser they run a script that watches the page for changes with a
+    MutationObserver, so no time is lost between checks.  Drivers that can't run
+    scripts, like the `WebReader`, are polled instead, quickly at first and then
+    backing off.
     """
     def __init__(self, driver, element_dict):  # , parent=None):
         self.driver = driver
@@ -231,6 +553,8 @@ class PageElement(object):
             element_dict['parent'] = parent_location
 
         self._handle_element_dict(element_dict)
+        self._compile_chain()
+        self._compile_selector()
 
     def _handle_parent(self, parent_location):
         """
@@ -264,22 +588,24 @@ class PageElement(object):
             WebElement
         """
 
-        if not isinstance(self, Frame) and not isinstance(self.driver, WebReader):
-            self.driver.switch_to_default_content()
+        try:
+            return self._process(self._lookup())
+        except StaleElementReferenceException:
+            # The element went stale after the cache checked it.
+            element_cache(self.driver).invalidate(self)
+            return self._process(self._lookup())
 
-        # Navigate to the given frame.
-        if hasattr(self, 'frame'):
-            frame = getattr(self, 'frame')
-            self.driver.switch_to.frame(frame())
+    def _process(self, output):
+        """
+        Run the regex and bind settings on the elements that were found.
 
-        # Get the selenium driver method that is used to look up the element.
-        # find_element_by_*
-        lookup_method = self._get_lookup_method()
+        Args:
+            output:
+                WebElement or list
 
-        # Get the web element using the given selector and lookup method.
-        output = lookup_method(getattr(self, 'selector'))
-        if hasattr(self, 'index') and type(output) == list:
-            output = output[int(self.index)]
+        Returns:
+            mixed
+        """
 
         # Since parents are used to locate elements, we
         # don't need to worry about any bindings.
@@ -328,8 +654,7 @@ class PageElement(object):
         """
 
         try:
-            lookup_method = self._get_lookup_method()
-            ele = lookup_method(getattr(self, 'selector'))
+            ele = self._find()
 
             if ele:
                 # Check if we have a list of elements instead of a single element.
@@ -361,27 +686,7 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-
-        web_element = self()
-
-        if type(web_element) == list:
-            for thing in web_element:
-                while thing.is_enabled():
-                    sleep(1)
-                    wait_time += 1
-                    if timeout is not None:
-                        if wait_time >= timeout:
-                            raise TimeoutException()
-            return self
-
-        while web_element.is_enabled():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
-        return self
+        return self._wait('disabled', timeout)
 
     def wait_enabled(self, timeout=30):
         """
@@ -395,27 +700,7 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-
-        web_element = self()
-
-        if type(web_element) == list:
-            for thing in web_element:
-                while not thing.is_enabled():
-                    sleep(1)
-                    wait_time += 1
-                    if timeout is not None:
-                        if wait_time >= timeout:
-                            raise TimeoutException()
-            return self
-
-        while not web_element.is_enabled():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
-        return self
+        return self._wait('enabled', timeout)
 
     def wait_not_displayed(self, timeout=30):
         """
@@ -429,27 +714,7 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-
-        ele = self()
-
-        if type(ele) == list:
-            for thing in ele:
-                while thing.is_displayed():
-                    sleep(1)
-                    wait_time += 1
-                    if timeout is not None:
-                        if wait_time >= timeout:
-                            raise TimeoutException()
-            return self
-
-        while ele.is_displayed():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
-        return self
+        return self._wait('not_displayed', timeout)
 
     def wait_displayed(self, timeout=None):
         """
@@ -463,27 +728,7 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-
-        ele = self()
-
-        if type(ele) == list:
-            for thing in ele:
-                while not thing.is_displayed():
-                    sleep(1)
-                    wait_time += 1
-                    if timeout is not None:
-                        if wait_time >= timeout:
-                            raise TimeoutException()
-            return self
-
-        while not ele.is_displayed():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
-        return self
+        return self._wait('displayed', timeout)
 
     def wait_exists(self, timeout=None):
         """
@@ -497,15 +742,7 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-
-        while not self.exists():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
-        return self
+        return self._wait('exists', timeout)
 
     def wait_absent(self, timeout=None):
         """
@@ -519,15 +756,152 @@ class PageElement(object):
             self
         """
 
-        wait_time = 0
-        while self.exists():
-            sleep(1)
-            wait_time += 1
-            if timeout is not None:
-                if wait_time >= timeout:
-                    raise TimeoutException()
+        return self._wait('absent', timeout)
+
+    def _wait(self, condition, timeout):
+        """
+        Wait for the element to meet one of the `PageState` conditions: exists,
+        absent, displayed, not_displayed, enabled or disabled.  Elements that
+        aren't on the page yet are waited for too.
+
+        Args:
+            condition:
+                str
+            timeout:
+                None or int
+
+        Returns:
+            self
+        """
+
+        deadline = None if timeout is None else clock() + timeout
+        message = 'The element found by {} "{}" was not {} after {} seconds.'.format(
+            getattr(self, 'lookup_method'), getattr(self, 'selector'), condition.replace('_', ' '), timeout
+        )
+
+        # The watch script only enters the element's own frame, so parents
+        # in a frame are polled for instead.
+        if _can_run_scripts(self.driver) and (self.parent is None or not self.parent._in_frame()):
+            met = self._watch(condition, deadline)
+            if met:
+                return self
+            if met is not None:
+                raise TimeoutException(message)
+
+        # Poll for whatever is left of the wait.
+        remaining = float('inf') if deadline is None else max(deadline - clock(), 0)
+        wait = RequestsWait(self.driver, remaining, poll_frequency=WAIT_POLL_FREQUENCY,
+                            max_poll_frequency=WAIT_MAX_POLL_FREQUENCY)
+        wait.until(lambda driver: self._condition_met(condition), message)
         return self
 
+    def _in_frame(self):
+        """
+        Check if the element, or one of its parents, is in a frame.  The
+        browser scripts only look at the top of the page.
+
+        Returns:
+            bool
+        """
+
+        return hasattr(self, 'frame') or (self.parent is not None and self.parent._in_frame())
+
+    def _watch(self, condition, deadline):
+        """
+        Wait in the browser for the element to meet the condition.
+
+        Args:
+            condition:
+                str
+            deadline:
+                None or float
+
+        Returns:
+            bool, or None if the script could not be run
+        """
+
+        results = _watch(self.driver, [[self._script_locator(), condition]], deadline, self._enter_frame)
+        return None if results is None else bool(results[0])
+
+    def _condition_met(self, condition):
+        """
+        Look the element up and check if it meets the condition.
+
+        Args:
+            condition:
+                str
+
+        Returns:
+            bool
+        """
+
+        try:
+            found = self._lookup()
+        except (NoSuchElementException, IndexError):
+            return condition == 'absent'
+
+        try:
+            return self._elements_meet(found, condition)
+        except StaleElementReferenceException:
+            # It is looked up again on the next check.
+            element_cache(self.driver).invalidate(self)
+            return False
+
+    @staticmethod
+    def _elements_meet(found, condition):
+        """
+        Check if the elements found meet the condition.
+
+        Args:
+            found:
+                WebElement or list
+            condition:
+                str
+
+        Returns:
+            bool
+        """
+
+        elements = found if type(found) == list else [found]
+        if not elements:
+            return condition == 'absent'
+
+        if condition == 'exists':
+            return True
+        if condition == 'absent':
+            return False
+        if condition == 'displayed':
+            return all(element.is_displayed() for element in elements)
+        if condition == 'not_displayed':
+            return not any(element.is_displayed() for element in elements)
+        if condition == 'enabled':
+            return all(element.is_enabled() for element in elements)
+        if condition == 'disabled':
+            return not any(element.is_enabled() for element in elements)
+        raise ValueError('Unknown condition: {}'.format(condition))
+
+    def _script_locator(self):
+        """
+        Get the steps the browser scripts take to find the element: a
+        [lookup_method, selector, index, multiple] list for each parent, from
+        the outermost one, and then the element.  Like `_lookup`, the index is
+        only used for elements that are `multiple`.
+
+        Returns:
+            list
+        """
+
+        locator = self.parent._script_locator() if self.parent is not None else []
+        multiple = hasattr(self, 'multiple')
+        index = getattr(self, 'index', None) if multiple else None
+        locator.append([
+            getattr(self, 'lookup_method'),
+            getattr(self, 'selector'),
+            int(index) if index is not None else None,
+            multiple,
+        ])
+        return locator
+
     def _handle_element_dict(self, element_dict):
         """
         Set attributes based on the given dict.
@@ -549,23 +923,218 @@ class PageElement(object):
 
         return self
 
-    def _get_lookup_method(self):
+    def _compile_selector(self):
+        """
+        Compile xpath and css selectors into the shared selector cache when
+        the driver is a `WebReader`, so every lookup reuses the compiled
+        selector and bad selectors are caught when the page is loaded.
+
+        Returns:
+            self
+        """
+
+        if not isinstance(self.driver, WebReader) or not hasattr(self, 'selector'):
+            return self
+
+        if self._chain is not None:
+            selector_cache.xpath(self._chain)
+            return self
+
+        lookup_method = getattr(self, 'lookup_method', None)
+        selector = getattr(self, 'selector')
+        # Lookups from a parent element are scoped to the parent's subtree.
+        if lookup_method == 'xpath':
+            if self.parent is not None:
+                selector = scope_xpath(selector)
+            selector_cache.xpath(selector)
+        elif lookup_method == 'css_selector':
+            selector_cache.css(selector, 'descendant' if self.parent is not None else 'descendant-or-self')
+
+        return self
+
+    def _compile_chain(self):
+        """
+        Combine the lookups of the element and its parents into one XPath, so the
+        element is found with one call instead of one for every parent.  Chains of
+        id, name, class_name and tag_name lookups can be combined, and the outermost
+        parent can be an xpath lookup too.  Each parent still only matches its
+        first element, or the one at its `index`.  Chains with a parent in a frame
+        are left alone.
+
+        Returns:
+            self
+        """
+
+        self._chain = None
+        if self.parent is None:
+            return self
+
+        steps = []
+        element = self
+        while element is not None:
+            steps.append(element)
+            element = element.parent
+
+        xpath = ''
+        for element in reversed(steps):
+            step = _xpath_step(getattr(element, 'lookup_method', None), getattr(element, 'selector', ''), not xpath)
+            if step is None:
+                return self
+            if element is self:
+                xpath += step
+                break
+
+            multiple = hasattr(element, 'multiple')
+            if hasattr(element, 'frame') or (multiple and not hasattr(element, 'index')):
+                return self
+            position = int(element.index) + 1 if multiple else 1
+            if position <= 0:
+                position = 'last()' if position == 0 else 'last() - {}'.format(-position)
+            xpath = '({}{})[{}]'.format(xpath, step, position)
+
+        self._chain = xpath
+        return self
+
+    def _enter_frame(self, frame=None):
+        """
+        Switch the driver to the element's frame, or to the top of the page.
+
+        Args:
+            frame:
+                Frame to switch to instead of the element's own
+
+        Returns:
+            self
+        """
+
+        # Only a browser has frames to switch out of, and a HybridDriver only
+        # has one once it has moved the page to it.
+        if not isinstance(self, Frame) and _can_run_scripts(self.driver):
+            self.driver.switch_to_default_content()
+
+        # Navigate to the given frame.
+        if frame is None:
+            frame = getattr(self, 'frame', None)
+        if frame is not None:
+            self.driver.switch_to.frame(frame())
+
+        return self
+
+    def _walks_parents(self):
+        """
+        Check if the browser looks the element up one parent at a time, which
+        it does when a parent is in a frame.  Each parent switches to its
+        frame and is found with its own round trip.
+
+        Returns:
+            bool
+        """
+
+        return self._chain is None and self.parent is not None and self.parent._in_frame()
+
+    def _found_frame(self):
+        """
+        Get the frame the browser finds the element in.  When the parents are
+        walked, that is the frame the last of them switched to, not the
+        element's own.
+
+        Returns:
+            Frame or None
+        """
+
+        if self._walks_parents():
+            return self.parent._found_frame()
+        return getattr(self, 'frame', None)
+
+    def _lookup(self):
+        """
+        Look the element up in its frame, without any of the regex or bind
+        processing.  What was found is kept in the driver's `ElementCache`
+        unless the element's `cache` setting is false.
+
+        In a browser, checking a cached element is still on the page costs a
+        round trip of its own, the same as most lookups.  Only elements found
+        by walking their parents are cached there, and they are checked in
+        the frame the walk finds them in.
+
+        Returns:
+            WebElement or list
+        """
+
+        in_browser = _can_run_scripts(self.driver)
+        use_cache = getattr(self, 'cache', True) and (not in_browser or self._walks_parents())
+        if use_cache and in_browser and self in element_cache(self.driver):
+            self._enter_frame(self._found_frame())
+        else:
+            self._enter_frame()
+
+        if use_cache:
+            output = element_cache(self.driver).get(self, self.driver)
+            if output is not None:
+                return output
+
+        output = self._find()
+        if hasattr(self, 'index') and type(output) == list:
+            output = output[int(self.index)]
+
+        if use_cache:
+            element_cache(self.driver).store(self, self.driver, output)
+        return output
+
+    def _find(self):
+        """
+        Find the element from the driver.  A compiled parent chain is one xpath
+        lookup, and in a browser any other parent chain is found by one script.
+        Otherwise each parent is looked up in turn.
+
+        Returns:
+            WebElement or list
+        """
+
+        if self._chain is not None:
+            return self._get_lookup_method(self.driver, 'xpath')(self._chain)
+
+        if self.parent is not None and not self.parent._in_frame() and _can_run_scripts(self.driver):
+            locator = self.parent._script_locator()
+            locator.append([getattr(self, 'lookup_method'), getattr(self, 'selector'), None, hasattr(self, 'multiple')])
+            elements = self.driver.execute_script(LOCATE_SCRIPT, locator)
+            if hasattr(self, 'multiple'):
+                return elements
+            if not elements:
+                raise NoSuchElementException('No element was found by {} "{}" under its parents.'.format(
+                    getattr(self, 'lookup_method'), getattr(self, 'selector')
+                ))
+            return elements[0]
+
+        return self._get_lookup_method()(getattr(self, 'selector'))
+
+    def _get_lookup_method(self, parent=None, lookup_method=None):
         """
         Return the method used for looking up the element.
 
+        Args:
+            parent:
+                the WebDriver or WebElement to look the element up from, the
+                element's parent by default
+            lookup_method:
+                str, the element's lookup_method by default
+
         Returns:
             WebDriver method
         """
 
-        if self.parent is not None:
-            parent = getattr(self, 'parent')()
-        else:
-            parent = self.driver
+        if parent is None:
+            if self.parent is not None:
+                parent = getattr(self, 'parent')()
+            else:
+                parent = self.driver
+        if lookup_method is None:
+            lookup_method = getattr(self, 'lookup_method')
         # Handle finding multiple elements
         if hasattr(self, 'multiple'):
-            lookup_method = getattr(parent, 'find_elements_by_{}'.format(getattr(self, 'lookup_method')))
+            lookup_method = getattr(parent, 'find_elements_by_{}'.format(lookup_method))
         else:
-            lookup_method = getattr(parent, 'find_element_by_{}'.format(getattr(self, 'lookup_method')))
+            lookup_method = getattr(parent, 'find_element_by_{}'.format(lookup_method))
 
         return lookup_method
 
@@ -639,11 +1208,14 @@ class View(object):
     def __init__(self, driver, view_dict):
         self.driver = driver
         self.view_dict = view_dict
+        self.rate_limiter = shared_rate_limiter()
         self._handle_view_dict(view_dict)
 
     def get(self, item):
         """
-        Wrapper around WebDriver().get()
+        Wrapper around WebDriver().get().  Navigation is paced by the view's
+        `rate_limiter` so pages on the same host aren't loaded too quickly.
+        A `WebReader` paces its own requests.
 
         Args:
             item:
@@ -652,6 +1224,8 @@ class View(object):
 
         """
 
+        if self.rate_limiter is not None and not isinstance(self.driver, WebReader):
+            self.rate_limiter.wait(item)
         return self.driver.get(item)
 
     def __getattribute__(self, item):
@@ -0,0 +1,1681 @@
+from __future__ import print_function
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zlib
+from time import sleep, time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from lxml import html
+from selenium.common.exceptions import NoSuchElementException as SeleniumNoSuchElementException, TimeoutException, \
+    WebDriverException, StaleElementReferenceException
+from selenext.Helpers import Page, PageElement, PageStateTimeoutException, element_cache
+from selenext.Helpers.Scripts import ATTACHED_SCRIPT, LOCATE_SCRIPT
+from selenext.Helpers.Requests import WebReader, ResponseCache, RateLimiter, make_session, shared_session, get_parser, \
+    selector_cache, RetryPolicy, CircuitBreaker, WebHistory, BloomFilter, Crawler, canonicalize_url, ResponseArchive, \
+    RequestsWait, content_range
+from selenext.Helpers.Requests.Exceptions import CircuitOpenError, DownloadError, NoSuchElementException, \
+    NotArchivedError
+
+from selenext.Helpers.Requests.Hybrid import HybridDriver, HybridElement
+from selenext.Helpers.Requests.Index import DocumentIndex
+
+try:
+    import asyncio
+    from selenext.Helpers.Requests.AsyncReader import AsyncWebReader
+except (ImportError, SyntaxError):
+    AsyncWebReader = None
+
+
+TEST_PAGE = '''<!DOCTYPE html>
+<html>
+<head><title>Test Page</title></head>
+<body>
+<div id="viewport">
+    <form id="searchform" name="search">
+        <input id="search_input" name="q" class="input big" value="">
+        <button name="btnG" class="button">Search</button>
+    </form>
+</div>
+<ul id="results">
+    <li class="result"><h3 class="r">First</h3></li>
+    <li class="result"><h3 class="r">Second</h3></li>
+    <li class="result"><h3 class="r">Third</h3></li>
+</ul>
+</body>
+</html>
+'''
+
+FEED_SIZE = 2000
+DOWNLOAD = bytes(bytearray(i % 251 for i in range(300 * 1024)))
+
+
+def gzip_bytes(data):
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(data)
+    return out.getvalue()
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    pages = {
+        '/': ('text/html; charset=utf-8', TEST_PAGE),
+        '/other': ('text/html; charset=utf-8', '<html><body><p id="other">Other</p></body></html>'),
+        '/json': ('application/json', '{"key": "value", "items": [1, 2, 3]}'),
+        '/json-array': ('application/json; charset=utf-8', '[{"sku": 1}, {"sku": 2}, {"sku": 3}]'),
+        '/json-untyped': (None, '  [1, 2, 3]'),
+        '/log-untyped': (None, '[INFO] started'),
+        '/log': ('text/plain', '[INFO] started'),
+        '/items': ('application/json', '[' + ', '.join('{{"sku": {}, "name": "\u00e9"}}'.format(i)
+                                                       for i in range(FEED_SIZE)) + ']'),
+        '/crawl/0': ('text/html', '<html><body><a href="1">1</a><a href="/crawl/2#top">2</a><a href="./1">1</a>'
+                                  '<a href="http://example.com/x">x</a><a href="mailto:a@b.c">mail</a>'
+                                  '<a href="/crawl/3?b=2&amp;a=1">3</a></body></html>'),
+        '/crawl/1': ('text/html', '<html><body><a href="../crawl/3?a=1&amp;b=2">3</a><a href="/crawl/0">0</a>'
+                                  '</body></html>'),
+        '/crawl/2': ('text/html', '<html><body><a href="/crawl/4">4</a></body></html>'),
+        '/crawl/3?a=1&b=2': ('text/html', '<html><body><p>3</p></body></html>'),
+        '/crawl/4': ('text/html', '<html><body><a href="/crawl/5">5</a></body></html>'),
+        '/crawl/5': ('text/html', '<html><body><p>5</p></body></html>'),
+        '/crawl/dir/page': ('text/html', '<html><body><a href="child">child</a></body></html>'),
+        '/crawl/dir/child': ('text/html', '<html><body><p>child</p></body></html>'),
+    }
+    # Client ports seen by the server, used to check that connections are reused.
+    client_ports = []
+    # Requests being handled right now and the most seen at once.
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+    # Requests made to the /flaky and /down paths.
+    flaky_count = 0
+    down_count = 0
+    # The Range headers sent for /download, and whether it ignores them.
+    ranges = []
+    ignore_ranges = False
+    # The Accept-Encoding headers sent for /download, and when it gzips the
+    # file: never, 'accepted' if the request accepts gzip, or 'always'.
+    accept_encodings = []
+    gzip_downloads = None
+    # The /status page's text and the responses it has sent, by status code.
+    status = 'Working'
+    status_codes = []
+
+    def do_GET(self):
+        PageHandler.client_ports.append(self.client_address[1])
+        if self.path == '/slow':
+            self.do_slow_GET()
+            return
+        if self.path in ('/feed', '/list-feed'):
+            self.do_feed_GET()
+            return
+        if self.path == '/etag':
+            self.do_etag_GET()
+            return
+        if self.path == '/status':
+            self.do_status_GET()
+            return
+        if self.path in ('/latin1', '/undeclared', '/undeclared-utf8', '/meta-charset', '/gzip'):
+            self.do_encoded_GET()
+            return
+        if self.path in ('/flaky', '/down', '/busy'):
+            self.do_failing_GET()
+            return
+        if self.path == '/download':
+            self.do_download_GET()
+            return
+        if self.path == '/crawl/old':
+            self.send_response(301)
+            self.send_header('Location', '/crawl/dir/page')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body = self.pages.get(self.path, ('text/html', '<html><body>Not found</body></html>'))
+        body = body.encode('utf-8')
+        self.send_response(200 if self.path in self.pages else 404)
+        if content_type is not None:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_slow_GET(self):
+        with PageHandler.lock:
+            PageHandler.in_flight += 1
+            PageHandler.max_in_flight = max(PageHandler.max_in_flight, PageHandler.in_flight)
+        sleep(0.05)
+        with PageHandler.lock:
+            PageHandler.in_flight -= 1
+        body = b'<html><body><p id="slow">Slow</p></body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_feed_GET(self):
+        # Send the feed in chunks so it is parsed while it downloads.
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        # /list-feed wraps each product in a list item.
+        wrapper = ('<ul id="feed">', '<li>', '</li>', '</ul>') if self.path == '/list-feed' else \
+            ('<div id="feed">', '', '', '</div>')
+        chunks = ['<html><body><h1>Feed</h1>{}'.format(wrapper[0]).encode('utf-8')]
+        chunks += [
+            '{1}<div class="product"><span class="sku">SKU-{0}</span><div class="tag">\u00e9</div></div>{2}'
+            .format(i, wrapper[1], wrapper[2]).encode('utf-8') for i in range(FEED_SIZE)
+        ]
+        chunks.append('{}</body></html>'.format(wrapper[3]).encode('utf-8'))
+        for chunk in chunks:
+            self.wfile.write('{:x}\r\n'.format(len(chunk)).encode('ascii') + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_etag_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            return
+        body = b'<html><body><p id="etag">Tagged</p></body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_status_GET(self):
+        etag = '"{}"'.format(PageHandler.status)
+        if self.headers.get('If-None-Match') == etag:
+            PageHandler.status_codes.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        PageHandler.status_codes.append(200)
+        body = '<html><body><p id="status">{}</p></body></html>'.format(PageHandler.status).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_encoded_GET(self):
+        content_type = 'text/html'
+        headers = {}
+        if self.path == '/latin1':
+            content_type = 'text/html; charset=iso-8859-1'
+            body = u'<html><body><p id="word">caf\u00e9</p></body></html>'.encode('iso-8859-1')
+        elif self.path.startswith('/undeclared'):
+            body = u'<html><body><p id="word">caf\u00e9 cr\u00e8me</p></body></html>'.encode(
+                'utf-8' if self.path.endswith('utf8') else 'iso-8859-1'
+            )
+        elif self.path == '/meta-charset':
+            body = u'<html><head><meta charset="windows-1251"></head><body><p id="word">\u0434\u0430</p>' \
+                   u'</body></html>'.encode('windows-1251')
+        else:
+            body = gzip_bytes(u'\ufeff<html><body><p id="word">caf\u00e9</p></body></html>'.encode('utf-8'))
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_download_GET(self):
+        requested = self.headers.get('Range')
+        accept_encoding = self.headers.get('Accept-Encoding')
+        with PageHandler.lock:
+            PageHandler.ranges.append(requested)
+            PageHandler.accept_encodings.append(accept_encoding)
+        first, last = 0, len(DOWNLOAD) - 1
+        if requested and not PageHandler.ignore_ranges:
+            start, _, end = requested[len('bytes='):].partition('-')
+            first = int(start)
+            last = min(int(end), last) if end else last
+        if first >= len(DOWNLOAD):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */{}'.format(len(DOWNLOAD)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = DOWNLOAD[first:last + 1]
+        self.send_response(206 if len(body) < len(DOWNLOAD) else 200)
+        if len(body) < len(DOWNLOAD):
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(first, last, len(DOWNLOAD)))
+        if PageHandler.gzip_downloads == 'always' or \
+                (PageHandler.gzip_downloads == 'accepted' and 'gzip' in (accept_encoding or '')):
+            body = gzip_bytes(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_failing_GET(self):
+        # /flaky fails twice then works, /down always fails and /busy asks
+        # for a long Retry-After.
+        with PageHandler.lock:
+            if self.path == '/flaky':
+                PageHandler.flaky_count += 1
+                failed = PageHandler.flaky_count <= 2
+            else:
+                PageHandler.down_count += 1
+                failed = True
+        body = b'<html><body><p id="flaky">Up</p></body></html>' if not failed else b'Unavailable'
+        self.send_response(503 if failed else 200)
+        if self.path == '/busy':
+            self.send_header('Retry-After', '3600')
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadedHTTPServer(('127.0.0.1', 0), PageHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base_url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+class WebReaderTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.client_ports = []
+        self.reader = WebReader()
+
+    def tearDown(self):
+        self.reader.quit()
+
+    def test_get_page(self):
+        self.reader.get(self.base_url + '/')
+        self.assertEqual(self.reader.current_url, self.base_url + '/')
+        self.assertEqual(self.reader.find_element_by_id('search_input').get_attribute('name'), 'q')
+
+    def test_get_json(self):
+        self.assertEqual(self.reader.get(self.base_url + '/json')['key'], 'value')
+        self.assertIsNone(self.reader.node)
+        self.assertEqual(self.reader.get(self.base_url + '/json-array')[2], {'sku': 3})
+        self.assertEqual(self.reader.get(self.base_url + '/json-untyped'), [1, 2, 3])
+
+    def test_text_that_looks_like_json(self):
+        # Only responses without a Content-Type are checked for json, and
+        # they are read as html if they don't decode.
+        for path in ('/log', '/log-untyped'):
+            self.assertEqual(self.reader.get(self.base_url + path).text, '[INFO] started')
+            self.assertEqual(self.reader.find_element_by_tag_name('body').text, '[INFO] started')
+
+    def test_stream_json(self):
+        items = list(self.reader.stream_json(self.base_url + '/items', chunk_size=100))
+        self.assertEqual(len(items), FEED_SIZE)
+        self.assertEqual(items[-1], {'sku': FEED_SIZE - 1, 'name': u'\u00e9'})
+
+    def test_find_elements(self):
+        self.reader.get(self.base_url + '/')
+        results = self.reader.find_elements_by_class_name('r')
+        self.assertEqual([r.text for r in results], ['First', 'Second', 'Third'])
+        self.assertRaises(NoSuchElementException, self.reader.find_element_by_id, 'no_element_yo')
+
+    def test_elements_share_one_document(self):
+        self.reader.get(self.base_url + '/')
+        form = self.reader.find_element_by_xpath('//form')
+        button = form.find_element_by_css_selector('button.button')
+        self.assertIs(button.node.getroottree().getroot(), self.reader.node)
+        self.assertEqual(button.text, 'Search')
+        self.assertEqual(self.reader.find_element_by_tag_name('html').tag_name, 'html')
+
+    def test_elements_are_lazy_and_slotted(self):
+        self.reader.get(self.base_url + '/')
+        cells = self.reader.find_elements_by_tag_name('h3')
+        self.assertFalse(hasattr(cells[0], '__dict__'))
+        self.assertIsNone(cells[0]._text)
+        self.assertEqual(cells[0].text, 'First')
+        self.assertEqual(cells[0].tag_name, 'h3')
+        self.assertEqual(cells[0].id, cells[0].id)
+        self.assertNotEqual(cells[0].id, cells[1].id)
+
+    def test_reader_text_follows_page(self):
+        self.reader.get(self.base_url + '/other')
+        self.assertEqual(self.reader.text, 'Other')
+        self.reader.get(self.base_url + '/')
+        self.assertIn('Second', self.reader.text)
+
+    def test_xpath_is_scoped_to_element(self):
+        self.reader.get(self.base_url + '/')
+        self.assertEqual(len(self.reader.find_elements_by_xpath('//li')), 3)
+        form = self.reader.find_element_by_id('searchform')
+        self.assertEqual(form.find_elements_by_xpath('//li'), [])
+        self.assertEqual(form.find_element_by_xpath('//input').get_attribute('name'), 'q')
+        self.assertRaises(NoSuchElementException, form.find_element_by_xpath, '//h3')
+
+        # Every branch of a union is scoped, and so are paths in parentheses.
+        self.assertEqual([e.tag_name for e in form.find_elements_by_xpath('//input | //h3 | //button')],
+                         ['input', 'button'])
+        self.assertEqual(form.find_elements_by_xpath('(//h3)[1]'), [])
+        self.assertEqual(form.find_element_by_xpath('(//input | //li)[last()]').tag_name, 'input')
+        self.assertEqual(form.find_element_by_xpath('//*[@name="q|x" or @name="q"]').tag_name, 'input')
+        self.assertEqual(len(self.reader.find_elements_by_xpath('(//h3)[1] | //input')), 2)
+
+    def test_parsers(self):
+        for parser in ('lxml', 'html.parser', 'bs4-lxml'):
+            reader = WebReader(session=self.reader.session, parser=parser)
+            reader.get(self.base_url + '/')
+            self.assertEqual([r.text for r in reader.find_elements_by_css_selector('li h3')],
+                             ['First', 'Second', 'Third'])
+            self.assertEqual(reader.find_element_by_name('q').get_attribute('id'), 'search_input')
+        self.assertRaises(ValueError, get_parser, 'no_parser_yo')
+
+    def test_stream_elements(self):
+        skus = []
+        largest = 0
+        for product in self.reader.stream_elements(self.base_url + '/feed', 'div', css_selector='.product'):
+            skus.append(product.find_element_by_class_name('sku').text)
+            self.assertEqual(product.find_element_by_class_name('tag').text, u'\u00e9')
+            largest = max(largest, len(product.node.getparent()))
+        self.assertEqual(len(skus), FEED_SIZE)
+        self.assertEqual(skus[-1], 'SKU-{}'.format(FEED_SIZE - 1))
+        # Finished records are removed from the document as it streams.
+        self.assertLessEqual(largest, 2)
+        self.assertIsNone(self.reader.current_url)
+
+    def test_stream_elements_with_combinators(self):
+        url = self.base_url + '/feed'
+        for selector in ('#feed > div.product', 'body .product'):
+            products = self.reader.stream_elements(url, 'div', css_selector=selector)
+            self.assertEqual(sum(1 for _ in products), FEED_SIZE)
+        self.assertEqual(list(self.reader.stream_elements(url, 'div', css_selector='ul > .product')), [])
+
+        # Emptied list items are cleared along with the products in them.
+        largest = 0
+        skus = []
+        for product in self.reader.stream_elements(self.base_url + '/list-feed', 'div',
+                                                   css_selector='#feed > li > .product'):
+            skus.append(product.find_element_by_class_name('sku').text)
+            largest = max(largest, len(product.node.getparent().getparent()))
+        self.assertEqual(len(skus), FEED_SIZE)
+        self.assertLessEqual(largest, 2)
+        self.assertRaises(ValueError, list, self.reader.stream_elements(url, 'div', css_selector='h1 ~ div'))
+
+    def test_selectors_are_compiled_once(self):
+        # The elements aren't cached, so every access looks them up again.
+        page = Page(self.reader, {
+            'elements': {
+                'results': {'multiple': True, 'selector': '//h3[@class="r"]', 'lookup_method': 'xpath', 'cache': False},
+                'button': {'selector': 'form button.button', 'lookup_method': 'css_selector', 'cache': False},
+            }
+        })
+        self.reader.get(self.base_url + '/')
+        misses = selector_cache.misses
+        hits = selector_cache.hits
+        for _ in range(3):
+            self.assertEqual([r.text for r in page.results], ['First', 'Second', 'Third'])
+            self.assertEqual(page.button.text, 'Search')
+        self.assertEqual(selector_cache.misses, misses)
+        self.assertEqual(selector_cache.hits, hits + 6)
+
+    def test_get_many(self):
+        urls = [self.base_url + '/slow', self.base_url + '/', self.base_url + '/json', 'http://127.0.0.1:1/']
+        pages = list(self.reader.get_many(urls, max_workers=4))
+        self.assertEqual([page.current_url for page in pages], urls)
+        self.assertEqual(pages[0].find_element_by_id('slow').text, 'Slow')
+        self.assertEqual(len(pages[1].find_elements_by_class_name('r')), 3)
+        self.assertEqual(pages[2].current_response['key'], 'value')
+        self.assertIsNone(pages[2].error)
+        self.assertIsNotNone(pages[3].error)
+        self.assertIsNone(self.reader.current_url)
+
+    def test_get_many_as_completed(self):
+        urls = [self.base_url + '/slow', self.base_url + '/other']
+        pages = list(self.reader.get_many(urls, max_workers=2, ordered=False))
+        self.assertEqual([page.current_url for page in pages], urls[::-1])
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.reader.get(self.base_url + '/')
+        self.assertEqual(len(set(PageHandler.client_ports)), 1)
+
+    def test_session_is_shareable(self):
+        session = make_session(pool_maxsize=2)
+        first, second = WebReader(session=session), WebReader(session=session)
+        self.assertIs(first.session, second.session)
+        first.get(self.base_url + '/')
+        second.get(self.base_url + '/other')
+        self.assertEqual(len(set(PageHandler.client_ports)), 1)
+        self.assertEqual(second.find_element_by_id('other').text, 'Other')
+        self.assertIs(shared_session(), shared_session())
+
+
+class ResponseCacheTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.client_ports = []
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory, ttl=60)
+        self.reader = WebReader(cache=self.cache)
+
+    def tearDown(self):
+        self.reader.quit()
+        shutil.rmtree(self.directory)
+
+    def test_fresh_responses_skip_the_network(self):
+        self.reader.get(self.base_url + '/')
+        self.reader.get(self.base_url + '/')
+        self.assertEqual(len(PageHandler.client_ports), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.reader.find_element_by_id('search_input').get_attribute('name'), 'q')
+
+    def test_stale_responses_are_revalidated(self):
+        self.reader.get(self.base_url + '/etag')
+        self.reader.get(self.base_url + '/etag')
+        self.assertEqual(len(PageHandler.client_ports), 2)
+        self.assertEqual(self.cache.revalidations, 1)
+        self.assertEqual(self.reader.find_element_by_id('etag').text, 'Tagged')
+
+    def test_cache_survives_restart(self):
+        self.reader.get(self.base_url + '/')
+        reader = WebReader(cache=ResponseCache(self.directory, ttl=60))
+        reader.get(self.base_url + '/')
+        self.assertEqual(len(PageHandler.client_ports), 1)
+        self.assertEqual(reader.cache.hits, 1)
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.max_size = len(TEST_PAGE)
+        self.reader.get(self.base_url + '/')
+        self.reader.get(self.base_url + '/other')
+        self.reader.get(self.base_url + '/other')
+        self.assertEqual(len(self.cache), 1)
+        self.assertIsNone(self.cache.load(self.base_url + '/'))
+        self.assertIsNotNone(self.cache.load(self.base_url + '/other'))
+
+
+class RateLimiterTest(ServerTestCase):
+    def test_requests_are_paced_per_host(self):
+        limiter = RateLimiter(host_rates={'127.0.0.1': (10, 1)})
+        reader = WebReader(rate_limiter=limiter)
+        start = time()
+        for _ in range(4):
+            reader.get(self.base_url + '/other')
+        self.assertGreaterEqual(time() - start, 0.28)
+
+        start = time()
+        for _ in range(4):
+            reader.get(self.base_url.replace('127.0.0.1', 'localhost') + '/other')
+        self.assertLess(time() - start, 0.25)
+
+    def test_waiting_threads_do_not_block_other_hosts(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        limiter.wait('http://slow.example.com/')
+        thread = threading.Thread(target=limiter.wait, args=('http://slow.example.com/',))
+        thread.start()
+        start = time()
+        limiter.wait('http://fast.example.com/')
+        self.assertLess(time() - start, 0.1)
+        thread.join()
+
+
+class DocumentIndexTest(ServerTestCase):
+    def setUp(self):
+        self.reader = WebReader(cache=False)
+        self.reader.get(self.base_url + '/')
+
+    def test_lookups_use_the_index(self):
+        index = self.reader._index
+        self.assertIsNone(index._attributes)
+        self.assertEqual(self.reader.find_element_by_id('search_input').get_attribute('name'), 'q')
+        self.assertIsNotNone(index._attributes)
+        self.assertEqual([e.text for e in self.reader.find_elements_by_class_name('r')], ['First', 'Second', 'Third'])
+        self.assertEqual(self.reader.find_element_by_name('btnG').text, 'Search')
+        self.assertEqual(len(self.reader.find_elements_by_class_name('big')), 1)
+        # Class names with spaces are matched as a run of classes.
+        self.assertEqual(len(self.reader.find_elements_by_class_name('input big')), 1)
+        self.assertEqual(self.reader.find_elements_by_id('missing'), [])
+
+    def test_scoped_lookups(self):
+        results = self.reader.find_element_by_id('results')
+        self.assertIs(results._index, self.reader._index)
+        self.assertEqual(len(results.find_elements_by_class_name('r')), 3)
+        self.assertEqual(results.find_elements_by_name('q'), [])
+        self.assertEqual(results.find_elements_by_id('results'), [])
+        self.assertEqual(len(self.reader.find_elements_by_id('results')), 1)
+
+    def test_new_document_gets_a_new_index(self):
+        index = self.reader._index
+        self.reader.find_element_by_id('results')
+        self.reader.get(self.base_url + '/other')
+        self.assertIsNot(self.reader._index, index)
+        self.assertEqual(self.reader.find_element_by_id('other').text, 'Other')
+        self.assertRaises(NoSuchElementException, self.reader.find_element_by_id, 'results')
+
+    def test_classes_are_split_on_ascii_whitespace(self):
+        index = DocumentIndex(html.fromstring(u'<div><p class="a\u00a0b\fc">One</p><p class=" c ">Two</p></div>'))
+        self.assertEqual([e.text for e in index.find('class name', u'a\u00a0b')], ['One'])
+        self.assertEqual([e.text for e in index.find('class name', 'c')], ['One', 'Two'])
+        self.assertEqual(index.find('class name', 'a'), [])
+        self.assertIsNone(index.find('class name', 'a\fc'))
+        self.assertIsNone(index.find('class name', ''))
+
+    def test_streamed_elements_are_not_indexed(self):
+        for element in self.reader.stream_elements(self.base_url + '/feed', 'div', css_selector='.product'):
+            self.assertIsNone(element._index)
+            self.assertTrue(element.find_element_by_class_name('sku').text.startswith('SKU-'))
+
+
+class DownloadTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.ranges = []
+        PageHandler.ignore_ranges = False
+        PageHandler.accept_encodings = []
+        PageHandler.gzip_downloads = None
+        self.reader = WebReader(cache=False)
+        self.directory = tempfile.mkdtemp()
+        self.url = self.base_url + '/download'
+
+    def tearDown(self):
+        PageHandler.ignore_ranges = False
+        PageHandler.gzip_downloads = None
+        self.reader.quit()
+        shutil.rmtree(self.directory)
+
+    def test_download_is_spooled(self):
+        with self.reader.download(self.url) as download:
+            self.assertTrue(download.in_memory)
+            self.assertEqual(download.memoryview(), DOWNLOAD)
+            self.assertEqual(PageHandler.ranges, [None])
+
+        with self.reader.download(self.url, spool_size=64 * 1024) as download:
+            self.assertFalse(download.in_memory)
+            self.assertEqual(len(download), len(DOWNLOAD))
+            self.assertEqual(download.mmap()[:], DOWNLOAD)
+            path = download.save(os.path.join(self.directory, 'saved'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DOWNLOAD)
+
+    def test_download_resumes(self):
+        path = os.path.join(self.directory, 'download')
+        with open(path, 'wb') as f:
+            f.write(DOWNLOAD[:1000])
+
+        download = self.reader.download(self.url, path=path)
+        download.close()
+        self.assertEqual(PageHandler.ranges, ['bytes=1000-'])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DOWNLOAD)
+
+        # A finished download isn't sent again.
+        self.reader.download(self.url, path=path).close()
+        self.assertEqual(PageHandler.ranges[-1], 'bytes={}-'.format(len(DOWNLOAD)))
+        self.reader.download(self.url, path=path, resume=False).close()
+        self.assertEqual(PageHandler.ranges[-1], None)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DOWNLOAD)
+
+    def test_download_in_parts(self):
+        part_size = 64 * 1024
+        with self.reader.download(self.url, workers=3, part_size=part_size, spool_size=100 * 1024) as download:
+            self.assertEqual(download.read(), DOWNLOAD)
+            self.assertEqual(download.total_size, len(DOWNLOAD))
+        self.assertEqual(sorted(PageHandler.ranges), sorted(
+            'bytes={}-{}'.format(first, min(first + part_size, len(DOWNLOAD)) - 1)
+            for first in range(0, len(DOWNLOAD), part_size)
+        ))
+
+        # Servers that ignore ranges send the whole file at once.
+        PageHandler.ranges = []
+        PageHandler.ignore_ranges = True
+        with self.reader.download(self.url, workers=3, part_size=part_size) as download:
+            self.assertEqual(download.read(), DOWNLOAD)
+        self.assertEqual(len(PageHandler.ranges), 1)
+
+    def test_download_without_content_encoding(self):
+        # The file is asked for as it is, so a server that would gzip it
+        # sends the bytes the lengths and ranges count.
+        PageHandler.gzip_downloads = 'accepted'
+        path = os.path.join(self.directory, 'download')
+        with open(path, 'wb') as f:
+            f.write(DOWNLOAD[:1000])
+        self.reader.download(self.url, path=path).close()
+        with self.reader.download(self.url, workers=3, part_size=64 * 1024) as download:
+            self.assertEqual(download.read(), DOWNLOAD)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DOWNLOAD)
+        self.assertEqual(set(PageHandler.accept_encodings), {'identity'})
+
+        # A server that gzips it anyway still gives the whole file, but its
+        # ranges can't be used.
+        PageHandler.gzip_downloads = 'always'
+        with self.reader.download(self.url) as download:
+            self.assertEqual(download.read(), DOWNLOAD)
+            self.assertIsNone(download.total_size)
+        with self.assertRaises(DownloadError):
+            self.reader.download(self.url, workers=3, part_size=64 * 1024)
+
+    def test_content_range(self):
+        self.assertEqual(content_range('bytes 0-499/1234'), (0, 499, 1234))
+        self.assertEqual(content_range('bytes 10-20/*'), (10, 20, None))
+        self.assertEqual(content_range('bytes */1234'), (None, None, 1234))
+        self.assertIsNone(content_range(None))
+
+
+class EncodingTest(ServerTestCase):
+    def setUp(self):
+        self.reader = WebReader()
+
+    def test_charset_header(self):
+        self.reader.get(self.base_url + '/latin1')
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'caf\u00e9')
+
+    def test_undeclared_charset(self):
+        self.reader.get(self.base_url + '/undeclared')
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'caf\u00e9 cr\u00e8me')
+        self.assertIn(u'caf\u00e9 cr\u00e8me', self.reader.current_response)
+        self.reader.get(self.base_url + '/undeclared-utf8')
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'caf\u00e9 cr\u00e8me')
+
+    def test_meta_charset(self):
+        self.reader.get(self.base_url + '/meta-charset')
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'\u0434\u0430')
+
+    def test_gzip_with_byte_order_mark(self):
+        text = self.reader.get(self.base_url + '/gzip').text
+        self.assertTrue(text.startswith('<html>'))
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'caf\u00e9')
+
+    def test_text_is_decoded_lazily(self):
+        page = next(self.reader.get_many([self.base_url + '/latin1']))
+        self.assertIsNone(page._response._text)
+        self.assertEqual(page.find_element_by_id('word').text, u'caf\u00e9')
+        self.assertIsNone(page._response._text)
+        self.assertIn(u'caf\u00e9', page.find_element_by_id('word').current_response)
+
+    def test_get_decodes_lazily(self):
+        body = self.reader.get(self.base_url + '/latin1')
+        self.assertIs(body, self.reader._response)
+        self.assertIsNone(body._text)
+        self.assertEqual(self.reader.find_element_by_id('word').text, u'caf\u00e9')
+        self.assertIsNone(body._text)
+        self.assertIn(u'caf\u00e9', str(body))
+
+        # Snapshots in the history don't keep the decoded text.
+        self.reader.get(self.base_url + '/other')
+        self.reader.back()
+        self.assertIsNone(self.reader._response._text)
+        self.assertIn(u'caf\u00e9', self.reader.current_response)
+        self.reader.forward()
+        self.reader.back()
+        self.assertIsNone(self.reader._response._text)
+
+    def test_text_parsers_get_text(self):
+        reader = WebReader(parser=lambda text: html.document_fromstring(text))
+        reader.get(self.base_url + '/latin1')
+        self.assertEqual(reader.find_element_by_id('word').text, u'caf\u00e9')
+
+
+class WebHistoryTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.client_ports = []
+
+    def test_back_and_forward_use_snapshots(self):
+        reader = WebReader(history=WebHistory(snapshots=5))
+        reader.get(self.base_url + '/')
+        reader.get(self.base_url + '/other')
+        reader.get(self.base_url + '/json')
+        requests_made = len(PageHandler.client_ports)
+
+        reader.back()
+        self.assertEqual(reader.current_url, self.base_url + '/other')
+        self.assertEqual(reader.find_element_by_id('other').text, 'Other')
+        reader.back()
+        self.assertEqual(reader.find_element_by_id('search_input').get_attribute('name'), 'q')
+        reader.forward().forward()
+        self.assertEqual(reader.current_response['key'], 'value')
+        self.assertEqual(len(PageHandler.client_ports), requests_made)
+
+    def test_compressed_snapshots(self):
+        reader = WebReader(history=WebHistory(snapshots=5, compress=True))
+        reader.get(self.base_url + '/json')
+        reader.get(self.base_url + '/other')
+        requests_made = len(PageHandler.client_ports)
+
+        reader.back()
+        self.assertEqual(reader.current_response['items'], [1, 2, 3])
+        reader.forward()
+        self.assertEqual(reader.find_element_by_id('other').text, 'Other')
+        self.assertEqual(len(PageHandler.client_ports), requests_made)
+
+    def test_pages_without_snapshots_are_fetched(self):
+        reader = WebReader(history=WebHistory(snapshots=1))
+        reader.get(self.base_url + '/')
+        reader.get(self.base_url + '/other')
+        requests_made = len(PageHandler.client_ports)
+
+        reader.back()
+        self.assertEqual(len(PageHandler.client_ports), requests_made + 1)
+        self.assertEqual(len(reader.find_elements_by_class_name('result')), 3)
+
+    def test_history_is_bounded(self):
+        history = WebHistory(max_size=3, snapshots=2)
+        for i in range(5):
+            history.register('/page{}'.format(i)).store('page {}'.format(i), None)
+        self.assertEqual(list(history.history), ['/page2', '/page3', '/page4'])
+        self.assertEqual(history.current_url(), '/page4')
+        self.assertEqual(len(history._snapshots), 2)
+        self.assertEqual(history.back(), '/page3')
+        self.assertEqual(history.load(), ('page 3', None))
+        self.assertEqual(history.back(), '/page2')
+        self.assertIsNone(history.load())
+        self.assertEqual(history.back(), '/page2')
+
+    def test_new_navigation_drops_forward_history(self):
+        history = WebHistory(snapshots=5)
+        for url in ('/a', '/b', '/c'):
+            history.register(url).store(url, None)
+        history.back()
+        history.back()
+        history.register('/d').store('/d', None)
+        self.assertEqual(list(history.history), ['/a', '/d'])
+        self.assertEqual(history.forward(), '/d')
+        self.assertEqual(history.load(), ('/d', None))
+        self.assertEqual(history.back(), '/a')
+        self.assertEqual(history.load(), ('/a', None))
+
+
+class CrawlerTest(ServerTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def crawled(self, crawler):
+        return sorted(page.current_url.replace(self.base_url, '') for page in crawler.crawl())
+
+    def test_canonicalize_url(self):
+        self.assertEqual(canonicalize_url('../b/./c/?z=1&a=2#top', base='HTTP://Example.COM:80/a/d'),
+                         'http://example.com/b/c/?a=2&z=1')
+        self.assertEqual(canonicalize_url('https://example.com:8443/%7euser?utm_source=x&q=1',
+                                          ignore_params=['utm_source']), 'https://example.com:8443/~user?q=1')
+        self.assertEqual(canonicalize_url('http://example.com'), 'http://example.com/')
+        self.assertIsNone(canonicalize_url('javascript:void(0)'))
+        self.assertIsNone(canonicalize_url('mailto:a@b.c'))
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        urls = ['http://example.com/{}'.format(i) for i in range(1000)]
+        for url in urls:
+            bloom.add(url)
+        self.assertTrue(all(url in bloom for url in urls))
+        false_positives = sum('http://example.org/{}'.format(i) in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+        self.assertEqual(len(BloomFilter.from_dict(bloom.to_dict()).bits), len(bloom.bits))
+
+    def test_each_url_is_crawled_once(self):
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'])
+        crawler.add(self.base_url + '/crawl/0')
+        self.assertEqual(self.crawled(crawler), ['/crawl/0', '/crawl/1', '/crawl/2', '/crawl/3?a=1&b=2',
+                                                 '/crawl/4', '/crawl/5'])
+        self.assertFalse(crawler.add(self.base_url + '/crawl/1#again'))
+
+    def test_links_are_relative_to_the_redirected_url(self):
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'])
+        crawler.add(self.base_url + '/crawl/old')
+        pages = list(crawler.crawl())
+        self.assertEqual(pages[0].final_url, self.base_url + '/crawl/dir/page')
+        self.assertEqual(sorted(page.current_url.replace(self.base_url, '') for page in pages),
+                         ['/crawl/dir/child', '/crawl/old'])
+
+    def test_depth_and_domain_limits(self):
+        crawler = Crawler(WebReader(), max_depth=1, allowed_domains=['127.0.0.1'])
+        crawler.add(self.base_url + '/crawl/0')
+        self.assertEqual(self.crawled(crawler), ['/crawl/0', '/crawl/1', '/crawl/2', '/crawl/3?a=1&b=2'])
+
+        crawler = Crawler(WebReader(), max_per_domain=2, allowed_domains=['127.0.0.1'])
+        crawler.add(self.base_url + '/crawl/0')
+        self.assertEqual(len(self.crawled(crawler)), 2)
+
+    def test_priority(self):
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'], batch_size=1,
+                          priority=lambda url, depth: url.endswith('/2'))
+        crawler.add(self.base_url + '/crawl/0')
+        pages = crawler.crawl()
+        next(pages)
+        self.assertTrue(next(pages).current_url.endswith('/crawl/2'))
+
+    def test_checkpoint_resume(self):
+        checkpoint = self.directory + '/crawl.state'
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'], max_pages=3, checkpoint=checkpoint,
+                          checkpoint_interval=1, batch_size=2)
+        crawler.add(self.base_url + '/crawl/0')
+        first = self.crawled(crawler)
+        self.assertEqual(len(first), 3)
+
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'], checkpoint=checkpoint)
+        self.assertEqual(crawler.pages, 3)
+        self.assertFalse(crawler.add(self.base_url + '/crawl/0'))
+        second = self.crawled(crawler)
+        self.assertEqual(sorted(first + second), ['/crawl/0', '/crawl/1', '/crawl/2', '/crawl/3?a=1&b=2',
+                                                  '/crawl/4', '/crawl/5'])
+
+    def test_stopped_crawl_keeps_unfinished_urls(self):
+        checkpoint = self.directory + '/crawl.state'
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'], checkpoint=checkpoint, batch_size=10)
+        crawler.add(self.base_url + '/crawl/0')
+        pages = crawler.crawl()
+        first = [next(pages).current_url.replace(self.base_url, ''), next(pages).current_url.replace(self.base_url, '')]
+        pages.close()
+
+        crawler = Crawler(WebReader(), allowed_domains=['127.0.0.1'], checkpoint=checkpoint)
+        self.assertEqual(sorted(first + self.crawled(crawler)), ['/crawl/0', '/crawl/1', '/crawl/2',
+                                                                 '/crawl/3?a=1&b=2', '/crawl/4', '/crawl/5'])
+
+
+class ResponseArchiveTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.client_ports = []
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + '/pages.archive'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, *paths):
+        reader = WebReader(record=self.path, cache=False)
+        for path in paths:
+            reader.get(self.base_url + path)
+        reader.quit()
+
+    def test_replay_without_network(self):
+        self.record('/', '/json', '/gzip', '/feed')
+        requests_made = len(PageHandler.client_ports)
+
+        reader = WebReader(replay=self.path)
+        self.assertEqual(len(reader.replay), 4)
+        reader.get(self.base_url + '/')
+        self.assertEqual(len(reader.find_elements_by_class_name('result')), 3)
+        self.assertEqual(reader.get(self.base_url + '/json')['key'], 'value')
+        reader.get(self.base_url + '/gzip')
+        self.assertEqual(reader.find_element_by_id('word').text, u'caf\u00e9')
+        skus = [element.text for element in reader.stream_elements(self.base_url + '/feed', 'span')]
+        self.assertEqual(len(skus), FEED_SIZE)
+
+        pages = list(reader.get_many([self.base_url + '/', self.base_url + '/missing']))
+        self.assertIsNone(pages[0].error)
+        self.assertIsInstance(pages[1].error, NotArchivedError)
+        self.assertRaises(NotArchivedError, reader.get, self.base_url + '/other')
+        self.assertEqual(len(PageHandler.client_ports), requests_made)
+
+    def test_latest_recording_wins(self):
+        self.record('/', '/other')
+        self.record('/other')
+        archive = ResponseArchive(self.path)
+        self.assertEqual(len(archive), 2)
+        self.assertIn(b'Other', archive.load(self.base_url + '/other').content)
+
+    def test_unchanged_pages_are_not_recorded(self):
+        PageHandler.status = 'Working'
+        reader = WebReader(record=self.path, cache=False)
+        reader.get(self.base_url + '/status')
+        self.assertFalse(reader.revalidate())
+        reader.quit()
+
+        # The 304 from revalidating doesn't replace the page's recording.
+        reader = WebReader(replay=self.path)
+        reader.get(self.base_url + '/status')
+        self.assertEqual(reader.find_element_by_id('status').text, 'Working')
+
+    def test_readers_share_an_archive(self):
+        urls = [self.base_url + path for path in ('/', '/other', '/json', '/json-array')]
+
+        def record(urls):
+            reader = WebReader(record=self.path, cache=False, rate_limiter=False)
+            for _ in range(50):
+                for url in urls:
+                    reader.get(url)
+
+        threads = [threading.Thread(target=record, args=(urls[i:] + urls[:i],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIs(WebReader(record=self.path).record, WebReader(replay=self.path).replay)
+        archive = ResponseArchive(self.path)
+        self.assertEqual(sorted(archive), sorted(urls))
+        with open(self.path + '.idx') as f:
+            self.assertEqual(len(f.readlines()), 800)
+        self.assertEqual(archive.load(self.base_url + '/json').json()['items'], [1, 2, 3])
+        self.assertIn(b'Other', archive.load(self.base_url + '/other').content)
+
+        # Every line of the index points at its own record.
+        with open(self.path, 'rb') as archive_file, open(self.path + '.idx') as f:
+            for line in f:
+                url, offset, length = json.loads(line)
+                archive_file.seek(offset)
+                meta = zlib.decompress(archive_file.read(length)).split(b'\n', 1)[0]
+                self.assertEqual(json.loads(meta.decode('utf-8'))['url'], url)
+
+    def test_index_is_rebuilt(self):
+        self.record('/', '/other', '/json')
+        with open(self.path + '.idx') as f:
+            lines = f.readlines()
+        with open(self.path + '.idx', 'w') as f:
+            f.writelines(lines[:1])
+        # A record cut off part way through is dropped.
+        with open(self.path, 'ab') as f:
+            f.write(b'\xff\x00\x00\x00partial')
+
+        archive = ResponseArchive(self.path)
+        self.assertEqual(sorted(archive), [self.base_url + path for path in ('/', '/json', '/other')])
+        self.assertEqual(archive.load(self.base_url + '/json').json()['items'], [1, 2, 3])
+        with open(self.path + '.idx') as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+
+class RequestsWaitTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.status = 'Working'
+        PageHandler.status_codes = []
+        self.reader = WebReader(cache=False)
+        self.reader.get(self.base_url + '/status')
+
+    def status_is(self, text):
+        return lambda reader: reader.find_element_by_id('status').text == text
+
+    def test_until_polls_with_conditional_requests(self):
+        documents = set()
+
+        def done(reader):
+            documents.add(id(reader.node))
+            return reader.find_element_by_id('status').text == 'Done'
+
+        timer = threading.Timer(0.3, setattr, (PageHandler, 'status', 'Done'))
+        timer.start()
+        wait = RequestsWait(self.reader, 5, poll_frequency=0.05, backoff=1)
+        self.assertTrue(wait.until(done))
+        timer.join()
+
+        self.assertIn(304, PageHandler.status_codes)
+        self.assertEqual(PageHandler.status_codes[-1], 200)
+        # The document is only parsed again when the page changed.
+        self.assertEqual(len(documents), 2)
+
+    def test_until_times_out(self):
+        wait = RequestsWait(self.reader, 0.3, poll_frequency=0.05)
+        start = time()
+        self.assertRaises(TimeoutException, wait.until, self.status_is('Done'), 'Still working')
+        self.assertLess(time() - start, 1)
+        self.assertGreater(len(PageHandler.status_codes), 2)
+
+    def test_backoff(self):
+        wait = RequestsWait(self.reader, 0.5, poll_frequency=0.05, backoff=2, max_poll_frequency=0.2)
+        self.assertRaises(TimeoutException, wait.until, self.status_is('Done'))
+        # Waits of 0.05, 0.1, 0.2, 0.2 then the deadline.
+        self.assertLessEqual(len(PageHandler.status_codes), 6)
+
+    def test_until_not(self):
+        wait = RequestsWait(self.reader, 1, poll_frequency=0.05)
+        self.assertTrue(wait.until_not(lambda reader: reader.find_element_by_id('missing')))
+        self.assertFalse(wait.until_not(self.status_is('Done')))
+
+    def test_revalidate(self):
+        self.assertFalse(self.reader.revalidate())
+        PageHandler.status = 'Done'
+        self.assertTrue(self.reader.revalidate())
+        self.assertEqual(self.reader.find_element_by_id('status').text, 'Done')
+        self.assertEqual(PageHandler.status_codes, [200, 304, 200])
+
+
+class FakeBrowserElement(object):
+    def __init__(self, browser, locator):
+        self.browser = browser
+        self.locator = locator
+
+    def find_elements(self, by, value):
+        return [FakeBrowserElement(self.browser, self.locator + [(by, value, i)]) for i in range(3)]
+
+    def find_element_by_name(self, value):
+        self.browser.actions.append(('find', 'name', value))
+        return self.find_elements('name', value)[0]
+
+    def click(self):
+        self.browser.actions.append(('click', self.locator))
+
+    def send_keys(self, *value):
+        self.browser.actions.append(('send_keys', self.locator, value))
+
+
+class FakeBrowser(object):
+    """
+    Stands in for a selenium WebDriver, recording what the HybridDriver asks
+    of it.
+    """
+    def __init__(self):
+        self.urls = []
+        self.cookies = []
+        self.actions = []
+        self.current_url = None
+
+    def get(self, url):
+        self.urls.append(url)
+        self.current_url = url
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def get_cookies(self):
+        return self.cookies + [{'name': 'browser', 'value': 'yes', 'domain': '127.0.0.1', 'path': '/'}]
+
+    def find_elements(self, by, value):
+        return [FakeBrowserElement(self, [(by, value, i)]) for i in range(3)]
+
+    def find_element(self, by, value):
+        return self.find_elements(by, value)[0]
+
+    def execute_script(self, script, *args):
+        return 'ran {}'.format(script)
+
+    def quit(self):
+        self.actions.append(('quit',))
+
+
+class HybridDriverTest(ServerTestCase):
+    def setUp(self):
+        self.browsers = []
+        self.driver = HybridDriver(browser_factory=self.start_browser, cache=False)
+        self.url = self.base_url + '/'
+        self.driver.get(self.url)
+
+    def start_browser(self):
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    def test_reads_do_not_start_the_browser(self):
+        self.assertEqual([element.text for element in self.driver.find_elements_by_class_name('r')],
+                         ['First', 'Second', 'Third'])
+        element = self.driver.find_element_by_id('searchform').find_element_by_name('q')
+        self.assertIsInstance(element, HybridElement)
+        self.assertEqual(element.get_attribute('class'), 'input big')
+        self.assertEqual(self.browsers, [])
+
+    def test_interaction_starts_the_browser_with_cookies(self):
+        self.driver.session.cookies.set('token', 'abc', domain='127.0.0.1', path='/')
+        results = self.driver.find_elements_by_class_name('result')
+        search_input = self.driver.find_element_by_id('searchform').find_element_by_name('q')
+        results[2].find_element_by_tag_name('h3').click()
+        search_input.send_keys('selenext')
+
+        self.assertEqual(len(self.browsers), 1)
+        browser = self.browsers[0]
+        self.assertEqual(browser.urls, [self.url, self.url])
+        self.assertEqual([(cookie['name'], cookie['value']) for cookie in browser.cookies], [('token', 'abc')])
+        self.assertEqual(browser.actions, [
+            ('click', [('class name', 'result', 2), ('tag name', 'h3', 0)]),
+            ('send_keys', [('id', 'searchform', 0), ('name', 'q', 0)], ('selenext',)),
+        ])
+        self.assertIsInstance(self.driver.find_element_by_id('searchform'), FakeBrowserElement)
+
+    def test_next_get_goes_back_to_http(self):
+        self.assertEqual(self.driver.execute_script('return 1'), 'ran return 1')
+        self.assertTrue(self.driver.escalated)
+
+        self.driver.get(self.base_url + '/other')
+        self.assertFalse(self.driver.escalated)
+        self.assertEqual(self.driver.session.cookies.get('browser'), 'yes')
+        self.assertEqual(self.driver.find_element_by_id('other').text, 'Other')
+
+        self.driver.execute_script('return 2')
+        self.assertEqual(len(self.browsers), 1)
+        self.assertEqual(self.browsers[0].urls[-1], self.base_url + '/other')
+
+        self.driver.quit()
+        self.assertEqual(self.browsers[0].actions, [('quit',)])
+
+    def test_history_goes_back_to_http(self):
+        self.driver.get(self.base_url + '/other')
+        self.driver.execute_script('return 1')
+        self.driver.back()
+        self.assertFalse(self.driver.escalated)
+        self.assertEqual(self.driver.session.cookies.get('browser'), 'yes')
+        self.assertEqual(self.driver.current_url, self.url)
+        self.assertEqual(len(self.driver.find_elements_by_class_name('result')), 3)
+
+        self.driver.execute_script('return 2')
+        self.driver.forward()
+        self.assertFalse(self.driver.escalated)
+        self.assertEqual(self.driver.find_element_by_id('other').text, 'Other')
+
+    def test_pages_in_the_browser_are_not_fetched_again(self):
+        PageHandler.status_codes = []
+        self.driver.get(self.base_url + '/status')
+        self.driver.execute_script('return 1')
+        self.assertFalse(self.driver.revalidate())
+        RequestsWait(self.driver, 0.2, poll_frequency=0.05).until(lambda driver: True)
+        self.assertRaises(TimeoutException, RequestsWait(self.driver, 0.2, poll_frequency=0.05).until,
+                          lambda driver: False)
+        self.assertEqual(PageHandler.status_codes, [200])
+
+    def test_missing_elements_raise_selenium_exception(self):
+        self.assertRaises(SeleniumNoSuchElementException, self.driver.find_element_by_id, 'missing')
+
+    def test_frame_lookups_switch_back_in_the_browser(self):
+        browser = ScriptBrowser()
+        driver = HybridDriver(browser_factory=lambda: browser, cache=False)
+        driver.get(self.url)
+        driver.escalate()
+        framed = PageElement(driver, {'selector': 'q', 'lookup_method': 'name', 'cache': False,
+                                      'frame': {'selector': 'main', 'lookup_method': 'name'}})
+        top = PageElement(driver, {'selector': 'q', 'lookup_method': 'name', 'cache': False})
+
+        framed()
+        top()
+        self.assertEqual(browser.actions, [('default content',), ('frame', [('name', 'main', 0)]),
+                                           ('default content',)])
+
+
+class FakeSwitchTo(object):
+    def __init__(self, browser):
+        self.browser = browser
+
+    def frame(self, element):
+        self.browser.actions.append(('frame', element.locator))
+
+    def default_content(self):
+        self.browser.actions.append(('default content',))
+
+
+class ScriptBrowser(FakeBrowser):
+    """
+    A FakeBrowser that answers the watch script with the next of `results`,
+    then False, or refuses to run scripts if `results` is None.  Scripts
+    that answer False take up to 0.1 seconds, like a watch that ran out.
+    """
+    def __init__(self, results=None):
+        super(ScriptBrowser, self).__init__()
+        self.results = results
+        self.scripts = []
+        self.switch_to = FakeSwitchTo(self)
+        # Whether the elements it has handed out have gone stale.
+        self.stale = False
+
+    def switch_to_default_content(self):
+        pass
+
+    def execute_async_script(self, script, *args):
+        self.scripts.append(args)
+        if self.results is None:
+            raise WebDriverException('Scripts are turned off.')
+        result = self.results.pop(0) if self.results else False
+        if not result:
+            sleep(min(args[1], 100) / 1000.0)
+        return [result] * len(args[0])
+
+    def find_element_by_name(self, value):
+        self.actions.append(('find', 'name', value))
+        return self.find_element('name', value)
+
+    def execute_script(self, script, *args):
+        self.scripts.append(args)
+        if script == ATTACHED_SCRIPT:
+            if self.stale:
+                raise StaleElementReferenceException('The element is no longer attached to the DOM.')
+            return True
+        if script == LOCATE_SCRIPT:
+            return [FakeBrowserElement(self, args[0])]
+        # Only no_element_yo is missing; everything else is there and shown.
+        return [(locator[-1][1] == 'no_element_yo') == (condition == 'absent') for locator, condition in args[0]]
+
+
+class PageElementWaitTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.status = 'Working'
+        self.reader = WebReader(cache=False)
+        self.page = Page(self.reader, {
+            'elements': {
+                'status': {'selector': 'status', 'lookup_method': 'id'},
+                'done': {'selector': '//p[@id="status"][text()="Done"]', 'lookup_method': 'xpath'},
+            }
+        })
+        self.reader.get(self.base_url + '/status')
+
+    def test_wait_returns_when_the_page_changes(self):
+        self.page.view.status.wait_exists().wait_displayed(timeout=1).wait_enabled(timeout=1)
+        timer = threading.Timer(0.3, setattr, (PageHandler, 'status', 'Done'))
+        timer.start()
+        start = time()
+        self.page.view.done.wait_exists(timeout=5)
+        self.assertLess(time() - start, 1.5)
+        timer.join()
+        self.assertEqual(self.page.done.text, 'Done')
+
+    def test_wait_times_out(self):
+        start = time()
+        with self.assertRaises(TimeoutException) as context:
+            self.page.view.done.wait_exists(timeout=0.3)
+        self.assertLess(time() - start, 1.5)
+        self.assertIn('was not exists', context.exception.msg)
+        self.page.view.done.wait_absent(timeout=0)
+        self.assertRaises(TimeoutException, self.page.view.status.wait_not_displayed, timeout=0)
+
+    def test_wait_watches_in_the_browser(self):
+        browser = ScriptBrowser([False, True])
+        element = PageElement(browser, {
+            'selector': 'searchform',
+            'lookup_method': 'id',
+            'parent': {'selector': 'field', 'lookup_method': 'class_name', 'multiple': True, 'index': 1},
+        })
+        self.assertIs(element.wait_displayed(), element)
+        self.assertEqual(len(browser.scripts), 2)
+        self.assertEqual(browser.scripts[0], (
+            [[[['class_name', 'field', 1, True], ['id', 'searchform', None, False]], 'displayed']], 10000
+        ))
+        # Nothing was looked up from python.
+        self.assertEqual(browser.actions, [])
+
+        # The index is only used by elements that are multiple, like lookups
+        # from python.
+        browser = ScriptBrowser([True])
+        PageElement(browser, {'selector': 'q', 'lookup_method': 'name', 'index': 2}).wait_exists()
+        self.assertEqual(browser.scripts[0][0], [[[['name', 'q', None, False]], 'exists']])
+
+        browser = ScriptBrowser([])
+        self.assertRaises(TimeoutException, PageElement(browser, {'selector': 'q', 'lookup_method': 'name'})
+                          .wait_exists, timeout=0.2)
+        self.assertLessEqual(browser.scripts[0][1], 200)
+
+    def test_wait_falls_back_to_polling(self):
+        browser = ScriptBrowser()
+        PageElement(browser, {'selector': 'q', 'lookup_method': 'name'}).wait_exists(timeout=1)
+        self.assertEqual(len(browser.scripts), 1)
+        self.assertEqual(browser.actions, [('find', 'name', 'q')])
+
+    def test_wait_polls_under_a_parent_in_a_frame(self):
+        # The watch script only looks at the top of the page, so it would
+        # never find a parent in a frame.
+        browser = ScriptBrowser([True])
+        element = PageElement(browser, {
+            'selector': 'q',
+            'lookup_method': 'name',
+            'parent': {'selector': 'searchform', 'lookup_method': 'name', 'frame': {
+                'selector': 'main', 'lookup_method': 'name'
+            }},
+        })
+        element.wait_exists(timeout=1)
+        self.assertEqual(browser.scripts, [])
+        self.assertEqual(browser.actions, [('find', 'name', 'main'), ('frame', [('name', 'main', 0)]),
+                                           ('find', 'name', 'searchform'), ('find', 'name', 'q')])
+
+
+class PageStateTest(ServerTestCase):
+    @staticmethod
+    def view(extra_states=None):
+        # PageElements replace parts of their dict, so each page gets a new one.
+        states = {
+            'searched': {'exists': ['search_form', 'results'], 'displayed': ['results'], 'absent': ['missing']},
+            'empty': {'exists': ['search_input'], 'absent': ['results']},
+        }
+        states.update(extra_states or {})
+        return {
+            'elements': {
+                'search_input': {'selector': 'q', 'lookup_method': 'name'},
+                'results': {'selector': 'r', 'lookup_method': 'class_name', 'multiple': True},
+                'search_form': {
+                    'selector': 'searchform',
+                    'lookup_method': 'id',
+                    'parent': {'selector': 'viewport', 'lookup_method': 'id'},
+                },
+                'missing': {'selector': 'no_element_yo', 'lookup_method': 'id'},
+                'status': {'selector': 'status', 'lookup_method': 'id'},
+                'done': {'selector': '//p[@id="status"][text()="Done"]', 'lookup_method': 'xpath'},
+            },
+            'states': states,
+        }
+
+    def test_state_in_the_reader(self):
+        reader = WebReader(cache=False)
+        page = Page(reader, self.view())
+        reader.get(self.base_url + '/')
+        self.assertTrue(page.state.searched())
+        self.assertFalse(page.state.empty())
+        self.assertEqual(page.state.empty.evaluate(), [
+            ('search_input', 'exists', True),
+            ('results', 'absent', False),
+        ])
+
+    def test_state_is_checked_by_one_script(self):
+        browser = ScriptBrowser()
+        page = Page(browser, self.view())
+        self.assertTrue(page.state.searched())
+        self.assertEqual(len(browser.scripts), 1)
+        self.assertEqual(browser.scripts[0][0], [
+            [[['id', 'viewport', None, False], ['id', 'searchform', None, False]], 'exists'],
+            [[['class_name', 'r', None, True]], 'exists'],
+            [[['id', 'no_element_yo', None, False]], 'absent'],
+            [[['class_name', 'r', None, True]], 'displayed'],
+        ])
+        self.assertEqual(browser.actions, [])
+        self.assertEqual([met for _, _, met in page.state.empty.evaluate()], [True, False])
+
+    def test_wait_checks_every_condition_at_once(self):
+        PageHandler.status = 'Working'
+        reader = WebReader(cache=False)
+        page = Page(reader, self.view({
+            'done': {'exists': ['done'], 'displayed': ['status'], 'absent': ['missing']},
+            'stuck': {'exists': ['done', 'search_input'], 'absent': ['status', 'missing']},
+        }))
+        reader.get(self.base_url + '/status')
+
+        timer = threading.Timer(0.3, setattr, (PageHandler, 'status', 'Done'))
+        timer.start()
+        start = time()
+        self.assertIs(page.state.done.wait(timeout=5), page.state.done)
+        self.assertLess(time() - start, 1.5)
+        timer.join()
+
+        # Three conditions that are never met share one deadline.
+        start = time()
+        with self.assertRaises(PageStateTimeoutException) as context:
+            page.state.wait('stuck', timeout=0.5)
+        self.assertLess(time() - start, 1.2)
+        self.assertEqual(context.exception.unmet, [('search_input', 'exists'), ('status', 'absent')])
+        self.assertIn('search_input exists, status absent', context.exception.msg)
+        PageHandler.status = 'Working'
+
+    def test_wait_watches_the_whole_state_in_the_browser(self):
+        browser = ScriptBrowser([True])
+        page = Page(browser, self.view())
+        page.state.searched.wait()
+        self.assertEqual(len(browser.scripts), 1)
+        self.assertEqual(len(browser.scripts[0][0]), 4)
+        # The 30 second wait is watched 10 seconds at a time.
+        self.assertEqual(browser.scripts[0][1], 10000)
+
+        browser = ScriptBrowser([])
+        page = Page(browser, self.view())
+        with self.assertRaises(PageStateTimeoutException) as context:
+            page.state.empty.wait(timeout=0.2)
+        self.assertEqual(context.exception.unmet, [('search_input', 'exists'), ('results', 'absent')])
+
+
+class ElementCacheTest(ServerTestCase):
+    def test_reader_reuses_elements_on_the_same_document(self):
+        reader = WebReader(cache=False)
+        page = Page(reader, PageStateTest.view())
+        cache = element_cache(reader)
+        reader.get(self.base_url + '/')
+
+        search_form = page.search_form
+        self.assertEqual(search_form.get_attribute('name'), 'search')
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertIs(page.search_form, search_form)
+        results = page.results
+        self.assertEqual(len(results), 3)
+        self.assertEqual(page.results, results)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        # Each lookup gets its own list.
+        results.pop()
+        page.results.reverse()
+        self.assertEqual(page.results, results + [page.results[-1]])
+
+        # A new document drops everything found on the old one.
+        reader.get(self.base_url + '/')
+        self.assertIsNot(page.search_form, search_form)
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_browser_only_caches_lookups_of_several_round_trips(self):
+        browser = ScriptBrowser()
+        element = PageElement(browser, {'selector': 'q', 'lookup_method': 'name'})
+        cache = element_cache(browser)
+        element()
+        element()
+        # Checking the element is attached would cost as much as finding it.
+        self.assertEqual(browser.actions, [('find', 'name', 'q')] * 2)
+        self.assertEqual(browser.scripts, [])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+
+    def test_browser_checks_elements_are_attached(self):
+        browser = ScriptBrowser()
+        element = PageElement(browser, {
+            'selector': 'q',
+            'lookup_method': 'name',
+            'parent': {
+                'selector': 'search',
+                'lookup_method': 'name',
+                'frame': {'selector': 'content', 'lookup_method': 'name'},
+            },
+        })
+        cache = element_cache(browser)
+        enter_frame = [('find', 'name', 'content'), ('frame', [('name', 'content', 0)])]
+        found = element()
+        self.assertEqual(browser.actions, enter_frame + [('find', 'name', 'search'), ('find', 'name', 'q')])
+
+        # The element is checked in the frame its parent was found in.
+        del browser.actions[:]
+        self.assertIs(element(), found)
+        self.assertEqual(browser.actions, enter_frame)
+        self.assertEqual((cache.hits, cache.misses, cache.invalidations), (1, 1, 0))
+
+        browser.stale = True
+        del browser.actions[:]
+        element()
+        self.assertEqual(browser.actions[-1], ('find', 'name', 'q'))
+        self.assertEqual((cache.hits, cache.misses, cache.invalidations), (1, 2, 1))
+
+
+class ParentChainTest(ServerTestCase):
+    def setUp(self):
+        self.reader = WebReader(cache=False)
+        self.reader.get(self.base_url + '/')
+
+    def element(self, driver, element_dict):
+        return PageElement(driver, dict(element_dict, cache=False))
+
+    def test_chain_is_one_xpath(self):
+        # The search_form chain from page_tests.json.
+        search_form = self.element(self.reader, {
+            'selector': 'searchform',
+            'lookup_method': 'id',
+            'parent': {
+                'selector': 'viewport',
+                'lookup_method': 'id',
+                'parent': {'selector': 'body', 'lookup_method': 'tag_name'},
+            },
+        })
+        self.assertEqual(
+            search_form._chain,
+            '((/descendant-or-self::body)[1]/descendant::*[@id="viewport"])[1]/descendant::*[@id="searchform"]'
+        )
+        self.assertEqual(search_form().get_attribute('name'), 'search')
+
+        last_result = self.element(self.reader, {
+            'selector': 'r',
+            'lookup_method': 'class_name',
+            'parent': {'selector': '//ul', 'lookup_method': 'xpath', 'multiple': True, 'index': -1},
+        })
+        self.assertTrue(last_result._chain.startswith('(//ul)[last()]/descendant::'))
+        self.assertEqual(last_result().text, 'First')
+
+        second = self.element(self.reader, {
+            'selector': 'h3',
+            'lookup_method': 'tag_name',
+            'multiple': True,
+            'parent': {'selector': 'result', 'lookup_method': 'class_name', 'multiple': True, 'index': 1},
+        })
+        self.assertEqual([element.text for element in second()], ['Second'])
+
+    def test_other_chains_are_looked_up_in_turn(self):
+        button = self.element(self.reader, {
+            'selector': 'button',
+            'lookup_method': 'css_selector',
+            'parent': {'selector': 'viewport', 'lookup_method': 'id'},
+        })
+        self.assertIsNone(button._chain)
+        self.assertEqual(button().text, 'Search')
+        self.assertIsNone(self.element(self.reader, {'selector': 'q', 'lookup_method': 'name'})._chain)
+
+    def test_browser_finds_other_chains_with_one_script(self):
+        browser = ScriptBrowser()
+        button = self.element(browser, {
+            'selector': 'button',
+            'lookup_method': 'css_selector',
+            'parent': {'selector': 'viewport', 'lookup_method': 'id'},
+        })
+        self.assertEqual(button().locator, [['id', 'viewport', None, False], ['css_selector', 'button', None, False]])
+        self.assertEqual(len(browser.scripts), 1)
+        self.assertEqual(browser.actions, [])
+
+
+class RetryTest(ServerTestCase):
+    def setUp(self):
+        PageHandler.flaky_count = 0
+        PageHandler.down_count = 0
+
+    def test_failed_requests_are_retried(self):
+        reader = WebReader(retry=RetryPolicy(retries=3, backoff=0.01), circuit_breaker=CircuitBreaker(threshold=5))
+        reader.get(self.base_url + '/flaky')
+        self.assertEqual(reader.find_element_by_id('flaky').text, 'Up')
+        self.assertEqual(PageHandler.flaky_count, 3)
+
+    def test_retries_give_up(self):
+        reader = WebReader(retry=RetryPolicy(retries=2, backoff=0.01), circuit_breaker=False)
+        reader.get(self.base_url + '/down')
+        self.assertEqual(reader.current_response, 'Unavailable')
+        self.assertEqual(PageHandler.down_count, 3)
+
+    def test_long_retry_after_is_not_waited_for(self):
+        reader = WebReader(retry=RetryPolicy(retries=3, backoff=0.01, max_backoff=1), circuit_breaker=False)
+        start = time()
+        reader.get(self.base_url + '/busy')
+        self.assertLess(time() - start, 0.5)
+        self.assertEqual(PageHandler.down_count, 1)
+
+    def test_retry_after_sets_the_delay(self):
+        policy = RetryPolicy(backoff=10, max_backoff=60)
+        response = type('Response', (object,), {'headers': {'Retry-After': '2'}})()
+        self.assertEqual(policy.delay(1, response), 2.0)
+        self.assertLessEqual(RetryPolicy(backoff=1, max_backoff=3).delay(10), 3)
+
+    def test_throttled_responses_do_not_close_the_circuit(self):
+        responses = [type('Response', (object,), {'status_code': status, 'headers': {}, 'close': lambda self: None})()
+                     for status in (503, 429, 503)]
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+        response = RetryPolicy(retries=2, backoff=0.01).call(self.base_url + '/', lambda: responses.pop(0), breaker)
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(breaker.is_open('127.0.0.1'))
+
+    def test_circuit_opens_for_failing_host(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.2)
+        reader = WebReader(retry=RetryPolicy(retries=1, backoff=0.01), circuit_breaker=breaker)
+        reader.get(self.base_url + '/down')
+        self.assertTrue(breaker.is_open('127.0.0.1'))
+        self.assertFalse(breaker.is_open('localhost'))
+        self.assertRaises(CircuitOpenError, reader.get, self.base_url + '/other')
+        self.assertEqual(PageHandler.down_count, 2)
+
+        sleep(0.25)
+        reader.get(self.base_url + '/other')
+        self.assertFalse(breaker.is_open('127.0.0.1'))
+
+
+@unittest.skipIf(AsyncWebReader is None, 'AsyncWebReader needs Python 3 and aiohttp.')
+class AsyncWebReaderTest(ServerTestCase):
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_get_returns_page(self):
+        async def fetch():
+            async with AsyncWebReader() as reader:
+                page = await reader.get(self.base_url + '/')
+                return page, reader.find_element_by_id('search_input').get_attribute('name')
+
+        page, name = self.run_async(fetch())
+        self.assertEqual([r.text for r in page.find_elements_by_class_name('r')], ['First', 'Second', 'Third'])
+        self.assertEqual(name, 'q')
+
+    def test_text_that_looks_like_json(self):
+        async def fetch():
+            async with AsyncWebReader() as reader:
+                return [await reader.get(self.base_url + path) for path in ('/log', '/log-untyped', '/json-untyped')]
+
+        log, untyped_log, untyped_json = self.run_async(fetch())
+        self.assertEqual(log.find_element_by_tag_name('body').text, '[INFO] started')
+        self.assertEqual(untyped_log.find_element_by_tag_name('body').text, '[INFO] started')
+        self.assertEqual(untyped_json, [1, 2, 3])
+
+    def test_per_host_limit(self):
+        PageHandler.max_in_flight = 0
+
+        async def fetch():
+            async with AsyncWebReader(max_concurrency=10, max_per_host=3) as reader:
+                return await asyncio.gather(*[reader.get(self.base_url + '/slow') for _ in range(9)])
+
+        pages = self.run_async(fetch())
+        self.assertEqual(len(pages), 9)
+        self.assertEqual(pages[0].find_element_by_id('slow').text, 'Slow')
+        self.assertLessEqual(PageHandler.max_in_flight, 3)
+        self.assertGreater(PageHandler.max_in_flight, 1)
+
+    def test_host_semaphores_are_pruned(self):
+        async def fetch():
+            async with AsyncWebReader(max_concurrency=10, max_per_host=3) as reader:
+                await asyncio.gather(*[reader.get(self.base_url + '/slow') for _ in range(4)])
+                connector = reader.session.connector
+                return reader._host_semaphores, reader._host_requests, connector.limit, connector.limit_per_host
+
+        semaphores, requests, limit, limit_per_host = self.run_async(fetch())
+        self.assertEqual(semaphores, {})
+        self.assertEqual(requests, {})
+        self.assertEqual((limit, limit_per_host), (10, 3))
+
+    def test_pages_are_parsed_from_bytes(self):
+        async def fetch():
+            async with AsyncWebReader() as reader:
+                return [await reader.get(self.base_url + path) for path in ('/meta-charset', '/undeclared')]
+
+        meta, undeclared = self.run_async(fetch())
+        self.assertIsNone(meta._response._text)
+        self.assertEqual(meta.find_element_by_id('word').text, u'\u0434\u0430')
+        self.assertEqual(undeclared.find_element_by_id('word').text, u'caf\u00e9 cr\u00e8me')
+        self.assertIn(u'caf\u00e9 cr\u00e8me', undeclared.current_response)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()